@@ -3,7 +3,7 @@ Used for development to create WorldMap-related links from a layer name
 """
 from __future__ import print_function
 import re
-import requests
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 from django.conf import settings
 
 GEONODE_PREFIX = 'geonode:'
@@ -127,7 +127,7 @@ class LayerLinkHelper(object):
 
         print ('Attempt to retrieve SLD sld_url: %s' % sld_url)
 
-        resp = requests.get(sld_url, auth=settings.WORLDMAP_ACCOUNT_AUTH)
+        resp = WorldMapClient.get(sld_url)
 
         print (resp.status_code)
         if not resp.status_code == 200:
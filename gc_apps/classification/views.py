@@ -15,6 +15,7 @@ from gc_apps.geo_utils.error_result_msg import log_connect_error_message
 #from gc_apps.geo_utils.msg_util import msg
 from gc_apps.dv_notify.metadata_updater import MetadataUpdater
 from gc_apps.classification.utils import get_worldmap_info_object
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 from gc_apps.gis_tabular.forms import SELECT_LABEL
 from gc_apps.geo_utils.json_field_reader import JSONHelper
 
@@ -176,10 +177,11 @@ def view_classify_layer_form(request, import_success_md5):
     #print ('classify_params', classify_params)
     resp = None
     try:
-        resp = requests.post(classify_url,\
+        # Re-applying the same style is harmless, safe to retry
+        resp = WorldMapClient.post(classify_url,\
                     data=classify_params,\
-                    auth=settings.WORLDMAP_ACCOUNT_AUTH,\
-                    timeout=settings.WORLDMAP_DEFAULT_TIMEOUT)
+                    read_timeout=settings.WORLDMAP_DEFAULT_TIMEOUT,\
+                    retry=True)
                     
     except requests.exceptions.ConnectionError as exception_obj:
         err_msg = ('<b>Details for administrator:</b>'
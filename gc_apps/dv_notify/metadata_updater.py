@@ -11,7 +11,7 @@ from __future__ import print_function
 
 import os
 import json
-import requests # for POST
+import requests
 
 if __name__ == '__main__':
     import sys
@@ -22,6 +22,7 @@ if __name__ == '__main__':
 from gc_apps.geo_utils.message_helper_json import MessageHelperJSON
 from gc_apps.geo_utils.msg_util import msgt
 from gc_apps.geo_utils.error_result_msg import log_connect_error_message
+from gc_apps.registered_dataverse.dataverse_client import DataverseClient
 
 
 from shared_dataverse_information.dataverse_info.url_helper import get_api_url_update_map_metadata,\
@@ -98,7 +99,8 @@ class MetadataUpdater(object):
 
         req = None
         try:
-            req = requests.post(api_delete_metadata_url,\
+            req = DataverseClient.get_client(api_delete_metadata_url).post(\
+                    api_delete_metadata_url,\
                     data=json.dumps(params),\
                     timeout=self.timeout_seconds)
         except requests.exceptions.Timeout:
@@ -212,7 +214,8 @@ class MetadataUpdater(object):
 
         req = None
         try:
-            req = requests.post(api_update_url,\
+            req = DataverseClient.get_client(api_update_url).post(\
+                api_update_url,\
                 data=json.dumps(dv_metadata_params),\
                 timeout=self.timeout_seconds)
         except requests.exceptions.Timeout:
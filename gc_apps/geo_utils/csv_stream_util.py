@@ -0,0 +1,56 @@
+"""
+Write rows as .csv text in chunks--e.g. for a StreamingHttpResponse
+
+    response = StreamingHttpResponse(iterate_csv_rows(rows, header_row=column_names),
+                                     content_type='text/csv')
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+from gc_apps.geo_utils.time_util import get_datetime_string_for_file
+
+# Number of rows written to each chunk
+CSV_ROWS_PER_CHUNK = 500
+
+
+class EchoBuffer(object):
+    """File-like object for the csv writer; write() returns the line"""
+    def write(self, value):
+        return value
+
+
+def iterate_csv_rows(rows, header_row=None, rows_per_chunk=CSV_ROWS_PER_CHUNK):
+    """
+    Yield the rows as .csv text, rows_per_chunk rows at a time
+
+    :param rows: iterable of lists
+    :param header_row: optional list of column names
+    """
+    writer = csv.writer(EchoBuffer())
+
+    chunk = []
+    if header_row is not None:
+        chunk.append(writer.writerow(header_row))
+
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+
+    if chunk:
+        yield ''.join(chunk)
+
+
+def get_csv_download_response(csv_chunks, file_prefix='unmapped_rows'):
+    """
+    :param csv_chunks: iterable of .csv strings
+    :returns: StreamingHttpResponse for a .csv attachment
+    """
+    response = StreamingHttpResponse(csv_chunks, content_type='text/csv')
+
+    file_name = '%s__%s.csv' % (file_prefix, get_datetime_string_for_file())
+    response['Content-Disposition'] = 'attachment; filename="%s"' % file_name
+
+    return response
@@ -1,24 +1,27 @@
 
 import hashlib
 
-def hashfile(file_path, hasher=hashlib.md5(), blocksize=65536):
+def hashfile(file_path, hasher=None, blocksize=65536):
     """For verifying checksums of bigger files
     From: http://stackoverflow.com/questions/3431825/generating-a-md5-checksum-of-a-file
     
     :param file_path: full path to file to check
     :type file_path: string or unicode
     :param hasher: hash algorithm instance, 
-    :param type: e.g. hashlib.md5(), hashlib.sha256()
+    :param type: e.g. hashlib.md5(), hashlib.sha256().  Defaults to a new hashlib.md5()
     :returns: checksum
     :rtype: str or unicode
     """
-    if file_path is None or hasher is None: 
+    if file_path is None:
         return None
-        
-    fhandler = open(file_path, 'rb')
-    
-    buf = fhandler.read(blocksize)
-    while len(buf) > 0:
-        hasher.update(buf)
+
+    # A default of hashlib.md5() would be shared--and updated--across calls
+    if hasher is None:
+        hasher = hashlib.md5()
+
+    with open(file_path, 'rb') as fhandler:
         buf = fhandler.read(blocksize)
+        while len(buf) > 0:
+            hasher.update(buf)
+            buf = fhandler.read(blocksize)
     return hasher.hexdigest()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Vectorized formatting of join column values
+
+Join keys were built one row at a time:
+
+    df[col].apply(lambda x: '{0:0>%s}'.format(x) % zero_pad_length)
+    df[col].apply(lambda x: '%s' % x)
+
+format_join_keys() returns the same strings using whole-column
+conversions--for ints, floats (e.g. 1.0 -> '1.0'), NaN and strings.
+
+    format_join_keys(df['BG_ID_10'], zero_pad_length=12)
+
+Python 2 formats a float as '%.12g', adding ".0" if the result looks
+like an integer.  e.g. 1.0 -> '1.0', 1e15 -> '1e+15', 0.1 + 0.2 -> '0.3'
+The exponent form starts one digit earlier than with '%.12g':
+250250001001.0 -> '2.50250001001e+11'
+"""
+import numpy as np
+import pandas as pd
+
+# Same as str(float) in Python 2
+FLOAT_FORMAT = '%.12g'
+
+# Same number of significant digits, in exponent form
+FLOAT_EXP_FORMAT = '%.11e'
+
+# Where Python 2 uses an exponent and '%.12g' doesn't
+PY2_FIRST_EXP_SUFFIX = 'e+11'
+
+# Floats below this, with no fractional part, are formatted without an exponent
+MAX_INT_FORMATTED_FLOAT = 1e11
+
+ZERO_PAD_CHAR = '0'
+
+
+def format_float_values_as_python(values):
+    """
+    :param values: numpy float array
+    :returns: numpy string array matching str(x) for each value
+    """
+    strings = np.char.mod(FLOAT_FORMAT, values)
+
+    # '1' -> '1.0', '-3' -> '-3.0'.  Not: '1.5', '1e+15', 'nan', 'inf'
+    looks_like_int = np.char.isdigit(np.char.lstrip(strings, '-'))
+
+    strings = np.where(looks_like_int, np.char.add(strings, '.0'), strings)
+
+    # 12 digits before the decimal point: Python 2 switches to an exponent,
+    #   e.g. '%.12g' -> '250250001001', Python 2 -> '2.50250001001e+11'
+    exp_strings = np.char.mod(FLOAT_EXP_FORMAT, values)
+    is_py2_exp = np.char.endswith(exp_strings, PY2_FIRST_EXP_SUFFIX)
+    if is_py2_exp.any():
+        # '2.50250001001e+11', '1.00000000000e+11' -> '1e+11'
+        mantissas = np.char.partition(exp_strings[is_py2_exp], 'e')[:, 0]
+        mantissas = np.char.rstrip(np.char.rstrip(mantissas, '0'), '.')
+        py2_strings = np.char.add(mantissas, PY2_FIRST_EXP_SUFFIX)
+
+        strings = strings.astype(np.result_type(strings, py2_strings))
+        strings[is_py2_exp] = py2_strings
+
+    return strings
+
+
+def format_float_values(values):
+    """
+    :param values: numpy float array
+    :returns: numpy string array matching str(x) for each value
+    """
+    # Whole numbers below MAX_INT_FORMATTED_FLOAT: '%.12g' gives the digits
+    #   of the int, e.g. 12.0 -> '12' -> '12.0'.  Format these as ints.
+    with np.errstate(invalid='ignore'):
+        is_int_value = (np.floor(values) == values) &\
+                       (np.abs(values) < MAX_INT_FORMATTED_FLOAT) &\
+                       ~((values == 0) & np.signbit(values))   # -0.0
+
+    int_strings = np.char.add(\
+                    np.where(is_int_value, values, 0).astype(np.int64).astype(str),\
+                    '.0')
+    if is_int_value.all():
+        return int_strings
+
+    # The rest: NaN, fractions, large numbers
+    other_strings = format_float_values_as_python(values[~is_int_value])
+
+    strings = np.empty(len(values), dtype=np.result_type(int_strings, other_strings))
+    strings[is_int_value] = int_strings[is_int_value]
+    strings[~is_int_value] = other_strings
+    return strings
+
+
+def format_join_values_as_strings(values):
+    """
+    :param values: pandas Series
+    :returns: numpy string array, the same as values.apply(lambda x: '%s' % x)
+    """
+    if values.dtype.kind == 'f':
+        return format_float_values(values.values)
+
+    # ints, bools and objects (strings, with NaN for empty values):
+    #   numpy calls str() on each value
+    try:
+        return np.asarray(values.values).astype(str)
+    except UnicodeEncodeError:
+        return np.array([u'%s' % x for x in values.values])
+
+
+def zero_pad_keys(keys, zero_pad_length):
+    """
+    :param keys: numpy string array
+    :returns: numpy string array, keys shorter than zero_pad_length
+        are left-filled with zeros.  Longer keys are left as they are.
+    """
+    # np.char.rjust also cuts longer keys down to zero_pad_length
+    is_short = np.char.str_len(keys) < zero_pad_length
+    if not is_short.any():
+        return keys
+
+    padded_keys = np.char.rjust(keys[is_short], zero_pad_length, ZERO_PAD_CHAR)
+
+    keys = keys.astype(np.result_type(keys, padded_keys))
+    keys[is_short] = padded_keys
+    return keys
+
+
+def format_join_keys(values, zero_pad_length=None):
+    """
+    Vectorized version of:
+        values.apply(lambda x: '{0:0>N}'.format(x))   (N = zero_pad_length)
+        values.apply(lambda x: '%s' % x)              (zero_pad_length is None)
+
+    '{0:0>N}'.format(x) right-aligns str(x), filling with zeros:
+        -5 -> '000-5', 1.0 -> '001.0', NaN -> '00nan', '123456' -> '123456'
+    --except for bools, which are formatted as ints: True -> '00001'
+
+    :param values: pandas Series
+    :param zero_pad_length: int or None
+    :returns: pandas Series of strings, with the same index as values
+    """
+    is_zero_padded = zero_pad_length and zero_pad_length > 0
+
+    if is_zero_padded and values.dtype.kind == 'b':
+        # '{0:0>5}'.format(True) -> '00001', not '0True'
+        keys = format_join_values_as_strings(values.astype(np.int64))
+    else:
+        keys = format_join_values_as_strings(values)
+
+    if is_zero_padded:
+        keys = zero_pad_keys(keys, zero_pad_length)
+
+    return pd.Series(keys, index=values.index, dtype=object)
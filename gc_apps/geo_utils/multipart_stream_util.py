@@ -0,0 +1,159 @@
+"""
+Stream a multipart/form-data body--e.g. a .zip upload--without
+building it in memory
+
+requests.post(files=...) reads every file into one string before
+sending.  StreamingMultipartEncoder is a file-like object: the body is
+read in small blocks while it's sent, so memory use doesn't depend on
+the file size.
+
+    encoder = StreamingMultipartEncoder(dict(title='Boston Income'),
+                                        dict(content=open('boston.zip', 'rb')),
+                                        progress_callback=show_progress)
+    r = requests.post(url, data=encoder,
+                      headers={'Content-Type': encoder.content_type})
+
+progress_callback(bytes_read, total_bytes) is called after each block
+"""
+import io
+import logging
+import os
+import uuid
+
+LOGGER = logging.getLogger(__name__)
+
+# Default block size for iteration
+STREAM_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_FILE_CONTENT_TYPE = 'application/octet-stream'
+
+
+def to_bytes(val):
+    """Encode unicode as utf-8, other non-strings via str()"""
+    if isinstance(val, unicode):
+        return val.encode('utf-8')
+    if isinstance(val, str):
+        return val
+    return str(val)
+
+
+class StreamingMultipartEncoder(object):
+    """
+    File-like multipart/form-data body: form fields followed by files
+    """
+    def __init__(self, fields, files, progress_callback=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        :param fields: dict of form field values.  A list value is
+            sent as repeated fields.  None values are skipped--as with
+            requests.post(data=...)
+        :param files: dict of {field name: open file handle (binary mode)}
+        :param progress_callback: optional function(bytes_read, total_bytes)
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+
+        self.progress_callback = progress_callback
+        self.chunk_size = chunk_size
+
+        self.bytes_read = 0
+
+        # Readers, in order: io.BytesIO for the headers and field
+        #   values, the open file handles for the files
+        self.readers = []
+        self.total_bytes = 0
+        self.build_readers(fields or {}, files or {})
+
+        self.reader_idx = 0
+
+    def add_text(self, text):
+        self.readers.append(io.BytesIO(text))
+        self.total_bytes += len(text)
+
+    def add_file(self, file_handle):
+        """Add the file, from its current position"""
+        start_pos = file_handle.tell()
+        file_size = os.fstat(file_handle.fileno()).st_size - start_pos
+
+        self.readers.append(file_handle)
+        self.total_bytes += file_size
+
+    @staticmethod
+    def get_disposition(name, filename=None):
+        disposition = 'Content-Disposition: form-data; name="%s"' %\
+                        to_bytes(name).replace('"', '\\"')
+        if filename is not None:
+            disposition += '; filename="%s"' % to_bytes(filename).replace('"', '\\"')
+        return disposition
+
+    def build_readers(self, fields, files):
+
+        boundary_line = '--%s\r\n' % self.boundary
+
+        for name, val in fields.items():
+            if isinstance(val, (list, tuple)):
+                vals = val
+            else:
+                vals = [val]
+
+            for single_val in vals:
+                if single_val is None:
+                    continue
+                self.add_text('%s%s\r\n\r\n%s\r\n' % (\
+                                boundary_line,
+                                StreamingMultipartEncoder.get_disposition(name),
+                                to_bytes(single_val)))
+
+        for name, file_handle in files.items():
+            filename = os.path.basename(getattr(file_handle, 'name', name))
+            self.add_text('%s%s\r\nContent-Type: %s\r\n\r\n' % (\
+                                boundary_line,
+                                StreamingMultipartEncoder.get_disposition(name, filename),
+                                DEFAULT_FILE_CONTENT_TYPE))
+            self.add_file(file_handle)
+            self.add_text('\r\n')
+
+        self.add_text('--%s--\r\n' % self.boundary)
+
+    def __len__(self):
+        """Used by requests for the Content-Length header"""
+        return self.total_bytes
+
+    def read(self, size=-1):
+        """
+        :returns: up to size bytes of the body; '' at the end
+        """
+        if size is None or size < 0:
+            size = self.total_bytes - self.bytes_read
+
+        blocks = []
+        num_bytes = 0
+        while num_bytes < size and self.reader_idx < len(self.readers):
+            block = self.readers[self.reader_idx].read(size - num_bytes)
+            if not block:
+                self.reader_idx += 1
+                continue
+            blocks.append(block)
+            num_bytes += len(block)
+
+        self.bytes_read += num_bytes
+
+        if num_bytes and self.progress_callback is not None:
+            try:
+                self.progress_callback(self.bytes_read, self.total_bytes)
+            except Exception:
+                # Progress is informational--never fail the upload
+                LOGGER.exception('Upload progress callback failed')
+
+        return ''.join(blocks)
+
+    def __iter__(self):
+        while True:
+            block = self.read(self.chunk_size)
+            if not block:
+                break
+            yield block
+
+    def close(self):
+        """Close the file handles"""
+        for reader in self.readers:
+            reader.close()
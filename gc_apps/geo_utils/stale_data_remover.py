@@ -63,6 +63,9 @@ class StaleDataRemover(object):
     def remove_stale_dataverse_data(self, stale_age_in_seconds=STALE_AGE_TWO_DAYS):
         """
         Here we're removing the metadata and files from dataverse
+
+        Deleting a GISDataFile releases its DataverseFileBlob reference.
+        The stored file is removed with the last reference.
         """
         msgt("Remove stale Dataverse data")
 
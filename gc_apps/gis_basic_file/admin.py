@@ -1,5 +1,5 @@
 from django.contrib import admin
-from gc_apps.gis_basic_file.models import GISDataFile
+from gc_apps.gis_basic_file.models import GISDataFile, DataverseFileBlob
 
 from shared_dataverse_information.dataverse_info.admin import DataverseInfoAdmin
 
@@ -16,8 +16,16 @@ class GISDataFileAdmin(DataverseInfoAdmin):
     # fieldsets: Use DataverseInfoAdmin fieldsets and add a GeoConnect specific row
     #
     fieldsets = [fs for fs in DataverseInfoAdmin.fieldsets]
-    geoconnect_fieldset = ('GeoConnect specific', {'fields': ['registered_dataverse', 'dv_session_token', 'dv_file', 'gis_scratch_work_directory']})
+    geoconnect_fieldset = ('GeoConnect specific', {'fields': ['registered_dataverse', 'dv_session_token', 'dv_file', 'dv_file_blob', 'gis_scratch_work_directory']})
     fieldsets.insert(0, geoconnect_fieldset)   # second to last in admin
 
 # register the model
 admin.site.register(GISDataFile, GISDataFileAdmin)
+
+
+class DataverseFileBlobAdmin(admin.ModelAdmin):
+    save_on_top = True
+    search_fields = ('checksum', 'blob_name',)
+    list_display = ('checksum', 'file_size', 'reference_count', 'blob_name', 'modified',)
+    readonly_fields = ('created', 'modified',)
+admin.site.register(DataverseFileBlob, DataverseFileBlobAdmin)
@@ -0,0 +1,193 @@
+"""
+Deduplicated storage of Dataverse files
+
+Files are stored once per md5 under "dv_blobs/" in the DV_FILE_SYSTEM_STORAGE
+and tracked by a DataverseFileBlob.  Each GISDataFile.dv_file is a hard
+link to the blob file--it keeps its own name, e.g. the Dataverse file label.
+
+    - If a blob matching the Dataverse checksum exists, it's linked
+        and the download is skipped
+    - Otherwise the file is downloaded and becomes (or links to) a blob
+    - An existing dv_file is reused if it matches the Dataverse checksum
+        or size, or the server says it's unchanged (is_local_copy_current)
+
+Deleting a GISDataFile releases its reference; the blob file is deleted
+with the last reference.  (See GISDataFile.release_dv_file)
+
+    success, err_msg = DataverseFileBlobStore.get_dv_file(\
+                            tabular_info, download_url, 'my_file.tab')
+"""
+import os
+import re
+import shutil
+import logging
+
+from gc_apps.geo_utils.file_hasher import hashfile
+from gc_apps.gis_basic_file.models import DataverseFileBlob, DV_FILE_SYSTEM_STORAGE
+from gc_apps.gis_basic_file.dv_file_downloader import DataverseFileDownloader
+
+LOGGER = logging.getLogger(__name__)
+
+BLOB_DIRECTORY_NAME = 'dv_blobs'
+
+MD5_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class DataverseFileBlobStore(object):
+    """Static methods for linking GISDataFile.dv_file objects to DataverseFileBlobs"""
+
+    @staticmethod
+    def get_blob_name(checksum):
+        """e.g. 'dv_blobs/e1/e16c3b9999781343ad6dfa180f176d7c'"""
+        return os.path.join(BLOB_DIRECTORY_NAME, checksum[:2], checksum)
+
+    @staticmethod
+    def get_dv_file(gis_data_file, download_url, filename):
+        """
+        Attach a file to gis_data_file.dv_file--linking an existing
+        blob or downloading the file.
+
+        :returns: (True, None) or (False, error message)
+        """
+        if DataverseFileBlobStore.link_existing_blob(gis_data_file, filename):
+            LOGGER.debug('Download skipped, blob found: %s', gis_data_file.dv_file.name)
+            return True, None
+
+        downloader = DataverseFileDownloader(download_url)
+        if not downloader.download_to_dv_file(gis_data_file, filename):
+            return False, downloader.err_msg
+
+        DataverseFileBlobStore.add_downloaded_file(gis_data_file, downloader)
+        return True, None
+
+    @staticmethod
+    def is_local_copy_current(gis_data_file, download_url):
+        """
+        Can the existing dv_file be reused?  Decide using the DataverseInfo
+        checksum and file size--falling back to a conditional request
+
+            (1) No local file: False
+            (2) Dataverse md5 available: compare it to the local md5
+            (3) Dataverse file size doesn't match the local size: False
+            (4) ETag/Last-Modified from the download: ask the server
+            (5) Otherwise, the size matched: True
+
+        :returns: boolean
+        """
+        if not gis_data_file.is_dv_file_available():
+            return False
+
+        blob = gis_data_file.dv_file_blob
+        local_path = gis_data_file.get_dv_file_fullpath()
+
+        # (2) Compare checksums
+        #
+        checksum = (gis_data_file.datafile_expected_md5_checksum or '').lower()
+        if MD5_PATTERN.match(checksum):
+            if blob is not None:
+                return blob.checksum == checksum
+            return hashfile(local_path) == checksum
+
+        # (3) Compare sizes
+        #
+        if gis_data_file.datafile_filesize and\
+            gis_data_file.datafile_filesize != os.path.getsize(local_path):
+            return False
+
+        # (4) Conditional request
+        #
+        if blob is not None and (blob.etag or blob.last_modified):
+            downloader = DataverseFileDownloader(download_url)
+            return not downloader.is_remote_file_modified(blob.etag,\
+                                                          blob.last_modified)
+
+        # (5) Same size, nothing else to check
+        #
+        return True
+
+    @staticmethod
+    def link_file(source_path, dest_path):
+        """Hard link, falling back to a copy if links aren't supported"""
+        dest_directory = os.path.dirname(dest_path)
+        if not os.path.isdir(dest_directory):
+            os.makedirs(dest_directory)
+
+        try:
+            os.link(source_path, dest_path)
+        except (OSError, AttributeError):
+            shutil.copyfile(source_path, dest_path)
+
+    @staticmethod
+    def link_existing_blob(gis_data_file, filename):
+        """
+        If a blob matches the expected md5 (and size) from the
+        Dataverse, link it as gis_data_file.dv_file and save
+
+        :returns: boolean
+        """
+        checksum = (gis_data_file.datafile_expected_md5_checksum or '').lower()
+        if not MD5_PATTERN.match(checksum):
+            return False
+
+        blob = DataverseFileBlob.objects.filter(checksum=checksum).first()
+        if blob is None or not blob.is_blob_file_available():
+            return False
+
+        if gis_data_file.datafile_filesize and\
+            gis_data_file.datafile_filesize != blob.file_size:
+            return False
+
+        dv_file_field = gis_data_file.dv_file.field
+        storage_name = DV_FILE_SYSTEM_STORAGE.get_available_name(\
+                            dv_file_field.generate_filename(gis_data_file, filename))
+
+        DataverseFileBlobStore.link_file(blob.get_blob_fullpath(),\
+                                         DV_FILE_SYSTEM_STORAGE.path(storage_name))
+        blob.add_reference()
+
+        gis_data_file.dv_file.name = storage_name
+        gis_data_file.dv_file_blob = blob
+        gis_data_file.save()
+
+        return True
+
+    @staticmethod
+    def add_downloaded_file(gis_data_file, downloader):
+        """
+        After a download, store the dv_file as a blob--or, if the blob
+        already exists, replace the dv_file with a link to it.
+
+        :param downloader: DataverseFileDownloader that retrieved the dv_file
+        :returns: DataverseFileBlob
+        """
+        checksum = downloader.md5
+        dv_file_path = DV_FILE_SYSTEM_STORAGE.path(gis_data_file.dv_file.name)
+
+        blob = DataverseFileBlob.objects.filter(checksum=checksum).first()
+        if blob is not None and blob.is_blob_file_available():
+            # Already stored: drop the new copy
+            os.remove(dv_file_path)
+            DataverseFileBlobStore.link_file(blob.get_blob_fullpath(), dv_file_path)
+        else:
+            if blob is None:
+                blob = DataverseFileBlob(checksum=checksum, reference_count=0)
+            blob.blob_name = DataverseFileBlobStore.get_blob_name(checksum)
+            blob.file_size = downloader.bytes_downloaded
+            blob.save()
+
+            blob_path = blob.get_blob_fullpath()
+            if os.path.isfile(blob_path):
+                os.remove(blob_path)
+            DataverseFileBlobStore.link_file(dv_file_path, blob_path)
+
+        if downloader.etag or downloader.last_modified:
+            blob.etag = downloader.etag
+            blob.last_modified = downloader.last_modified
+            blob.save()
+
+        blob.add_reference()
+
+        gis_data_file.dv_file_blob = blob
+        gis_data_file.save()
+
+        return blob
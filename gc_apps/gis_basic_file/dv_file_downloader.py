@@ -0,0 +1,207 @@
+"""
+Download a Dataverse file into the storage of a GISDataFile's dv_file
+
+    - The file is streamed in fixed-size chunks; it never sits fully in memory
+    - After a dropped connection, the download resumes using an HTTP Range request
+    - The md5 is computed as the chunks are written
+
+    downloader = DataverseFileDownloader(download_url)
+    if downloader.download_to_dv_file(tabular_info, 'my_file.tab'):
+        print downloader.md5, downloader.bytes_downloaded
+    else:
+        print downloader.err_msg
+"""
+import os
+import hashlib
+import logging
+
+import requests
+from requests.packages.urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from gc_apps.registered_dataverse.dataverse_client import DataverseClient
+
+LOGGER = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024   # 1 MB
+DOWNLOAD_MAX_RETRIES = 3
+DOWNLOAD_TIMEOUT = 60               # seconds, for connecting and between reads
+
+PARTIAL_DOWNLOAD_SUFFIX = '.part'
+
+# Raised when the connection drops mid-download
+RESUMABLE_ERRORS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout,
+                    Urllib3HTTPError)
+
+
+class DataverseFileDownloader(object):
+    """
+    Stream a file from a url into the dv_file storage of a GISDataFile
+    """
+    def __init__(self, download_url, **kwargs):
+        """
+        :param download_url: url including the session token
+        Optional kwargs:
+            - chunk_size: bytes read/written at a time
+            - max_retries: number of times to resume after a dropped connection
+            - timeout: seconds to wait for the connection and between reads
+        """
+        self.download_url = download_url
+        self.chunk_size = kwargs.get('chunk_size', DOWNLOAD_CHUNK_SIZE)
+        self.max_retries = kwargs.get('max_retries', DOWNLOAD_MAX_RETRIES)
+        self.timeout = kwargs.get('timeout', DOWNLOAD_TIMEOUT)
+
+        self.bytes_downloaded = 0
+        self.md5 = None
+        self.hasher = None
+
+        # Response headers, used for later conditional requests
+        self.etag = ''
+        self.last_modified = ''
+
+        self.has_err = False
+        self.err_msg = None
+
+    def add_error(self, err_msg):
+        """Store errors internal to this class"""
+        LOGGER.error(err_msg)
+        self.has_err = True
+        self.err_msg = err_msg
+
+    def download_to_dv_file(self, gis_data_file, filename):
+        """
+        Download the file and attach it to gis_data_file.dv_file.
+        The file is written directly to the dv_file storage--
+        first as a ".part" file, renamed when complete.
+
+        gis_data_file is saved on success.
+
+        :returns: boolean
+        """
+        if self.has_err:
+            return False
+
+        dv_file_field = gis_data_file.dv_file.field
+        storage = dv_file_field.storage
+
+        storage_name = storage.get_available_name(\
+                            dv_file_field.generate_filename(gis_data_file, filename))
+        full_path = storage.path(storage_name)
+        partial_path = full_path + PARTIAL_DOWNLOAD_SUFFIX
+
+        directory = os.path.dirname(full_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        if not self.download_to_path(partial_path):
+            if os.path.isfile(partial_path):
+                os.remove(partial_path)
+            return False
+
+        os.rename(partial_path, full_path)
+
+        gis_data_file.dv_file.name = storage_name
+        gis_data_file.save()
+
+        return True
+
+    def download_to_path(self, file_path):
+        """
+        Download to file_path, resuming up to self.max_retries times
+
+        :returns: boolean
+        """
+        self.bytes_downloaded = 0
+        self.hasher = hashlib.md5()
+
+        with open(file_path, 'wb') as fh:
+            num_attempts = 0
+            while True:
+                try:
+                    self.download_remaining_bytes(fh)
+                    break
+                except RESUMABLE_ERRORS as ex_obj:
+                    num_attempts += 1
+                    if num_attempts > self.max_retries:
+                        self.add_error(('Failed to download file after %s attempts.'
+                                        ' Error: %s\n\nurl: %s') %\
+                                        (num_attempts, ex_obj, self.download_url))
+                        return False
+                    LOGGER.warn('Download interrupted at %s bytes, resuming: %s',\
+                                self.bytes_downloaded, ex_obj)
+                except requests.exceptions.HTTPError as ex_obj:
+                    self.add_error('Failed to download file. HTTPError: %s \n\nurl: %s' %\
+                                   (ex_obj, self.download_url))
+                    return False
+
+        self.md5 = self.hasher.hexdigest()
+        return True
+
+    def download_remaining_bytes(self, fh):
+        """
+        Request the file--starting at self.bytes_downloaded--and write it
+        to the open file handle in chunks
+        """
+        headers = {}
+        if self.bytes_downloaded > 0:
+            headers['Range'] = 'bytes=%s-' % self.bytes_downloaded
+
+        resp = DataverseClient.get_client(self.download_url).get(\
+                            self.download_url,\
+                            headers=headers,\
+                            stream=True,\
+                            timeout=self.timeout)
+        try:
+            resp.raise_for_status()
+
+            # Server ignored the Range header: start over
+            if self.bytes_downloaded > 0 and resp.status_code != 206:
+                LOGGER.warn('Server does not support resuming downloads, starting over')
+                fh.seek(0)
+                fh.truncate()
+                self.bytes_downloaded = 0
+                self.hasher = hashlib.md5()
+
+            self.etag = resp.headers.get('ETag', '')
+            self.last_modified = resp.headers.get('Last-Modified', '')
+
+            for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                fh.write(chunk)
+                self.hasher.update(chunk)
+                self.bytes_downloaded += len(chunk)
+        finally:
+            resp.close()
+
+    def is_remote_file_modified(self, etag, last_modified):
+        """
+        Send a conditional request using the ETag and/or Last-Modified
+        values from an earlier download.  The body isn't read.
+
+        :returns: False if the server responds "304 Not Modified",
+            otherwise True
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        if not headers:
+            return True
+
+        try:
+            resp = DataverseClient.get_client(self.download_url).get(\
+                                self.download_url,\
+                                headers=headers,\
+                                stream=True,\
+                                timeout=self.timeout)
+        except RESUMABLE_ERRORS as ex_obj:
+            LOGGER.warn('Conditional request failed: %s', ex_obj)
+            return True
+
+        resp.close()
+
+        return resp.status_code != 304
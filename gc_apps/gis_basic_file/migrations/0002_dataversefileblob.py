@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_basic_file', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataverseFileBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('checksum', models.CharField(help_text=b'md5 of the file', max_length=40, unique=True)),
+                ('file_size', models.BigIntegerField(default=0, help_text=b'in bytes')),
+                ('blob_name', models.CharField(help_text=b'name within the DV_FILE_SYSTEM_STORAGE', max_length=255)),
+                ('reference_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-modified',),
+            },
+        ),
+        migrations.AddField(
+            model_name='gisdatafile',
+            name='dv_file_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gis_basic_file.DataverseFileBlob'),
+        ),
+    ]
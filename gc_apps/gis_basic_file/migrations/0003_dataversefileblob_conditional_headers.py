@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_basic_file', '0002_dataversefileblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversefileblob',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='dataversefileblob',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
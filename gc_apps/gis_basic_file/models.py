@@ -3,18 +3,78 @@ from hashlib import md5
 
 from django.template.loader import render_to_string
 
+import os
 from os.path import basename, isfile
+import logging
 
 from django.db import models
+from django.db.models import F
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
 
+from gc_apps.core.models import TimeStampedModel
 from gc_apps.registered_dataverse.models import RegisteredDataverse
 from shared_dataverse_information.dataverse_info.models import DataverseInfo
 from gc_apps.gis_basic_file.scratch_directory_services import ScratchDirectoryHelper
 
 DV_FILE_SYSTEM_STORAGE = FileSystemStorage(location=settings.DV_DATAFILE_DIRECTORY)
 
+LOGGER = logging.getLogger(__name__)
+
+
+class DataverseFileBlob(TimeStampedModel):
+    """
+    A single stored copy of a Dataverse file, keyed by md5.
+
+    Each GISDataFile.dv_file using the blob is a hard link to the blob file.
+    When the last reference is released, the blob file is deleted.
+    See gc_apps.gis_basic_file.dv_file_blob_store
+    """
+    checksum = models.CharField(max_length=40, unique=True, help_text='md5 of the file')
+    file_size = models.BigIntegerField(default=0, help_text='in bytes')
+    blob_name = models.CharField(max_length=255, help_text='name within the DV_FILE_SYSTEM_STORAGE')
+    reference_count = models.IntegerField(default=0)
+
+    # From the download response, for conditional requests
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+
+    def get_blob_fullpath(self):
+        return DV_FILE_SYSTEM_STORAGE.path(self.blob_name)
+
+    def is_blob_file_available(self):
+        return isfile(self.get_blob_fullpath())
+
+    def add_reference(self):
+        DataverseFileBlob.objects.filter(id=self.id).update(\
+                                    reference_count=F('reference_count') + 1)
+        self.refresh_from_db()
+
+    def release_reference(self):
+        """
+        Decrement the reference count.  Delete the blob file
+        and this object when no references remain
+        """
+        DataverseFileBlob.objects.filter(id=self.id).update(\
+                                    reference_count=F('reference_count') - 1)
+        try:
+            self.refresh_from_db()
+        except DataverseFileBlob.DoesNotExist:
+            LOGGER.warn('DataverseFileBlob already deleted: %s', self.id)
+            return
+        if self.reference_count > 0:
+            return
+
+        if self.is_blob_file_available():
+            os.remove(self.get_blob_fullpath())
+        self.delete()
+
+    def __unicode__(self):
+        return '%s (%s)' % (self.checksum, self.reference_count)
+
+    class Meta:
+        ordering = ('-modified',)
+
 class GISDataFile(DataverseInfo):
     """
     This object stores information describing a geospatial Dataverse File
@@ -38,6 +98,12 @@ class GISDataFile(DataverseInfo):
                 null=True,
                 storage=DV_FILE_SYSTEM_STORAGE)
 
+    # Shared copy of the dv_file, if any
+    dv_file_blob = models.ForeignKey(DataverseFileBlob,
+                        blank=True,
+                        null=True,
+                        on_delete=models.SET_NULL)
+
     # For file working.  examples: unzipping, pulling raw data from columns, etc
     gis_scratch_work_directory = models.CharField(\
                         max_length=255,
@@ -124,6 +190,32 @@ class GISDataFile(DataverseInfo):
         super(GISDataFile, self).save(*args, **kwargs)
 
 
+    def release_dv_file(self):
+        """
+        If the dv_file is a link to a DataverseFileBlob, remove
+        the link and release the blob reference
+        """
+        if self.dv_file_blob is None:
+            return
+
+        fullpath = self.get_dv_file_fullpath()
+        if fullpath and isfile(fullpath):
+            os.remove(fullpath)
+
+        self.dv_file_blob.release_reference()
+        self.dv_file_blob = None
+        self.dv_file = None
+
+    def delete(self, *args, **kwargs):
+        """Release the DataverseFileBlob reference, if any"""
+        try:
+            self.release_dv_file()
+        except (IOError, OSError) as ex_obj:
+            LOGGER.error('Failed to release dv_file for %s: %s', self.id, ex_obj)
+
+        super(GISDataFile, self).delete(*args, **kwargs)
+
+
     def get_abstract_for_worldmap(self):
         """Return the Abstract for WorldMap use"""
         return render_to_string('gis_data_info/worldmap_abstract.html',
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from gc_apps.gis_basic_file.admin import GISDataFileAdmin
 
-from gc_apps.gis_shapefiles.models import ShapefileInfo, WorldMapShapefileLayerInfo
+from gc_apps.gis_shapefiles.models import ShapefileInfo, WorldMapShapefileLayerInfo,\
+    ShapefileInspectionResult
 from gc_apps.gis_shapefiles.admin_forms import ShapefileInfoAdminForm
 
 from gc_apps.geo_utils.admin_util import make_changelist_updates
@@ -52,3 +53,11 @@ class WorldMapShapefileLayerInfoAdmin(admin.ModelAdmin):
     save_on_top = True
     list_display = ('shapefile_info', 'layer_name', 'created', 'modified', 'md5',)
 admin.site.register(WorldMapShapefileLayerInfo, WorldMapShapefileLayerInfoAdmin)
+
+
+class ShapefileInspectionResultAdmin(admin.ModelAdmin):
+    save_on_top = True
+    search_fields = ('name', 'content_hash',)
+    list_display = ('name', 'content_hash', 'number_of_features', 'file_size', 'created', 'modified',)
+    readonly_fields = ('created', 'modified',)
+admin.site.register(ShapefileInspectionResult, ShapefileInspectionResultAdmin)
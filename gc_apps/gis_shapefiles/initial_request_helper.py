@@ -15,6 +15,7 @@ from gc_apps.geo_utils.template_constants import FAILED_TO_RETRIEVE_DATAVERSE_FI
 
 from gc_apps.layer_types.static_vals import is_valid_dv_type
 from gc_apps.geo_utils.error_result_msg import log_connect_error_message
+from gc_apps.registered_dataverse.dataverse_client import DataverseClient
 import logging
 
 LOGGER = logging.getLogger(__name__)
@@ -106,7 +107,8 @@ class InitialRequestHelper(object):
         # Make the request
         #
         try:
-            r = requests.post(self.callback_url, data=json.dumps(token_data))
+            r = DataverseClient.get_client(self.callback_url).post(\
+                            self.callback_url, data=json.dumps(token_data))
         except requests.exceptions.ConnectionError as exception_obj:
 
             err_msg = ('<p><b>Details for administrator:</b>'
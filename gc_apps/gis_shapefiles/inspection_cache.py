@@ -0,0 +1,145 @@
+"""
+Cache of zipped shapefile inspection results, keyed by the md5 of the .zip
+
+The same Dataverse shapefile is often mapped again after the
+StaleDataRemover has deleted its ShapefileInfo.  For a byte-identical
+.zip, the feature count, column names/info, and bounding box are
+restored from a ShapefileInspectionResult rather than re-inspected.
+
+Entries are evicted by age and by count (least recently used first).
+This is separate from the StaleDataRemover--see
+task_scripts/prune_inspection_cache.py
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from os.path import getsize, isfile
+
+from django.conf import settings
+from django.utils import timezone
+
+from gc_apps.geo_utils.file_hasher import hashfile
+from gc_apps.gis_shapefiles.models import ShapefileInfo, ShapefileInspectionResult
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ShapefileInspectionCache(object):
+    """
+    Look up and store inspection results for a ShapefileInfo.
+
+    content_hash = ShapefileInspectionCache.get_content_hash(shapefile_info)
+    if not ShapefileInspectionCache.restore_inspection(content_hash, shapefile_info):
+        # ... run the ShapefileZipCheck ...
+        ShapefileInspectionCache.save_inspection(content_hash, shapefile_info)
+    """
+
+    @staticmethod
+    def get_content_hash(shapefile_info):
+        """
+        Return the md5 of the ShapefileInfo's .zip file or None
+        """
+        if not isinstance(shapefile_info, ShapefileInfo):
+            LOGGER.error('shapefile_info must be a ShapefileInfo object')
+            return None
+
+        if not shapefile_info.is_dv_file_available():
+            return None
+
+        file_path = shapefile_info.get_dv_file_fullpath()
+        if not isfile(file_path):
+            return None
+
+        return hashfile(file_path, hashlib.md5())
+
+    @staticmethod
+    def restore_inspection(content_hash, shapefile_info):
+        """
+        If there's an unexpired result for this content_hash, copy it
+        to the ShapefileInfo and save the ShapefileInfo.
+
+        :returns: boolean.  True if the inspection results were restored
+        """
+        if content_hash is None or shapefile_info is None:
+            return False
+
+        cached_result = ShapefileInspectionResult.objects.filter(\
+                                content_hash=content_hash).first()
+        if cached_result is None:
+            return False
+
+        max_age = timedelta(seconds=settings.SHAPEFILE_INSPECTION_CACHE_MAX_AGE)
+        if cached_result.created < timezone.now() - max_age:
+            cached_result.delete()
+            return False
+
+        cached_result.copy_to_shapefile_info(shapefile_info)
+        shapefile_info.save()
+
+        # update "modified", used for least recently used eviction
+        cached_result.save()
+
+        LOGGER.debug('Restored shapefile inspection: %s', content_hash)
+        return True
+
+    @staticmethod
+    def save_inspection(content_hash, shapefile_info):
+        """
+        Store the results of a successful inspection
+
+        :returns: ShapefileInspectionResult or None
+        """
+        if content_hash is None or shapefile_info is None:
+            return None
+
+        if not shapefile_info.has_shapefile:
+            return None
+
+        cached_result, _created = ShapefileInspectionResult.objects.get_or_create(\
+                                        content_hash=content_hash)
+        cached_result.file_size = getsize(shapefile_info.get_dv_file_fullpath())
+        cached_result.copy_from_shapefile_info(shapefile_info)
+        cached_result.save()
+
+        return cached_result
+
+
+class InspectionCacheEvictor(object):
+    """
+    Remove old and least recently used ShapefileInspectionResult objects
+    """
+    def __init__(self, max_age_in_seconds=None, max_entries=None):
+        if max_age_in_seconds is None:
+            max_age_in_seconds = settings.SHAPEFILE_INSPECTION_CACHE_MAX_AGE
+        if max_entries is None:
+            max_entries = settings.SHAPEFILE_INSPECTION_CACHE_MAX_ENTRIES
+
+        self.max_age_in_seconds = max_age_in_seconds
+        self.max_entries = max_entries
+
+        self.num_expired_removed = 0
+        self.num_over_limit_removed = 0
+
+    def run_eviction(self):
+        """Remove expired entries, then trim to max_entries"""
+        self.remove_expired_entries()
+        self.remove_least_recently_used()
+
+        return self.num_expired_removed + self.num_over_limit_removed
+
+    def remove_expired_entries(self):
+        """Remove entries created more than max_age_in_seconds ago"""
+        time_threshold = timezone.now() - timedelta(seconds=self.max_age_in_seconds)
+
+        expired = ShapefileInspectionResult.objects.filter(created__lt=time_threshold)
+        self.num_expired_removed = expired.count()
+        expired.delete()
+
+    def remove_least_recently_used(self):
+        """Keep the max_entries most recently used entries"""
+        ids_to_keep = ShapefileInspectionResult.objects.order_by('-modified'\
+                            ).values_list('id', flat=True)[:self.max_entries]
+
+        over_limit = ShapefileInspectionResult.objects.exclude(id__in=list(ids_to_keep))
+        self.num_over_limit_removed = over_limit.count()
+        over_limit.delete()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_shapefiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShapefileInspectionResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('content_hash', models.CharField(help_text=b'md5 of the .zip file', max_length=40, unique=True)),
+                ('file_size', models.BigIntegerField(default=0, help_text=b'size of the .zip file in bytes')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('number_of_features', models.IntegerField(default=0)),
+                ('bounding_box', models.CharField(blank=True, max_length=255)),
+                ('column_names', jsonfield.fields.JSONField(blank=True, help_text=b'Saved as a json list')),
+                ('column_info', jsonfield.fields.JSONField(blank=True, help_text=b'Includes column type, field length, and decimal length. Saved as a json list.')),
+            ],
+            options={
+                'ordering': ('-modified',),
+                'verbose_name': 'Shapefile Inspection Result',
+                'verbose_name_plural': 'Shapefile Inspection Results',
+            },
+        ),
+    ]
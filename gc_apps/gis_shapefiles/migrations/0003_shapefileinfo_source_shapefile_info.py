@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_shapefiles', '0002_shapefileinspectionresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shapefileinfo',
+            name='source_shapefile_info',
+            field=models.ForeignKey(blank=True, help_text=b'The ShapefileInfo whose .zip this shapefile set came from', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='set_shapefile_infos', to='gis_shapefiles.ShapefileInfo'),
+        ),
+    ]
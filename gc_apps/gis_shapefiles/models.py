@@ -36,6 +36,15 @@ class ShapefileInfo(GISDataFile):
     column_names = jsonfield.JSONField(blank=True, help_text='Saved as a json list')
     column_info = jsonfield.JSONField(blank=True, help_text='Includes column type, field length, and decimal length. Saved as a json list.')
     extracted_shapefile_load_path = models.CharField(blank=True, max_length=255, help_text='Used to load extracted shapefile set')
+
+    # Set when this is one shapefile set split from a multi-shapefile .zip.
+    #   See worldmap_connect/send_multi_shapefile_service.py
+    #   SET_NULL: a cascade would skip delete() and leave the sets' files,
+    #   delete() removes the sets one at a time
+    source_shapefile_info = models.ForeignKey('self', null=True, blank=True,\
+                        on_delete=models.SET_NULL,\
+                        related_name='set_shapefile_infos',\
+                        help_text='The ShapefileInfo whose .zip this shapefile set came from')
     #file_names = jsonfield.JSONField(blank=True, help_text='Files within the .zip')
 
     #def get_file_info(self):
@@ -81,6 +90,23 @@ class ShapefileInfo(GISDataFile):
 
         super(ShapefileInfo, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        """
+        Delete the per-set ShapefileInfos--and their .zip files--one
+        at a time, before this one
+        """
+        for set_shapefile_info in self.set_shapefile_infos.all():
+            set_shapefile_info.delete()
+
+        if self.source_shapefile_info_id is not None and self.dv_file:
+            # A per-set .zip isn't shared: see send_multi_shapefile_service.py
+            try:
+                self.dv_file.delete(save=False)
+            except (IOError, OSError) as ex_obj:
+                LOGGER.error('Failed to delete the .zip for %s: %s', self.id, ex_obj)
+
+        super(ShapefileInfo, self).delete(*args, **kwargs)
+
     def __unicode__(self):
         if self.name:
             return self.name
@@ -94,6 +120,53 @@ class ShapefileInfo(GISDataFile):
 
 
 
+class ShapefileInspectionResult(TimeStampedModel):
+    """
+    Results of inspecting a zipped shapefile, keyed by the md5 of the .zip.
+
+    When the same Dataverse file comes back--e.g. after the
+    ShapefileInfo was removed as stale--the results are copied to
+    the new ShapefileInfo instead of inspecting the .zip again.
+
+    "modified" is updated on each use and "created" is the inspection time.
+    See gc_apps.gis_shapefiles.inspection_cache
+    """
+    content_hash = models.CharField(max_length=40, unique=True, help_text='md5 of the .zip file')
+    file_size = models.BigIntegerField(default=0, help_text='size of the .zip file in bytes')
+
+    name = models.CharField(max_length=255, blank=True)        #   shapefile basename
+    number_of_features = models.IntegerField(default=0)
+    bounding_box = models.CharField(max_length=255, blank=True)
+    column_names = jsonfield.JSONField(blank=True, help_text='Saved as a json list')
+    column_info = jsonfield.JSONField(blank=True, help_text='Includes column type, field length, and decimal length. Saved as a json list.')
+
+    def copy_from_shapefile_info(self, shapefile_info):
+        """Store the inspection results of a ShapefileInfo"""
+        self.name = shapefile_info.name
+        self.number_of_features = shapefile_info.number_of_features
+        self.bounding_box = shapefile_info.bounding_box
+        self.column_names = shapefile_info.column_names
+        self.column_info = shapefile_info.column_info
+
+    def copy_to_shapefile_info(self, shapefile_info):
+        """Restore the inspection results to a ShapefileInfo (not saved)"""
+        shapefile_info.name = self.name
+        shapefile_info.number_of_features = self.number_of_features
+        shapefile_info.add_bounding_box(self.bounding_box)
+        shapefile_info.add_column_names(self.column_names)
+        shapefile_info.add_column_info(self.column_info)
+        shapefile_info.has_shapefile = True
+        shapefile_info.zipfile_checked = True
+
+    def __unicode__(self):
+        return '%s (%s)' % (self.name, self.content_hash)
+
+    class Meta:
+        ordering = ('-modified',)
+        verbose_name = 'Shapefile Inspection Result'
+        verbose_name_plural = 'Shapefile Inspection Results'
+
+
 class WorldMapShapefileLayerInfo(WorldMapLayerInfo):
     """
     Store the results of a new layer created by mapping a shapefile
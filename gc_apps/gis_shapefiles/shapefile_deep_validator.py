@@ -0,0 +1,439 @@
+"""
+Record-by-record validation of a shapefile set (.shp, .shx, .dbf)
+
+Catches problems that otherwise only surface during the WorldMap import:
+    - .shx and .dbf record counts that don't match
+    - .shx offsets/lengths that don't match the .shp records
+    - truncated records
+    - shape types that don't match the .shp header
+    - broken parts: bad part indices, unclosed or too-short polygon rings
+    - NaN coordinates
+
+The .shp and .shx are read sequentially--they may be zip archive
+members--and records are sent in chunks to a process pool for the
+geometry checks.  Only a bounded number of chunks are in flight at once.
+
+validator = ShapefileDeepValidator(shp_file, shx_file, dbf_file)
+report = validator.get_report()
+if not report.is_valid():
+    print report.get_summary_message()
+"""
+import math
+import struct
+import logging
+from collections import deque
+from multiprocessing import Pool, cpu_count
+
+from gc_apps.gis_shapefiles.shapefile_header_reader import ShapefileHeaderReader,\
+    SHAPEFILE_HEADER_LENGTH, SHX_RECORD_LENGTH
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of records sent to a worker at a time
+DEEP_VALIDATION_CHUNK_SIZE = 2000
+
+# Stop after this many problems
+DEEP_VALIDATION_MAX_PROBLEMS = 100
+
+# Use the process pool once a shapefile has more records than this
+DEEP_VALIDATION_MIN_RECORDS_FOR_POOL = 4 * DEEP_VALIDATION_CHUNK_SIZE
+
+RECORD_HEADER_LENGTH = 8
+
+# Block size when skipping over bytes in a stream that can't seek
+SKIP_READ_SIZE = 64 * 1024
+
+SHAPE_TYPE_NULL = 0
+POINT_SHAPE_TYPES = (1, 11, 21)
+MULTIPOINT_SHAPE_TYPES = (8, 18, 28)
+POLYLINE_SHAPE_TYPES = (3, 13, 23)
+POLYGON_SHAPE_TYPES = (5, 15, 25)
+MULTIPATCH_SHAPE_TYPE = 31
+
+
+class ShapefileValidationReport(object):
+    """
+    Results of a ShapefileDeepValidator run
+
+        - file_problems: list of messages about the set as a whole
+        - record_problems: list of dicts: {'record_number' : 12, 'problem' : '...'}
+    """
+    def __init__(self, max_problems=DEEP_VALIDATION_MAX_PROBLEMS):
+        self.max_problems = max_problems
+
+        self.number_of_records_checked = 0
+        self.file_problems = []
+        self.record_problems = []
+
+        self.stopped_early = False
+
+    def add_file_problem(self, problem):
+        self.file_problems.append(problem)
+
+    def add_record_problem(self, record_number, problem):
+        self.record_problems.append(dict(record_number=record_number,
+                                         problem=problem))
+
+    def get_problem_count(self):
+        return len(self.file_problems) + len(self.record_problems)
+
+    def has_too_many_problems(self):
+        """Used to stop the validation early"""
+        if not self.max_problems or self.max_problems < 1:
+            return False
+
+        return self.get_problem_count() >= self.max_problems
+
+    def is_valid(self):
+        return self.get_problem_count() == 0
+
+    def as_dict(self):
+        return dict(is_valid=self.is_valid(),
+                    number_of_records_checked=self.number_of_records_checked,
+                    stopped_early=self.stopped_early,
+                    file_problems=self.file_problems,
+                    record_problems=self.record_problems)
+
+    def get_summary_message(self, max_lines=5):
+        """Format the first few problems as text"""
+        if self.is_valid():
+            return 'No problems found.'
+
+        lines = list(self.file_problems)
+        for info in self.record_problems:
+            lines.append('Record %s: %s' % (info['record_number'], info['problem']))
+
+        num_problems = len(lines)
+        lines = lines[:max_lines]
+        if num_problems > max_lines:
+            lines.append('(%s more problem(s))' % (num_problems - max_lines))
+
+        if self.stopped_early:
+            lines.append('(validation stopped after %s problems)' % self.max_problems)
+
+        return '\n'.join(lines)
+
+
+def check_record_chunk(chunk_args):
+    """
+    Process pool worker.  Check the content of each record in a chunk.
+
+    chunk_args: (header shape type, [(record number, content bytes), ...])
+    returns [(record number, problem), ...]
+    """
+    (header_shape_type, records) = chunk_args
+
+    problems = []
+    for (record_number, content) in records:
+        problem = check_record_content(header_shape_type, content)
+        if problem is not None:
+            problems.append((record_number, problem))
+
+    return problems
+
+
+def check_record_content(header_shape_type, content):
+    """
+    Check a single .shp record's content (the bytes after the record header)
+
+    returns None or a description of the problem
+    """
+    if len(content) < 4:
+        return 'Record is too short to contain a shape type'
+
+    shape_type = struct.unpack('<i', content[0:4])[0]
+    if shape_type == SHAPE_TYPE_NULL:
+        return None
+
+    if shape_type != header_shape_type:
+        return 'Shape type %s does not match the .shp header shape type %s'\
+                % (shape_type, header_shape_type)
+
+    if shape_type in POINT_SHAPE_TYPES:
+        if len(content) < 20:
+            return 'Point record is truncated'
+        return check_coordinates(content, 4, 1)
+
+    if shape_type in MULTIPOINT_SHAPE_TYPES:
+        if len(content) < 40:
+            return 'MultiPoint record is truncated'
+        num_points = struct.unpack('<i', content[36:40])[0]
+        if num_points < 1:
+            return 'MultiPoint record has no points'
+        if len(content) < 40 + 16 * num_points:
+            return 'MultiPoint record is truncated'
+        return check_coordinates(content, 40, num_points)
+
+    if shape_type in POLYLINE_SHAPE_TYPES + POLYGON_SHAPE_TYPES\
+        or shape_type == MULTIPATCH_SHAPE_TYPE:
+        return check_parts_record(shape_type, content)
+
+    return 'Unknown shape type: %s' % shape_type
+
+
+def check_parts_record(shape_type, content):
+    """Check a PolyLine, Polygon, or MultiPatch record"""
+
+    if len(content) < 44:
+        return 'Record is truncated'
+
+    num_parts, num_points = struct.unpack('<2i', content[36:44])
+    if num_parts < 1 or num_points < 1:
+        return 'Record has %s part(s) and %s point(s)' % (num_parts, num_points)
+
+    parts_end = 44 + 4 * num_parts
+    points_start = parts_end
+    if shape_type == MULTIPATCH_SHAPE_TYPE:
+        points_start += 4 * num_parts   # part types
+
+    if len(content) < points_start + 16 * num_points:
+        return 'Record is truncated'
+
+    parts = struct.unpack('<%si' % num_parts, content[44:parts_end])
+    if parts[0] != 0:
+        return 'First part index is %s, expected 0' % parts[0]
+
+    for idx in range(1, num_parts):
+        if not parts[idx - 1] < parts[idx] < num_points:
+            return 'Part index %s is out of order or out of range' % parts[idx]
+
+    coord_problem = check_coordinates(content, points_start, num_points)
+    if coord_problem is not None:
+        return coord_problem
+
+    if shape_type not in POLYGON_SHAPE_TYPES:
+        return None
+
+    # Polygon rings: at least 4 points and closed
+    #
+    part_ends = list(parts[1:]) + [num_points]
+    for part_num, (start, end) in enumerate(zip(parts, part_ends)):
+        if end - start < 4:
+            return 'Ring %s has %s point(s), at least 4 are required'\
+                    % (part_num, end - start)
+
+        first_point = content[points_start + 16 * start:points_start + 16 * start + 16]
+        last_point = content[points_start + 16 * (end - 1):points_start + 16 * end]
+        if first_point != last_point:
+            return 'Ring %s is not closed' % part_num
+
+    return None
+
+
+def check_coordinates(content, start, num_points):
+    """Make sure that none of the X, Y coordinates are NaN"""
+
+    coords = struct.unpack('<%sd' % (2 * num_points),\
+                           content[start:start + 16 * num_points])
+    for coord in coords:
+        if math.isnan(coord):
+            return 'Record contains a NaN coordinate'
+    return None
+
+
+def skip_bytes(file_obj, num_bytes):
+    """
+    Move forward num_bytes: seek if possible, otherwise--e.g. a zip
+    archive member--read and discard the bytes a block at a time
+    """
+    try:
+        file_obj.seek(num_bytes, 1)
+        return
+    except (AttributeError, IOError):
+        pass
+
+    while num_bytes > 0:
+        block = file_obj.read(min(num_bytes, SKIP_READ_SIZE))
+        if not block:
+            break
+        num_bytes -= len(block)
+
+
+class ShapefileDeepValidator(object):
+    """
+    Validate every record in a shapefile set.
+
+    The file objects only need to support read()--e.g. zip archive members
+    """
+    def __init__(self, shp_file, shx_file, dbf_file, **kwargs):
+        """
+        Optional kwargs:
+            - chunk_size: records per worker task
+            - max_problems: stop after this many problems.  0 for no limit
+            - num_processes: size of the process pool.  1 checks records
+                in this process
+        """
+        self.chunk_size = kwargs.get('chunk_size', DEEP_VALIDATION_CHUNK_SIZE)
+        self.num_processes = kwargs.get('num_processes', cpu_count())
+        self.min_records_for_pool = kwargs.get('min_records_for_pool',\
+                                        DEEP_VALIDATION_MIN_RECORDS_FOR_POOL)
+
+        self.report = ShapefileValidationReport(\
+                        kwargs.get('max_problems', DEEP_VALIDATION_MAX_PROBLEMS))
+
+        self.run_validation(shp_file, shx_file, dbf_file)
+
+    def get_report(self):
+        return self.report
+
+    def run_validation(self, shp_file, shx_file, dbf_file):
+        """Read the headers and then check each record"""
+
+        header_reader = ShapefileHeaderReader(shp_file, shx_file, dbf_file)
+        if header_reader.has_err:
+            self.report.add_file_problem(header_reader.err_msg)
+            return False
+
+        if header_reader.number_of_features != header_reader.number_of_records:
+            self.report.add_file_problem(\
+                ('The .shx has %s records and the .dbf has %s records.'
+                 ' They should match.') % (header_reader.number_of_features,
+                                           header_reader.number_of_records))
+
+        record_chunks = self.generate_record_chunks(shp_file, shx_file, header_reader)
+
+        if self.num_processes > 1 and\
+            header_reader.number_of_features >= self.min_records_for_pool:
+            if not self.check_chunks_with_pool(header_reader.shape_type, record_chunks):
+                self.check_chunks(header_reader.shape_type, record_chunks)
+        else:
+            self.check_chunks(header_reader.shape_type, record_chunks)
+
+        return self.report.is_valid()
+
+    def check_chunks(self, header_shape_type, record_chunks):
+        """Check the chunks in this process"""
+        for chunk in record_chunks:
+            self.add_record_problems(\
+                check_record_chunk((header_shape_type, chunk)))
+            if self.report.has_too_many_problems():
+                self.report.stopped_early = True
+                break
+
+    def add_record_problems(self, problems):
+        for (record_number, problem) in problems:
+            self.report.add_record_problem(record_number, problem)
+
+    def check_chunks_with_pool(self, header_shape_type, record_chunks):
+        """
+        Send chunks to a process pool, keeping at most two
+        chunks per process in flight
+
+        :returns: False if a pool can't be started, e.g. within a
+            daemonic Celery worker, and no chunks were checked
+        """
+        max_pending = 2 * self.num_processes
+        pending = deque()
+
+        try:
+            pool = Pool(self.num_processes)
+        except (AssertionError, OSError) as ex_obj:
+            # AssertionError: "daemonic processes are not allowed to have children"
+            LOGGER.warn('Deep validation process pool not started: %s', ex_obj)
+            return False
+
+        try:
+            for chunk in record_chunks:
+                pending.append(pool.apply_async(check_record_chunk,\
+                                        ((header_shape_type, chunk),)))
+                if len(pending) >= max_pending:
+                    self.add_record_problems(pending.popleft().get())
+
+                if self.report.has_too_many_problems():
+                    self.report.stopped_early = True
+                    break
+
+            while pending and not self.report.stopped_early:
+                self.add_record_problems(pending.popleft().get())
+                if self.report.has_too_many_problems():
+                    self.report.stopped_early = True
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return True
+
+    def generate_record_chunks(self, shp_file, shx_file, header_reader):
+        """
+        Walk the .shx index and .shp records together, checking the
+        offsets and record headers.  Yield lists of (record number, content).
+
+        Structural problems are added to the report.  If the .shp can't
+        be followed any further, the generator stops.
+        """
+        shp_position = SHAPEFILE_HEADER_LENGTH
+        chunk = []
+
+        for idx in xrange(header_reader.number_of_features):
+            record_number = idx + 1
+            self.report.number_of_records_checked = record_number
+
+            shx_record = shx_file.read(SHX_RECORD_LENGTH)
+            if len(shx_record) < SHX_RECORD_LENGTH:
+                self.report.add_file_problem('The .shx is truncated at record %s'\
+                                             % record_number)
+                break
+
+            offset, content_length = struct.unpack('>2i', shx_record)
+            offset *= 2
+            content_length *= 2
+
+            # The .shx offset should point at the next .shp record
+            #
+            if offset != shp_position:
+                self.report.add_record_problem(record_number,\
+                    ('The .shx offset is %s but the record'
+                     ' starts at byte %s') % (offset, shp_position))
+                if offset < shp_position:
+                    break   # can't go backwards in a stream
+                skip_bytes(shp_file, offset - shp_position)
+                shp_position = offset
+
+            record_header = shp_file.read(RECORD_HEADER_LENGTH)
+            if len(record_header) < RECORD_HEADER_LENGTH:
+                self.report.add_file_problem('The .shp is truncated at record %s'\
+                                             % record_number)
+                break
+
+            shp_record_number, shp_content_length = struct.unpack('>2i', record_header)
+            shp_content_length *= 2
+
+            if shp_record_number != record_number:
+                self.report.add_record_problem(record_number,\
+                    'The .shp record number is %s' % shp_record_number)
+
+            if shp_content_length != content_length:
+                self.report.add_record_problem(record_number,\
+                    ('The .shx content length is %s but the .shp'
+                     ' content length is %s') % (content_length, shp_content_length))
+
+            if shp_content_length < 0:
+                self.report.add_file_problem(\
+                    'The .shp content length is %s at record %s'\
+                    % (shp_content_length, record_number))
+                break
+
+            content = shp_file.read(shp_content_length)
+            shp_position += RECORD_HEADER_LENGTH + len(content)
+            if len(content) < shp_content_length:
+                self.report.add_file_problem('The .shp is truncated at record %s'\
+                                             % record_number)
+                break
+
+            chunk.append((record_number, content))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+
+            if self.report.has_too_many_problems():
+                break
+
+        if chunk:
+            yield chunk
+
+        if not self.report.has_too_many_problems() and\
+            shp_position < header_reader.shp_file_length and\
+            self.report.number_of_records_checked == header_reader.number_of_features:
+            self.report.add_file_problem(\
+                ('The .shp has %s bytes after the last record'
+                 ' listed in the .shx') % (header_reader.shp_file_length - shp_position))
@@ -0,0 +1,159 @@
+"""
+Read the fixed-size headers of a shapefile set (.shp, .shx, .dbf)
+
+The feature count and bounding box are available from the headers alone,
+so a large shapefile can be examined in constant memory--without decoding
+every geometry via pyshp's Reader.shapes()
+
+Header layouts are from the ESRI Shapefile Technical Description:
+    https://www.esri.com/library/whitepapers/pdfs/shapefile.pdf
+
+    .shp/.shx header (100 bytes)
+        - bytes 0-3:    file code 9994 (big endian)
+        - bytes 24-27:  file length in 16-bit words (big endian)
+        - bytes 32-35:  shape type (little endian)
+        - bytes 36-67:  bounding box Xmin, Ymin, Xmax, Ymax (little endian doubles)
+
+    .shx records are 8 bytes each, one per feature
+
+    .dbf header
+        - bytes 4-7:    number of records (little endian)
+        - bytes 8-9:    length of the header, including field descriptors
+"""
+import struct
+import cStringIO
+
+import shapefile
+
+SHAPEFILE_FILE_CODE = 9994
+SHAPEFILE_HEADER_LENGTH = 100
+SHX_RECORD_LENGTH = 8
+DBF_HEADER_PREFIX_LENGTH = 32
+
+
+class ShapefileHeaderReader(object):
+    """
+    Given open file-like objects for the .shp, .shx, and .dbf, read
+    the feature count, bounding box, and field descriptions.
+
+    Only the headers are read.  The file objects may be zip archive
+    members (zipfile.ZipExtFile) as they don't need to support seek()
+
+    reader = ShapefileHeaderReader(shp_file, shx_file, dbf_file)
+    if not reader.has_err:
+        print reader.number_of_features, reader.bbox, reader.fields
+    """
+    def __init__(self, shp_file, shx_file, dbf_file):
+
+        self.shape_type = None
+        self.bbox = None
+        self.shp_file_length = None     # in bytes
+
+        self.number_of_features = None  # from the .shx
+        self.number_of_records = None   # from the .dbf
+        self.fields = []                # same format as shapefile.Reader.fields
+
+        # for error messages
+        self.has_err = False
+        self.err_msg = None
+
+        self.read_headers(shp_file, shx_file, dbf_file)
+
+    def add_error(self, err_msg):
+        """Store errors internal to this class"""
+        self.has_err = True
+        self.err_msg = err_msg
+
+    def read_headers(self, shp_file, shx_file, dbf_file):
+        """Read each header in turn, stopping at the first error"""
+
+        if not self.read_shp_header(shp_file):
+            return False
+
+        if not self.read_shx_header(shx_file):
+            return False
+
+        return self.read_dbf_header(dbf_file)
+
+    @staticmethod
+    def unpack_main_file_header(file_obj):
+        """
+        Read the 100 byte header shared by the .shp and .shx files
+
+        return (file length in bytes, shape type, bbox) or None
+        """
+        if file_obj is None:
+            return None
+
+        header = file_obj.read(SHAPEFILE_HEADER_LENGTH)
+        if len(header) < SHAPEFILE_HEADER_LENGTH:
+            return None
+
+        file_code = struct.unpack('>i', header[0:4])[0]
+        if file_code != SHAPEFILE_FILE_CODE:
+            return None
+
+        file_length = struct.unpack('>i', header[24:28])[0] * 2
+        shape_type = struct.unpack('<i', header[32:36])[0]
+        bbox = list(struct.unpack('<4d', header[36:68]))
+
+        return (file_length, shape_type, bbox)
+
+    def read_shp_header(self, shp_file):
+        """Retrieve the shape type and bounding box from the .shp header"""
+
+        header_info = ShapefileHeaderReader.unpack_main_file_header(shp_file)
+        if header_info is None:
+            self.add_error('Failed to read the .shp file header')
+            return False
+
+        (self.shp_file_length, self.shape_type, self.bbox) = header_info
+
+        return True
+
+    def read_shx_header(self, shx_file):
+        """Retrieve the feature count from the .shx header"""
+
+        header_info = ShapefileHeaderReader.unpack_main_file_header(shx_file)
+        if header_info is None:
+            self.add_error('Failed to read the .shx file header')
+            return False
+
+        shx_file_length = header_info[0]
+        if shx_file_length < SHAPEFILE_HEADER_LENGTH:
+            self.add_error('The .shx file header has an invalid file length')
+            return False
+
+        self.number_of_features = (shx_file_length - SHAPEFILE_HEADER_LENGTH)\
+                                    / SHX_RECORD_LENGTH
+        return True
+
+    def read_dbf_header(self, dbf_file):
+        """
+        Retrieve the record count and fields from the .dbf header
+
+        The field descriptors are parsed by pyshp using only the header bytes
+        """
+        if dbf_file is None:
+            self.add_error('Failed to read the .dbf file header')
+            return False
+
+        header_prefix = dbf_file.read(DBF_HEADER_PREFIX_LENGTH)
+        if len(header_prefix) < DBF_HEADER_PREFIX_LENGTH:
+            self.add_error('Failed to read the .dbf file header')
+            return False
+
+        (self.number_of_records, header_length) = struct.unpack('<IH', header_prefix[4:10])
+
+        header_remainder = dbf_file.read(header_length - DBF_HEADER_PREFIX_LENGTH)
+
+        try:
+            dbf_reader = shapefile.Reader(\
+                            dbf=cStringIO.StringIO(header_prefix + header_remainder))
+        except:
+            self.add_error('Failed to read the .dbf field descriptions')
+            return False
+
+        self.fields = dbf_reader.fields
+
+        return True
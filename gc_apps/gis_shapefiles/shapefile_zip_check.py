@@ -1,11 +1,13 @@
 import os
-from os.path import isdir, isfile
-import shutil
-import shapefile
+from os.path import isfile
 import zipfile
 import cStringIO
 
-from gc_apps.gis_shapefiles.models import WORLDMAP_MANDATORY_IMPORT_EXTENSIONS, SHAPEFILE_EXTENSION_SHP
+from gc_apps.gis_shapefiles.models import SHAPEFILE_MANDATORY_EXTENSIONS,\
+        SHAPEFILE_EXTENSION_SHP
+from gc_apps.gis_shapefiles.zip_member_classifier import ZipMemberClassifier
+from gc_apps.gis_shapefiles.shapefile_header_reader import ShapefileHeaderReader
+from gc_apps.gis_shapefiles.shapefile_deep_validator import ShapefileDeepValidator
 from gc_apps.geo_utils.template_constants import ZIPCHECK_NO_SHAPEFILES_FOUND,\
         ZIPCHECK_MULTIPLE_SHAPEFILES,\
         ZIPCHECK_NO_FILE_TO_CHECK,\
@@ -15,6 +17,10 @@ import logging
 #logger = logging.getLogger(__name__)
 logger = logging.getLogger(__name__)
 
+# During deep validation, shapefile sets (.shp + .shx + .dbf) up to this
+#   many uncompressed bytes are read into memory. Larger sets are streamed.
+MAX_IN_MEMORY_SHAPEFILE_SIZE = 50 * 1024 * 1024 # 50 MB
+
 """
 import zipfile
 
@@ -46,6 +52,62 @@ class ZipToStringIOConverter(object):
         return cStringIO.StringIO(django_field_file_obj.read())
 
 
+class FieldFileZipInput(object):
+    """
+    Choose the least expensive way to pass a Django FieldFile to zipfile.ZipFile
+        (1) The storage backend has a local path: use the path
+        (2) The storage backend returns a seekable file object: use it as is
+        (3) Otherwise, buffer the contents via the ZipToStringIOConverter
+
+    For (1) and (2), zipfile.ZipFile only reads the central directory
+    and the members asked for--memory use doesn't grow with the upload.
+    """
+
+    @staticmethod
+    def get_zip_input(django_field_file_obj):
+        """Given a Django FieldFile object, return a file path, a seekable
+        file object, or a cStringIO.StringIO.  Returns None on failure.
+        """
+        if django_field_file_obj is None:
+            logger.error('django_field_file_obj is None')
+            return None
+
+        if not django_field_file_obj.__class__.__name__ == 'FieldFile':
+            logger.error('Expected a FieldFile. Class name: %s',\
+                        django_field_file_obj.__class__.__name__)
+            return None
+
+        if not django_field_file_obj:
+            logger.error('The FieldFile has no file associated with it')
+            return None
+
+        # (1) Local path, e.g. FileSystemStorage
+        #
+        try:
+            local_path = django_field_file_obj.path
+        except NotImplementedError:
+            local_path = None
+
+        if local_path and isfile(local_path):
+            return local_path
+
+        # (2) Seekable file object
+        #
+        try:
+            django_field_file_obj.open('rb')
+            file_obj = django_field_file_obj.file
+            file_obj.seek(0)
+            file_obj.tell()
+            return file_obj
+        except (AttributeError, IOError, ValueError):
+            logger.info('FieldFile is not seekable, buffering it: %s',\
+                        django_field_file_obj.name)
+
+        # (3) Buffer into memory
+        #
+        return ZipToStringIOConverter.from_django_file_field(django_field_file_obj)
+
+
 class ShapefileZipCheck(object):
     """Check to see if a file or buffer (StringIO) is a valid zipefile that contains at least one shapefile set
 
@@ -68,6 +130,13 @@ class ShapefileZipCheck(object):
                     - StringIO, no kwargs needed
                     - url to a .zip, {  'is_url_to_zip' : True }
                     - django file field, {  'is_django_file_field' : True }
+                Optional kwargs:
+                    - max_in_memory_size: byte limit for reading a shapefile set
+                        into memory during deep validation.  Larger sets are
+                        streamed from the .zip.  0 always streams.
+                    - allow_multiple_shapefiles: if True, validate() accepts
+                        a .zip with more than one shapefile set.  Choose a
+                        set via load_shapefile_from_open_zip
 
             potential_shapefile_sets    dict with shapefile basename key + individual files
                 example: { 'CommunityCenters_Pag': [u'CommunityCenters_Pag.shx', u'CommunityCenters_Pag.cst', u'CommunityCenters_Pag.dbf', u'CommunityCenters_Pag.prj', u'CommunityCenters_Pag.shp']}
@@ -92,6 +161,16 @@ class ShapefileZipCheck(object):
 
         self.potential_shapefile_sets = {}
 
+        # ZipMemberClassifier, set by validate()
+        self.member_classifier = None
+
+        self.allow_multiple_shapefiles = kwargs.get('allow_multiple_shapefiles', False)
+
+        # ShapefileValidationReport, set by deep validation
+        self.validation_report = None
+
+        self.max_in_memory_size = kwargs.get('max_in_memory_size', MAX_IN_MEMORY_SHAPEFILE_SIZE)
+
         self.zip_input = zip_input
 
         self.run_initial_check(**kwargs)
@@ -107,7 +186,7 @@ class ShapefileZipCheck(object):
 
         elif kwargs.get('is_django_file_field') is True:
             #print 'is_django_file_field'
-            self.zip_input = ZipToStringIOConverter.from_django_file_field(self.zip_input)
+            self.zip_input = FieldFileZipInput.get_zip_input(self.zip_input)
             if self.zip_input is None:
                 err_msg = 'Failed to find data in Django FileField'
                 self.add_error(err_msg)
@@ -139,10 +218,23 @@ class ShapefileZipCheck(object):
         if len(self.potential_shapefile_sets) == 0:
             return None
 
-        # Case not checked!  Same shapefile basename in different directories
-        l = self.potential_shapefile_sets.keys()
-        #l = [ os.path.basename(x) for x in l]
-        return l
+        return sorted(self.potential_shapefile_sets.keys())
+
+    def get_member_name(self, set_name, extension):
+        """
+        Return the archive member name for a shapefile set and extension.
+            e.g. ('roads/Roads', '.shp') -> 'roads/Roads.SHP'
+
+        Falls back to set_name + extension
+        """
+        member_name = None
+        if self.member_classifier is not None:
+            member_name = self.member_classifier.get_member_name(set_name, extension)
+
+        if member_name is None:
+            member_name = set_name + extension
+
+        return member_name
 
     def close_zip(self):
         if self.zip_obj is None:
@@ -155,13 +247,19 @@ class ShapefileZipCheck(object):
             return
 
 
-    def load_shapefile_from_open_zip(self, shapefile_basename, shapefile_info):
+    def load_shapefile_from_open_zip(self, shapefile_basename, shapefile_info, deep_validation=False):
         """
         Assumes that self.zip_obj has opened an archive that contains a valid shapefile set
 
-        param: shapefile_basename: Name of shapefile basename to remove from .zip.
-            Will be stripped of any preceding directory "foo/bar" becomes "bar"
+        The feature count, column names, and bounding box are read from the
+        file headers.  Each record is checked only if deep_validation is True.
+
+        param: shapefile_basename: Name of shapefile set to load from the .zip.
+            Either a name from get_shapefile_setnames() or a basename--
+            "foo/bar" is matched using "bar", regardless of case
         type: shapefile_basename: str
+        param: deep_validation: Check every record via the ShapefileDeepValidator
+        type: deep_validation: boolean
         """
         if self.has_err:
             return False
@@ -178,7 +276,6 @@ class ShapefileZipCheck(object):
             self.add_error('The ShapefileInfo was not specified')
             return False
 
-        shapefile_basename = os.path.basename(shapefile_basename)
         logger.info('shapefile_basename: %s', shapefile_basename)
 
         # ------------------------------------
@@ -192,11 +289,17 @@ class ShapefileZipCheck(object):
         # ------------------------------------
         name_found = False
         name_to_extract = None
-        for archived_filename in self.potential_shapefile_sets.keys():
-            if shapefile_basename == os.path.basename(archived_filename):
-                name_found = True
-                name_to_extract = archived_filename # includes path info
-                break
+        if shapefile_basename in self.potential_shapefile_sets:
+            name_found = True
+            name_to_extract = shapefile_basename
+        else:
+            shapefile_basename = os.path.basename(shapefile_basename)
+            for archived_filename in self.get_shapefile_setnames() or []:
+                if shapefile_basename.lower() ==\
+                    os.path.basename(archived_filename).lower():
+                    name_found = True
+                    name_to_extract = archived_filename # includes path info
+                    break
 
         if not name_found:
             err_msg = 'shapefile_basename not found in .zip: %s' % shapefile_basename
@@ -206,46 +309,18 @@ class ShapefileZipCheck(object):
         # ------------------------------------
         # Update shapefilename using the basename
         # ------------------------------------
-        shapefile_info.name = shapefile_basename
+        shapefile_info.name = os.path.basename(name_to_extract)
         shapefile_info.save()
 
         # ------------------------------------
-        # Extract the zipped file into a scratch directory
-        #   - Only extract the 4 files necessary for WorldMap
-        # ------------------------------------
-        scratch_directory = shapefile_info.get_scratch_work_directory()
-        for shp_ext in WORLDMAP_MANDATORY_IMPORT_EXTENSIONS:
-            shp_part_name = name_to_extract + shp_ext
-
-            # Extract the file to a scratch directory
-            zip_part_path = self.zip_obj.extract(shp_part_name, scratch_directory)
-
-        # ------------------------------------
-        # Can we read the '.shp' file?
-        # ------------------------------------
-        extracted_shapefile_load_path = os.path.join(scratch_directory, name_to_extract)
-        shapefile_info.extracted_shapefile_load_path = extracted_shapefile_load_path
-
-        full_shp_fname = extracted_shapefile_load_path + SHAPEFILE_EXTENSION_SHP
-        if not isfile(full_shp_fname):
-            self.add_error(".shp file not found! Tried: %s" % full_shp_fname)
-            return False
-
-        # ------------------------------------
-        # Try to process/pull info from the .shp file
+        # Read the feature count, column names, and bounding box
+        #   from the .shp, .shx, and .dbf headers
         # ------------------------------------
-        try:
-            shp_reader = shapefile.Reader(full_shp_fname)
-        except:
-            err_msg = 'Shapefile reader failed for file: %s' % (full_shp_fname)
-            self.add_error(err_msg, ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
+        header_reader = self.get_header_reader(name_to_extract)
+        if header_reader is None:
             return False
 
-
-        # ------------------------------------
-        # Extract feature count, column names, bounding box
-        # ------------------------------------
-        shapefile_info.number_of_features = len(shp_reader.shapes())
+        shapefile_info.number_of_features = header_reader.number_of_features
         if shapefile_info.number_of_features == 0:
             err_msg = "This shapefile does not have any geospatial features"
             self.add_error(err_msg, ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
@@ -253,23 +328,22 @@ class ShapefileZipCheck(object):
 
         # add column names
         # -----------------
-        shapefile_info.add_column_info(shp_reader.fields[1:])
-        shapefile_info.add_column_names_using_fields(shp_reader.fields)
+        shapefile_info.add_column_info(header_reader.fields[1:])
+        shapefile_info.add_column_names_using_fields(header_reader.fields)
 
         # add bounding box
         # -----------------
         try:
-            shapefile_info.add_bounding_box(list(shp_reader.bbox))
+            shapefile_info.add_bounding_box(list(header_reader.bbox))
         except:
             shapefile_info.add_bounding_box('')
 
-        # ----------------------
-        # Remove the scratch directory
-        # ----------------------
-        shp_reader = None
-        if isdir(scratch_directory):
-            shutil.rmtree(scratch_directory)
-            shapefile_info.extracted_shapefile_load_path = ''
+        # ------------------------------------
+        # Optional: check every record
+        # ------------------------------------
+        if deep_validation:
+            if not self.run_deep_validation(name_to_extract, shapefile_info):
+                return False
 
         # ----------------------
         # Save the metadata!!
@@ -279,6 +353,119 @@ class ShapefileZipCheck(object):
         return True
 
 
+    def get_header_reader(self, name_to_extract):
+        """
+        Stream the .shp, .shx, and .dbf headers from the open .zip
+
+        Returns a ShapefileHeaderReader or None
+        """
+        full_shp_fname = self.get_member_name(name_to_extract, SHAPEFILE_EXTENSION_SHP)
+
+        member_files = []
+        try:
+            for shp_ext in SHAPEFILE_MANDATORY_EXTENSIONS:
+                member_files.append(self.zip_obj.open(\
+                            self.get_member_name(name_to_extract, shp_ext)))
+        except KeyError as ex_obj:
+            self.add_error('File not found in .zip: %s' % ex_obj,\
+                            ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
+            return None
+
+        header_reader = ShapefileHeaderReader(*member_files)
+
+        for member_file in member_files:
+            member_file.close()
+
+        if header_reader.has_err:
+            err_msg = 'Shapefile reader failed for file: %s (%s)' %\
+                        (full_shp_fname, header_reader.err_msg)
+            self.add_error(err_msg, ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
+            return None
+
+        return header_reader
+
+
+    def run_deep_validation(self, name_to_extract, shapefile_info):
+        """
+        Check every record via the ShapefileDeepValidator.  On failure,
+        the first few problems are used for the error message and the
+        full report is available as self.validation_report
+        """
+        report = self.get_deep_validation_report(name_to_extract)
+        if report is None:
+            return False
+
+        if not report.is_valid():
+            err_msg = 'The shapefile did not pass validation:\n%s' %\
+                        report.get_summary_message()
+            self.add_error(err_msg, ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
+            return False
+
+        return True
+
+
+    def get_deep_validation_report(self, name_to_extract, **validator_kwargs):
+        """
+        Validate every record of a shapefile set in the open .zip
+          - Small sets are read from the .zip into memory
+          - Large sets are streamed from the .zip members
+
+        validator_kwargs are passed to the ShapefileDeepValidator
+
+        Returns a ShapefileValidationReport or None
+        """
+        if self.zip_obj is None:
+            self.add_error('The shapefile was not open')
+            return None
+
+        in_memory = self.can_load_in_memory(name_to_extract)
+
+        member_files = []
+        try:
+            for shp_ext in SHAPEFILE_MANDATORY_EXTENSIONS:
+                shp_part_name = self.get_member_name(name_to_extract, shp_ext)
+                if in_memory:
+                    member_files.append(cStringIO.StringIO(\
+                                        self.zip_obj.read(shp_part_name)))
+                else:
+                    member_files.append(self.zip_obj.open(shp_part_name))
+        except KeyError as ex_obj:
+            self.add_error('File not found in .zip: %s' % ex_obj,\
+                            ZIPCHECK_FAILED_TO_PROCCESS_SHAPEFILE)
+            return None
+
+        validator = ShapefileDeepValidator(*member_files, **validator_kwargs)
+
+        for member_file in member_files:
+            member_file.close()
+
+        self.validation_report = validator.get_report()
+
+        return self.validation_report
+
+
+    def can_load_in_memory(self, name_to_extract):
+        """
+        Is the shapefile set small enough to read into memory?
+
+        Sums the uncompressed sizes of the .shp, .shx and .dbf members and
+        compares them to self.max_in_memory_size
+        """
+        if not self.max_in_memory_size or self.max_in_memory_size < 0:
+            return False
+
+        total_size = 0
+        for shp_ext in SHAPEFILE_MANDATORY_EXTENSIONS:
+            try:
+                zip_info = self.zip_obj.getinfo(\
+                                self.get_member_name(name_to_extract, shp_ext))
+            except KeyError:
+                return False
+            total_size += zip_info.file_size
+
+        return total_size <= self.max_in_memory_size
+
+
     def get_zipfile_names(self):
         if self.zip_obj is None:
             return None
@@ -296,9 +483,11 @@ class ShapefileZipCheck(object):
             return False
 
         # ---------------------------
-        # Is it a file?
+        # Is it a file?  (or a file-like object)
         # ---------------------------
-        if not isfile(self.zip_input):
+        if hasattr(self.zip_input, 'read'):
+            pass
+        elif not isfile(self.zip_input):
             self.add_error('File not found for zip_input: %s' % self.zip_input)
             return False
 
@@ -315,60 +504,28 @@ class ShapefileZipCheck(object):
         # ---------------------------
         self.zip_obj = zipfile.ZipFile(self.zip_input, 'r')
 
-        # Get the file list
-        #
-        zip_info_list = self.zip_obj.infolist()
-
-        #  Remove names starting with "__"
-        #
-        zip_info_list = [z for z in zip_info_list if not z.filename[:2] == '__']
-
-        # Create file groups to check for needed shape files
+        # Group the members into shapefile sets by
+        #   case-insensitive stem, e.g.
         #
-        file_groups = {}
-
-        # Iterate through filenames.
-        # Make a dict with basename and a list of extensions.
-        # Ignore files without extensions.
+        #   { 'Tracts' : [ 'Tracts.dbf', 'Tracts.prj', 'Tracts.SHP', 'Tracts.shp.xml', 'Tracts.shx'] }
         #
-        #   e.g.  { 'Tracts' : [ '.dbf', '.prj', '.sbn', '.sbx', '.shp', '.shx']
-        #            , 'my_word_doc' : ['.docx']
+        #   Names starting with "__" and non-shapefile files are skipped
         #
-        for zip_info in zip_info_list:
-            entry_name = zip_info.filename
-
-            # Make sure file name is at least 5 chars and
-            #   has a "." as 4th char from the right
-            # Does this name have a file extension ".xxx"
-            if len(entry_name) >= 5 and entry_name[-4] == '.':
-                file_groups.setdefault(entry_name[:-4], []).append(entry_name[-4:])
-
-
-        #
-        #   Check dict to for potential shapefile sets
-        #       e.g. extension_list = ['.DBF', 'sHp', 'docx', etc]
-        #           .DBF -> checked as .dbf -> YES
-        #           .sHp -> checked as .shp -> YES
-        #           .docx -> checked as .docx -> NO
-        #
-        shapefile_groups = []
-        for k, extension_list in file_groups.iteritems():
-            if all(ext.lower() in extension_list for ext in WORLDMAP_MANDATORY_IMPORT_EXTENSIONS):
-                shape_file_fnames = ['%s%s' % (k, ext) for ext in extension_list]
-                self.potential_shapefile_sets.update({k : shape_file_fnames})
-
+        self.member_classifier = ZipMemberClassifier(self.zip_obj.infolist())
+        self.potential_shapefile_sets = self.member_classifier.get_shapefile_sets()
 
         if len(self.potential_shapefile_sets) == 0:     # No shapefiles found
             self.add_error(ShapefileZipCheck.ERR_MSG_NO_SHAPEFILES_IN_ZIP_ARCHIVE,\
                 ZIPCHECK_NO_SHAPEFILES_FOUND)
             return False
 
-        elif len(self.potential_shapefile_sets) > 1:    # Multiple shapefiles found
+        elif len(self.potential_shapefile_sets) > 1 and\
+            not self.allow_multiple_shapefiles:         # Multiple shapefiles found
             self.add_error(ShapefileZipCheck.ERR_MULTIPLE_SHAPEFILES_IN_ZIP_ARCHIVE,\
                             ZIPCHECK_MULTIPLE_SHAPEFILES)
             return False
 
-        # Only 1 shapefile found
+        # Only 1 shapefile found (or multiple are allowed)
         #
         return True
 
@@ -3,11 +3,6 @@
 - Given a ShapefileInfo object, check for and
     return a WorldMapLayerInfo object, if available
 """
-import urllib2
-
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
-
 from shared_dataverse_information.dataverse_info.forms import DataverseInfoValidationForm
 from gc_apps.registered_dataverse.registered_dataverse_helper import find_registered_dataverse
 
@@ -16,6 +11,7 @@ from gc_apps.geo_utils.error_result_msg import ErrResultMsg,\
     FAILED_NOT_A_REGISTERED_DATAVERSE
 
 from gc_apps.gis_shapefiles.models import ShapefileInfo
+from gc_apps.gis_basic_file.dv_file_blob_store import DataverseFileBlobStore
 
 import logging
 LOGGER = logging.getLogger(__name__)
@@ -60,9 +56,12 @@ def get_shapefile_from_dv_api_info(dv_session_token, dv_info_dict):
     # (3) Look for existing ShapefileInfo objects in the database
     #    ShapefileInfo objects are routinely deleted, but if file is already here, use it
     #       * todo: check for staleness, if the data is old delete it
+    #    Skip the per-set ShapefileInfo objects split from a multi-shapefile .zip;
+    #       they share the datafile_id of the original
     #-------------------------------------------------
     params_for_existing_check = dict(datafile_id=dv_info_dict.get('datafile_id', -1),\
         dataverse_installation_name=dv_info_dict.get('dataverse_installation_name', -1),\
+        source_shapefile_info__isnull=True,\
         )
 
     existing_sets = ShapefileInfo.objects.filter(**params_for_existing_check\
@@ -91,8 +90,17 @@ def get_shapefile_from_dv_api_info(dv_session_token, dv_info_dict):
 
         # delete the rest
         if len(existing_sets) > 0:
-            ShapefileInfo.objects.filter(id__in=existing_shapefile_info_ids).delete()   # delete older ShapefileInfo(s)
+            # delete older ShapefileInfo(s), one at a time to release the stored files
+            for old_shapefile_info in ShapefileInfo.objects.filter(id__in=existing_shapefile_info_ids):
+                old_shapefile_info.delete()
+
 
+    #------------------------------
+    # Add session token to the download url.  Gives permission to download/retrieve the file
+    #   - http://localhost:8080/api/access/datafile/FILEID?key=YOURAPIKEY
+    #------------------------------
+    datafile_download_url = dv_info_dict.get('datafile_download_url', '')
+    datafile_download_url = '%s?key=%s' % (datafile_download_url, dv_session_token)
 
     #------------------------------
     # (5) Get or create a new ShapefileInfo object
@@ -112,11 +120,11 @@ def get_shapefile_from_dv_api_info(dv_session_token, dv_info_dict):
         shapefile_info.save()
         msg('shapefile info saved')
 
-        # If the file is still available, return it
-        if shapefile_info.is_dv_file_available():
+        # If the file is still available and unchanged on the Dataverse, return it
+        if DataverseFileBlobStore.is_local_copy_current(shapefile_info, datafile_download_url):
             return True, shapefile_info.md5
         else:
-            # But the file isn't there!!  Delete ShapefileInfo and make a new one
+            # But the file isn't there or has changed!!  Delete ShapefileInfo and make a new one
             shapefile_info.delete()
 
     except ShapefileInfo.DoesNotExist:
@@ -137,27 +145,15 @@ def get_shapefile_from_dv_api_info(dv_session_token, dv_info_dict):
     #------------------------------
     # Download and attach file
     #------------------------------
-    datafile_download_url = dv_info_dict.get('datafile_download_url', '')
-
-    # Add session token.  Gives permission to download/retrieve the file
-    #   - http://localhost:8080/api/access/datafile/FILEID?key=YOURAPIKEY
-    #
-    datafile_download_url = '%s?key=%s' % (datafile_download_url, dv_session_token)
     msg('datafile_download_url: %s' % datafile_download_url)
     datafile_filename = dv_info_dict.get('datafile_label', '')
 
-    tmp_shapefile = NamedTemporaryFile(delete=True)
-
-    try:
-        tmp_shapefile.write(urllib2.urlopen(datafile_download_url).read())
-    except urllib2.HTTPError as e:
+    # Link a stored copy of the file or stream it into the dv_file storage
+    #
+    success, err_msg = DataverseFileBlobStore.get_dv_file(shapefile_info,\
+                                    datafile_download_url, datafile_filename)
+    if not success:
         shapefile_info.delete() # clear shapefile
-        err_msg = 'Failed to download shapefile. HTTPError: %s \n\nurl: %s' % (str(e), datafile_download_url)
         return False, ErrResultMsg(None, err_msg)
 
-    tmp_shapefile.flush()
-
-    shapefile_info.dv_file.save(datafile_filename, File(tmp_shapefile))
-    shapefile_info.save()
-
     return True, shapefile_info.md5
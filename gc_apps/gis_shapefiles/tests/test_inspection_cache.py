@@ -0,0 +1,83 @@
+from os.path import abspath, dirname, isfile, join
+from datetime import timedelta
+import json
+
+from django.test import TestCase
+from django.utils import timezone
+
+from gc_apps.geo_utils.msg_util import *
+from gc_apps.gis_shapefiles.models import ShapefileInfo, ShapefileInspectionResult
+from gc_apps.gis_shapefiles.inspection_cache import ShapefileInspectionCache,\
+    InspectionCacheEvictor
+
+# python manage.py test gc_apps.gis_shapefiles.tests.test_inspection_cache
+#
+
+class ShapefileInspectionCacheTests(TestCase):
+
+    def get_shp_params(self):
+        test_data_file = join( dirname(dirname(abspath(__file__)))\
+                                    , 'fixtures'\
+                                    , 'dataverse_info_test_fixtures_01.json'\
+                                )
+        if not isfile(test_data_file):
+                raise ValueError('File not found: %s' % test_data_file)
+
+        return json.loads(open(test_data_file, 'r').read())
+
+    def setUp(self):
+        self.shp_set = ShapefileInfo(**self.get_shp_params())
+
+        self.cached_result = ShapefileInspectionResult(content_hash='a' * 32,
+                                    file_size=1000,
+                                    name='social_disorder_in_boston_yqh',
+                                    number_of_features=544,
+                                    bounding_box='[1.0, 2.0, 3.0, 4.0]',
+                                    column_names=['OBJECTID', 'BG_ID_10'],
+                                    column_info=[['OBJECTID', 'N', 10, 0],
+                                                 ['BG_ID_10', 'C', 12, 0]])
+        self.cached_result.save()
+
+    def test_01_restore_inspection(self):
+        """test_01_restore_inspection"""
+        msgt(self.test_01_restore_inspection.__doc__)
+
+        msgd('Test 01: Unknown hash')
+        self.assertEqual(ShapefileInspectionCache.restore_inspection('b' * 32, self.shp_set), False)
+        self.assertEqual(ShapefileInspectionCache.restore_inspection(None, self.shp_set), False)
+
+        msgd('Test 02: Known hash')
+        self.assertEqual(ShapefileInspectionCache.restore_inspection('a' * 32, self.shp_set), True)
+        self.assertEqual(self.shp_set.number_of_features, 544)
+        self.assertEqual(self.shp_set.column_names, ['OBJECTID', 'BG_ID_10'])
+        self.assertEqual(self.shp_set.name, 'social_disorder_in_boston_yqh')
+        self.assertEqual(self.shp_set.has_shapefile, True)
+        self.assertEqual(self.shp_set.zipfile_checked, True)
+
+        msgd('Test 03: Expired entry is removed')
+        ShapefileInspectionResult.objects.filter(id=self.cached_result.id).update(\
+                            created=timezone.now() - timedelta(days=365))
+        self.assertEqual(ShapefileInspectionCache.restore_inspection('a' * 32, self.shp_set), False)
+        self.assertEqual(ShapefileInspectionResult.objects.count(), 0)
+
+    def test_02_evictor(self):
+        """test_02_evictor"""
+        msgt(self.test_02_evictor.__doc__)
+
+        for idx in range(1, 4):
+            ShapefileInspectionResult(content_hash=str(idx) * 32).save()
+
+        msgd('Test 01: Trim to 2 entries, keeping the most recently used')
+        self.cached_result.save()   # most recently used
+        evictor = InspectionCacheEvictor(max_entries=2)
+        self.assertEqual(evictor.run_eviction(), 2)
+        self.assertEqual(ShapefileInspectionResult.objects.count(), 2)
+        self.assertEqual(ShapefileInspectionResult.objects.filter(content_hash='a' * 32).count(), 1)
+
+        msgd('Test 02: Remove expired entries')
+        ShapefileInspectionResult.objects.filter(content_hash='a' * 32).update(\
+                            created=timezone.now() - timedelta(days=365))
+        evictor = InspectionCacheEvictor()
+        self.assertEqual(evictor.run_eviction(), 1)
+        self.assertEqual(evictor.num_expired_removed, 1)
+        self.assertEqual(ShapefileInspectionResult.objects.count(), 1)
@@ -2,12 +2,17 @@ from os.path import abspath, dirname, isfile, join, isdir
 
 import unittest
 import json
+import struct
+import zipfile
+import cStringIO
 
 from django.test import TestCase
 from django.conf import settings
 
 from gc_apps.geo_utils.msg_util import *
 from gc_apps.gis_shapefiles.shapefile_zip_check import ShapefileZipCheck
+from gc_apps.gis_shapefiles.shapefile_deep_validator import ShapefileDeepValidator
+from gc_apps.gis_shapefiles.zip_member_classifier import ZipMemberClassifier
 from gc_apps.gis_shapefiles.models import ShapefileInfo
 
 from gc_apps.geo_utils.template_constants import ZIPCHECK_NO_SHAPEFILES_FOUND,\
@@ -146,3 +151,109 @@ class ShapefileBasicTests(TestCase):
         msgd('Check feature count')
         self.assertEqual(self.shp_set.number_of_features, 544)
         #self.assertEqual(zip_checker.get_shapefile_setnames(), ['buses'])
+
+    def test_03_shapefile_deep_validation(self):
+        """test_03_shapefile_deep_validation"""
+        msgt(self.test_03_shapefile_deep_validation.__doc__)
+
+        msgd('Test 01: Good shapefile, deep validation streaming from the .zip')
+        zip_checker = ShapefileZipCheck(self.get_test_file('t-05-good-shp-social_disorder_in_boston.zip'),
+                                        **dict(max_in_memory_size=0))
+        zip_checker.validate()
+        self.assertEqual(zip_checker.has_err, False)
+
+        shp_name = 'social_disorder_in_boston/social_disorder_in_boston_yqh'
+        self.assertEqual(zip_checker.can_load_in_memory(shp_name), False)
+
+        was_success = zip_checker.load_shapefile_from_open_zip(shp_name, self.shp_set,
+                                                               deep_validation=True)
+        self.assertEqual(was_success, True)
+
+        msgd('Check feature count and bounding box')
+        self.assertEqual(self.shp_set.number_of_features, 544)
+        bounding_box = [225470.00063935894, 886437.2096943911, 242303.560639359, 905485.1596943911]
+        self.assertEqual(self.shp_set.bounding_box, bounding_box)
+
+        msgd('Check validation report')
+        self.assertEqual(zip_checker.validation_report.is_valid(), True)
+        self.assertEqual(zip_checker.validation_report.number_of_records_checked, 544)
+
+        msgd('Nothing extracted to the scratch directory')
+        self.assertEqual(self.shp_set.extracted_shapefile_load_path, '')
+
+        msgd('Test 02: Check the records via a process pool')
+        report = zip_checker.get_deep_validation_report(shp_name,
+                                                        **dict(num_processes=2,
+                                                               chunk_size=100,
+                                                               min_records_for_pool=0))
+        self.assertEqual(report.is_valid(), True)
+        self.assertEqual(report.number_of_records_checked, 544)
+
+    def test_04_shapefile_deep_validation_problems(self):
+        """test_04_shapefile_deep_validation_problems"""
+        msgt(self.test_04_shapefile_deep_validation_problems.__doc__)
+
+        zip_obj = zipfile.ZipFile(self.get_test_file('t-05-good-shp-social_disorder_in_boston.zip'))
+        shp_name = 'social_disorder_in_boston/social_disorder_in_boston_yqh'
+        shp_content = zip_obj.read(shp_name + '.shp')
+
+        def get_report(shp_bytes):
+            return ShapefileDeepValidator(cStringIO.StringIO(shp_bytes),
+                                          zip_obj.open(shp_name + '.shx'),
+                                          zip_obj.open(shp_name + '.dbf')).get_report()
+
+        msgd('Test 01: Truncated .shp')
+        report = get_report(shp_content[:5000])
+        self.assertEqual(report.is_valid(), False)
+        self.assertEqual(report.file_problems, ['The .shp is truncated at record 14'])
+
+        msgd('Test 02: First polygon ring is not closed')
+        num_parts = struct.unpack('<i', shp_content[144:148])[0]
+        first_point_start = 152 + 4 * num_parts
+        broken_shp = shp_content[:first_point_start] +\
+                        struct.pack('<d', 1.0) +\
+                        shp_content[first_point_start + 8:]
+        report = get_report(broken_shp)
+        self.assertEqual(report.is_valid(), False)
+        self.assertEqual(report.record_problems,
+                         [dict(record_number=1, problem='Ring 0 is not closed')])
+
+    def test_05_multiple_shapefiles_allowed(self):
+        """test_05_multiple_shapefiles_allowed"""
+        msgt(self.test_05_multiple_shapefiles_allowed.__doc__)
+
+        msgd('Test 01: .zip file with 2 shapefiles, choose one')
+        zip_checker = ShapefileZipCheck(self.get_test_file('t-03a-2shapes.zip'),
+                                        **dict(allow_multiple_shapefiles=True))
+        zip_checker.validate()
+        self.assertEqual(zip_checker.has_err, False)
+        self.assertEqual(zip_checker.get_shapefile_setnames(), ['buses', 'planes'])
+
+        msg('The test files are empty, the set is chosen but fails to load')
+        was_success = zip_checker.load_shapefile_from_open_zip('PLANES', self.shp_set)
+        self.assertEqual(was_success, False)
+        self.assertEqual(self.shp_set.name, 'planes')
+        self.assertEqual(zip_checker.error_msg.startswith(\
+                            'Shapefile reader failed for file: planes.shp'), True)
+
+    def test_06_zip_member_classifier(self):
+        """test_06_zip_member_classifier"""
+        msgt(self.test_06_zip_member_classifier.__doc__)
+
+        member_names = ['roads/Roads.SHP', 'roads/roads.shx', 'roads/ROADS.dbf',
+                        'roads/Roads.prj', 'roads/Roads.shp.xml',
+                        '__MACOSX/roads/._Roads.shp', 'roads/', 'README.txt',
+                        'rivers/rivers.shp', 'rivers/rivers.dbf']
+        classifier = ZipMemberClassifier([zipfile.ZipInfo(x) for x in member_names])
+
+        msgd('Group by case-insensitive stem')
+        self.assertEqual(classifier.get_shapefile_set_names(), ['roads/Roads'])
+        self.assertEqual(classifier.get_shapefile_sets(),
+                         {'roads/Roads' : ['roads/ROADS.dbf', 'roads/Roads.SHP',
+                                           'roads/Roads.prj', 'roads/Roads.shp.xml',
+                                           'roads/roads.shx']})
+
+        msgd('Look up member names regardless of case')
+        self.assertEqual(classifier.get_member_name('roads/roads', '.DBF'), 'roads/ROADS.dbf')
+        self.assertEqual(classifier.get_member_name('roads/Roads', '.shp.xml'), 'roads/Roads.shp.xml')
+        self.assertEqual(classifier.get_member_name('rivers/rivers', '.shx'), None)
@@ -1,5 +1,6 @@
 from django.conf.urls import url
-from gc_apps.gis_shapefiles.views_02_visualize import ViewAjaxVisualizeShapefile
+from gc_apps.gis_shapefiles.views_02_visualize import ViewAjaxVisualizeShapefile,\
+    ViewAjaxVisualizeAllShapefiles
 from gc_apps.gis_shapefiles import views, views_mapit
 
 urlpatterns = [
@@ -13,4 +14,6 @@ urlpatterns = [
     url(r'^map-it/(?P<dataverse_token>\w{64})/$', views_mapit.view_mapit_incoming_token64, name="view_mapit_incoming_token64"),
 
     url(r'^ajax-visualize/(?P<shp_md5>\w{1,32})/$', ViewAjaxVisualizeShapefile.as_view(), name="view_ajax_attempt_visualization"),
+
+    url(r'^ajax-visualize-all/(?P<shp_md5>\w{1,32})/$', ViewAjaxVisualizeAllShapefiles.as_view(), name="view_ajax_attempt_visualization_all"),
 ]
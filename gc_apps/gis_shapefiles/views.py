@@ -17,6 +17,7 @@ from gc_apps.geo_utils.template_constants import ZIPCHECK_NO_SHAPEFILES_FOUND,\
 from gc_apps.gis_shapefiles.forms import ShapefileInfoForm
 from gc_apps.gis_shapefiles.models import ShapefileInfo, WORLDMAP_MANDATORY_IMPORT_EXTENSIONS
 from gc_apps.gis_shapefiles.shapefile_zip_check import ShapefileZipCheck
+from gc_apps.gis_shapefiles.inspection_cache import ShapefileInspectionCache
 from gc_apps.worldmap_connect.send_shapefile_service import SendShapefileService
 from gc_apps.worldmap_layers.models import WorldMapLayerInfo
 
@@ -169,6 +170,12 @@ def view_shapefile(request, shp_md5, **kwargs):
     #    - Should we move this out?  Check being done at Dataverse
     #    - Also, no need to move the file if viz already exists
     # -------------------------------------------
+    content_hash = None
+    if not shapefile_info.zipfile_checked:
+        # Was this same .zip inspected earlier?
+        content_hash = ShapefileInspectionCache.get_content_hash(shapefile_info)
+        ShapefileInspectionCache.restore_inspection(content_hash, shapefile_info)
+
     if not shapefile_info.zipfile_checked:
         logger.debug('zipfile_checked NOT checked')
 
@@ -211,6 +218,9 @@ def view_shapefile(request, shp_md5, **kwargs):
             zip_checker.close_zip()
             return render(request, 'shapefiles/main_outline_shp.html', d)
 
+        zip_checker.close_zip()
+        ShapefileInspectionCache.save_inspection(content_hash, shapefile_info)
+
     # -------------------------------------------
     # The examination failed
     # No shapefile was found in this .zip
@@ -0,0 +1,113 @@
+"""
+Group the members of a .zip archive into potential shapefile sets
+
+One pass over the archive's central directory (zipfile.ZipFile.infolist()).
+Members are matched against known shapefile component extensions--
+including multi-part extensions such as ".shp.xml"--and grouped by
+a case-insensitive stem.  Members with other extensions are skipped.
+
+    classifier = ZipMemberClassifier(zip_obj.infolist())
+    classifier.get_shapefile_set_names()
+        ['roads/Roads', 'rivers/rivers']
+    classifier.get_member_name('roads/Roads', '.shp')
+        'roads/Roads.SHP'
+"""
+from gc_apps.gis_shapefiles.models import WORLDMAP_MANDATORY_IMPORT_EXTENSIONS,\
+    SHAPEFILE_EXTENSION_SHP
+
+# Longest first, so that ".shp.xml" is checked before ".xml"
+SHAPEFILE_COMPONENT_EXTENSIONS = sorted(\
+            ['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.cpg',
+             '.qix', '.fbn', '.fbx', '.ain', '.aih', '.atx', '.ixs',
+             '.mxs', '.shp.xml', '.xml', '.qpj'],
+            key=len, reverse=True)
+
+
+class ZipMemberClassifier(object):
+    """
+    Index the members of a .zip by (lowercase stem, lowercase extension)
+    """
+    def __init__(self, zip_info_list, required_extensions=None):
+        """
+        :param zip_info_list: list of zipfile.ZipInfo objects
+        :param required_extensions: extensions needed for a complete set.
+            Defaults to WORLDMAP_MANDATORY_IMPORT_EXTENSIONS
+        """
+        if required_extensions is None:
+            required_extensions = WORLDMAP_MANDATORY_IMPORT_EXTENSIONS
+        self.required_extensions = [ext.lower() for ext in required_extensions]
+
+        # { lowercase stem : { lowercase extension : member name } }
+        self.member_index = {}
+
+        # { lowercase stem : stem as it appears in the archive }
+        self.stem_names = {}
+
+        self.classify_members(zip_info_list)
+
+    @staticmethod
+    def split_member_name(member_name):
+        """
+        Split a member name into (stem, lowercase extension) using
+        the known shapefile extensions.
+
+        'roads/Roads.SHP.xml' -> ('roads/Roads', '.shp.xml')
+        'README.md' -> (None, None)
+        """
+        lower_name = member_name.lower()
+        for ext in SHAPEFILE_COMPONENT_EXTENSIONS:
+            if lower_name.endswith(ext) and len(member_name) > len(ext):
+                return (member_name[:-len(ext)], ext)
+        return (None, None)
+
+    def classify_members(self, zip_info_list):
+        """Build the index, skipping directories and "__" names (e.g. __MACOSX)"""
+
+        for zip_info in zip_info_list:
+            member_name = zip_info.filename
+            if member_name.startswith('__') or member_name.endswith('/'):
+                continue
+
+            (stem, ext) = ZipMemberClassifier.split_member_name(member_name)
+            if stem is None:
+                continue
+
+            stem_key = stem.lower()
+            self.member_index.setdefault(stem_key, {})[ext] = member_name
+
+            # Name the set after the .shp member
+            if ext == SHAPEFILE_EXTENSION_SHP or stem_key not in self.stem_names:
+                self.stem_names[stem_key] = stem
+
+    def is_complete_set(self, stem_key):
+        members = self.member_index.get(stem_key, {})
+        return all(ext in members for ext in self.required_extensions)
+
+    def get_shapefile_set_names(self):
+        """Return the sorted names of the complete shapefile sets"""
+        return sorted([self.stem_names[stem_key]\
+                       for stem_key in self.member_index\
+                       if self.is_complete_set(stem_key)])
+
+    def get_shapefile_sets(self):
+        """
+        Return { set name : [member names] } for the complete shapefile sets
+        """
+        shapefile_sets = {}
+        for set_name in self.get_shapefile_set_names():
+            members = self.member_index[set_name.lower()]
+            shapefile_sets[set_name] = sorted(members.values())
+        return shapefile_sets
+
+    def get_member_name(self, set_name, extension):
+        """
+        Return the archive member name for a set name and extension,
+        regardless of case.  Returns None if not found.
+
+        ('roads/roads', '.SHP') -> 'roads/Roads.shp'
+        """
+        if set_name is None or extension is None:
+            return None
+
+        members = self.member_index.get(set_name.lower(), {})
+        return members.get(extension.lower())
@@ -35,11 +35,11 @@ class TabularFileInfoAdmin(GISDataFileAdmin):
         sections_name = [ x[0] for x in fs if x is not None and len(x) > 0 and not x[0] == '']
         if not 'Shapefile Info' in sections_name:
             fs = [ ('Tabular Details', {
-               'fields': ('name', ('is_file_readable',  'delimiter'))
+               'fields': ('name', ('is_file_readable',  'delimiter', 'delimiter_chosen', 'file_encoding'))
                     })\
                     , ('Tabular Info', {
                        'fields': (('num_rows', 'num_columns'),\
-                            'has_header_row', 'column_names',\
+                            'has_header_row', 'column_names', 'column_schema',\
                             'chosen_column', 'dv_join_file')
                     })\
                  ] + fs
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_tabular', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tabularfileinfo',
+            name='file_encoding',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tabularfileinfo',
+            name='column_schema',
+            field=jsonfield.fields.JSONField(blank=True, help_text=b'Saved as a json list of column types: [{"name": .., "dtype": .., "numeric_text": ..}, ...]', null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def clear_unsniffed_header_rows(apps, schema_editor):
+    """
+    has_header_row wasn't used to read files before the
+    TabularFileSniffer--let the sniffer fill it in
+    """
+    TabularFileInfo = apps.get_model('gis_tabular', 'TabularFileInfo')
+    TabularFileInfo.objects.filter(column_schema__isnull=True)\
+                           .update(has_header_row=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_tabular', '0002_tabularfileinfo_column_schema'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tabularfileinfo',
+            name='has_header_row',
+            field=models.NullBooleanField(default=None, help_text=b'If empty, set by the TabularFileSniffer'),
+        ),
+        migrations.RunPython(clear_unsniffed_header_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gis_tabular', '0003_tabularfileinfo_has_header_row'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tabularfileinfo',
+            name='delimiter_chosen',
+            field=models.BooleanField(default=False, help_text=b'Check if the delimiter was chosen by a user. Otherwise it is set by the TabularFileSniffer'),
+        ),
+    ]
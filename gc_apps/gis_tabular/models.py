@@ -12,6 +12,8 @@ from django.db import models
 from gc_apps.core.models import TimeStampedModel
 
 from gc_apps.gis_basic_file.models import GISDataFile, DV_FILE_SYSTEM_STORAGE
+from gc_apps.gis_tabular.parsed_table_cache import ParsedTableCache
+from gc_apps.gis_tabular.unmatched_row_store import UnmatchedRowStore
 from gc_apps.layer_types.static_vals import TYPE_JOIN_LAYER, TYPE_LAT_LNG_LAYER
 from gc_apps.worldmap_layers.models import WorldMapLayerInfo
 
@@ -28,6 +30,9 @@ class TabularFileInfo(GISDataFile):
     name = models.CharField(max_length=255, blank=True)        #   file basename
 
     delimiter = models.CharField(max_length=10, default=DEFAULT_TABULAR_DELIMITER)
+    delimiter_chosen = models.BooleanField(default=False,\
+                help_text=('Check if the delimiter was chosen by a user.'
+                           ' Otherwise it is set by the TabularFileSniffer'))
 
     is_file_readable = models.BooleanField(default=False)
 
@@ -36,8 +41,15 @@ class TabularFileInfo(GISDataFile):
 
     column_names = jsonfield.JSONField(blank=True, help_text='Saved as a json list')
 
+    # Set by the TabularFileSniffer
+    file_encoding = models.CharField(max_length=20, blank=True)
+    column_schema = jsonfield.JSONField(blank=True, null=True,\
+                help_text=('Saved as a json list of column types: '
+                           '[{"name": .., "dtype": .., "numeric_text": ..}, ...]'))
+
     # User mediated choices
-    has_header_row = models.BooleanField(default=True)
+    has_header_row = models.NullBooleanField(default=None,\
+                help_text='If empty, set by the TabularFileSniffer')
     chosen_column = models.CharField(max_length=155, blank=True)
 
     dv_join_file = models.FileField(upload_to='dv_files/join/%Y/%m/%d',\
@@ -62,6 +74,12 @@ class TabularFileInfo(GISDataFile):
 
         super(TabularFileInfo, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        """Remove any cached, parsed versions of the file"""
+        ParsedTableCache.remove_cached_tables(self)
+
+        super(TabularFileInfo, self).delete(*args, **kwargs)
+
     def __unicode__(self):
         if self.name:
             return self.name
@@ -198,6 +216,12 @@ class WorldMapJoinLayerInfo(WorldMapTabularLayerInfo):
         self.md5 = md5('%s-%s' % (self.id, self.layer_name)).hexdigest()
         super(WorldMapJoinLayerInfo, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        """Remove the materialized unmatched rows, if any"""
+        UnmatchedRowStore.remove_rows(self)
+
+        super(WorldMapJoinLayerInfo, self).delete(*args, **kwargs)
+
     class Meta:
         verbose_name = 'WorldMap Tabular Join Layer Information'
         verbose_name_plural = verbose_name
@@ -287,6 +311,12 @@ class WorldMapLatLngInfo(WorldMapTabularLayerInfo):
         self.md5 = md5('%s-%s' % (self.id, self.layer_name)).hexdigest()
         super(WorldMapLatLngInfo, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        """Remove the materialized unmapped rows, if any"""
+        UnmatchedRowStore.remove_rows(self)
+
+        super(WorldMapLatLngInfo, self).delete(*args, **kwargs)
+
     class Meta:
         verbose_name = 'WorldMap Latitude/Longitude Layer Information'
         verbose_name_plural = verbose_name
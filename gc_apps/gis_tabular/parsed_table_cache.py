@@ -0,0 +1,305 @@
+"""
+Cache of parsed tabular files
+
+A tabular file is parsed with pd.read_csv once; the DataFrame is saved
+in a columnar format and reloaded by later steps--stats, join column
+formatting, unmatched row reports.
+
+    - Files are saved under "parsed_tables/(TabularFileInfo.md5)/"
+        in the DV_FILE_SYSTEM_STORAGE
+    - The cache key is the md5 of the dv_file (and the delimiter and
+        column_schema).  When the dv_file changes, the old entry is removed.
+        Without a DataverseFileBlob, the md5 is saved in the cache
+        directory--it's recomputed only when the file's size or
+        modification time changes
+    - The file is read with the TabularFileSniffer's results (explicit dtypes)
+    - Feather is used if pyarrow is installed, otherwise a pandas pickle
+        per column.  Either way, only the requested columns are loaded
+    - On a cache miss, only the requested columns are parsed.  The
+        cache is filled when the whole table is read
+
+    df = ParsedTableCache.read_table(tabular_info, columns=['BG_ID_10'])
+"""
+import os
+import json
+import shutil
+import logging
+from hashlib import md5
+
+import pandas as pd
+
+from django.conf import settings
+
+from gc_apps.geo_utils.file_hasher import hashfile
+from gc_apps.gis_basic_file.models import DV_FILE_SYSTEM_STORAGE
+from gc_apps.gis_tabular.tabular_sniffer import TabularFileSniffer
+
+try:
+    import pyarrow  # used by DataFrame.to_feather
+    FEATHER_AVAILABLE = hasattr(pd, 'read_feather')
+except ImportError:
+    FEATHER_AVAILABLE = False
+
+LOGGER = logging.getLogger(__name__)
+
+PARSED_TABLE_DIRECTORY_NAME = 'parsed_tables'
+
+FEATHER_EXTENSION = '.feather'
+PICKLE_EXTENSION = '.pkl'
+
+# Pickle fallback: "(cache key).columns/" holds one pickle per column and
+#   the list of column names--written last, once the pickles are saved
+PICKLE_DIRECTORY_SUFFIX = '.columns'
+COLUMN_LIST_FILENAME = 'columns.json'
+
+# md5 of the dv_file, with the file's name, size and modification time
+CHECKSUM_FILENAME = 'checksum.json'
+
+
+class ParsedTableCache(object):
+    """Static methods for reading TabularFileInfo files via the cache"""
+
+    @staticmethod
+    def is_cache_enabled(tabular_info):
+        if not getattr(settings, 'TABULAR_PARSED_TABLE_CACHE', True):
+            return False
+        return bool(tabular_info.md5)
+
+    @staticmethod
+    def get_cache_directory(tabular_info):
+        return DV_FILE_SYSTEM_STORAGE.path(\
+                    os.path.join(PARSED_TABLE_DIRECTORY_NAME, tabular_info.md5))
+
+    @staticmethod
+    def get_file_checksum(tabular_info):
+        """
+        md5 of the dv_file.  Saved in the cache directory so the
+        file isn't hashed again until it changes
+        """
+        file_path = tabular_info.get_dv_file_fullpath()
+        file_stat = os.stat(file_path)
+        file_info = dict(dv_file_name=tabular_info.dv_file.name,\
+                         size=file_stat.st_size,\
+                         mtime=file_stat.st_mtime)
+
+        checksum_path = os.path.join(\
+                            ParsedTableCache.get_cache_directory(tabular_info),\
+                            CHECKSUM_FILENAME)
+        try:
+            with open(checksum_path, 'r') as checksum_fh:
+                saved_info = json.load(checksum_fh)
+            checksum = saved_info.pop('checksum', None)
+            if checksum and saved_info == file_info:
+                return checksum
+        except (IOError, OSError, ValueError):
+            pass    # not saved yet
+
+        file_info['checksum'] = hashfile(file_path)
+        try:
+            if not os.path.isdir(os.path.dirname(checksum_path)):
+                os.makedirs(os.path.dirname(checksum_path))
+            with open(checksum_path, 'w') as checksum_fh:
+                json.dump(file_info, checksum_fh)
+        except (IOError, OSError) as ex_obj:
+            LOGGER.error('Failed to save the checksum of tabular file %s: %s',\
+                         tabular_info.id, ex_obj)
+
+        return file_info['checksum']
+
+    @staticmethod
+    def get_cache_key(tabular_info):
+        """
+        md5 of the dv_file--from its DataverseFileBlob, if available--
+        combined with the delimiter and column_schema
+        """
+        blob = tabular_info.dv_file_blob
+        if blob is not None:
+            checksum = blob.checksum
+        else:
+            checksum = ParsedTableCache.get_file_checksum(tabular_info)
+
+        return md5('%s%s%s' % (checksum,\
+                               tabular_info.delimiter,\
+                               json.dumps(tabular_info.column_schema,\
+                                          sort_keys=True))).hexdigest()
+
+    @staticmethod
+    def read_csv(tabular_info, columns=None):
+        """
+        Parse the dv_file.  May raise pd.parser.CParserError
+
+        :param columns: list of column names to parse (usecols).  Default: all
+
+        Uses the column_schema's dtypes.  If a value doesn't fit
+        (e.g. rows past those sniffed), pandas infers the types instead.
+        """
+        read_kwargs = TabularFileSniffer.get_read_csv_kwargs(tabular_info, columns)
+        try:
+            return pd.read_csv(tabular_info.get_dv_file_fullpath(), **read_kwargs)
+        except pd.parser.CParserError:
+            raise   # (a ValueError) the file itself can't be parsed
+        except (ValueError, TypeError) as ex_obj:
+            if not 'dtype' in read_kwargs:
+                raise
+            LOGGER.warn('Column types for tabular file %s did not fit: %s',\
+                        tabular_info.id, ex_obj)
+
+        read_kwargs.pop('dtype')
+        return pd.read_csv(tabular_info.get_dv_file_fullpath(), **read_kwargs)
+
+    @staticmethod
+    def read_table(tabular_info, columns=None):
+        """
+        Return the dv_file as a DataFrame.  On a cache miss the file
+        is parsed--only the requested columns--and, if all columns
+        were read, saved to the cache.
+
+        :param columns: list of column names to return.  Default: all
+        :returns: pandas DataFrame.  May raise pd.parser.CParserError
+        """
+        if not ParsedTableCache.is_cache_enabled(tabular_info):
+            df = ParsedTableCache.read_csv(tabular_info, columns)
+            return df[columns] if columns else df
+
+        cache_key = ParsedTableCache.get_cache_key(tabular_info)
+
+        df = ParsedTableCache.load_cached_table(tabular_info, cache_key, columns)
+        if df is not None:
+            return df
+
+        if columns:
+            # Don't parse every column to fill the cache
+            return ParsedTableCache.read_csv(tabular_info, columns)[columns]
+
+        df = ParsedTableCache.read_csv(tabular_info)
+        ParsedTableCache.save_cached_table(tabular_info, cache_key, df)
+
+        return df[columns] if columns else df
+
+    @staticmethod
+    def load_cached_table(tabular_info, cache_key, columns=None):
+        """
+        :returns: DataFrame or None if the table isn't cached
+        """
+        cache_base = os.path.join(\
+                        ParsedTableCache.get_cache_directory(tabular_info), cache_key)
+
+        feather_path = cache_base + FEATHER_EXTENSION
+        pickle_directory = cache_base + PICKLE_DIRECTORY_SUFFIX
+
+        try:
+            if FEATHER_AVAILABLE and os.path.isfile(feather_path):
+                try:
+                    return pd.read_feather(feather_path, columns=columns)
+                except TypeError:
+                    # Older pandas: no "columns" argument
+                    df = pd.read_feather(feather_path)
+                    return df[columns] if columns else df
+
+            if os.path.isfile(os.path.join(pickle_directory, COLUMN_LIST_FILENAME)):
+                return ParsedTableCache.load_pickled_columns(pickle_directory, columns)
+        except KeyError:
+            # Missing column: let the caller report it
+            raise
+        except Exception as ex_obj:
+            LOGGER.error('Failed to load parsed table %s: %s', cache_base, ex_obj)
+
+        return None
+
+    @staticmethod
+    def load_pickled_columns(pickle_directory, columns=None):
+        """
+        :returns: DataFrame of the requested columns.
+            Raises KeyError for an unknown column
+        """
+        with open(os.path.join(pickle_directory, COLUMN_LIST_FILENAME), 'r') as column_fh:
+            column_names = json.load(column_fh)
+
+        if not columns:
+            columns = column_names
+
+        series_list = []
+        for column_name in columns:
+            if not column_name in column_names:
+                raise KeyError(column_name)
+            pickle_path = os.path.join(pickle_directory, '%s%s' %\
+                                    (column_names.index(column_name), PICKLE_EXTENSION))
+            series_list.append(pd.read_pickle(pickle_path))
+
+        if not series_list:
+            return pd.DataFrame()
+
+        return pd.concat(series_list, axis=1)
+
+    @staticmethod
+    def save_pickled_columns(pickle_directory, df):
+        """Save each column of the DataFrame to its own pickle"""
+        os.makedirs(pickle_directory)
+
+        for idx, column_name in enumerate(df.columns):
+            df[column_name].to_pickle(os.path.join(pickle_directory,\
+                                                   '%s%s' % (idx, PICKLE_EXTENSION)))
+
+        with open(os.path.join(pickle_directory, COLUMN_LIST_FILENAME), 'w') as column_fh:
+            json.dump(df.columns.tolist(), column_fh)
+
+    @staticmethod
+    def remove_cache_entries(cache_directory):
+        """Remove the cached tables, keeping the saved checksum"""
+        for entry_name in os.listdir(cache_directory):
+            if entry_name == CHECKSUM_FILENAME:
+                continue
+            entry_path = os.path.join(cache_directory, entry_name)
+            if os.path.isdir(entry_path):
+                shutil.rmtree(entry_path)
+            else:
+                os.remove(entry_path)
+
+    @staticmethod
+    def save_cached_table(tabular_info, cache_key, df):
+        """
+        Save the DataFrame, replacing any other entries for this
+        TabularFileInfo.  Errors are logged, not raised
+        """
+        cache_directory = ParsedTableCache.get_cache_directory(tabular_info)
+
+        try:
+            if os.path.isdir(cache_directory):
+                ParsedTableCache.remove_cache_entries(cache_directory)
+            else:
+                os.makedirs(cache_directory)
+        except (IOError, OSError) as ex_obj:
+            LOGGER.error('Failed to create parsed table directory: %s', ex_obj)
+            return False
+
+        cache_base = os.path.join(cache_directory, cache_key)
+
+        if FEATHER_AVAILABLE:
+            try:
+                df.to_feather(cache_base + FEATHER_EXTENSION)
+                return True
+            except Exception as ex_obj:
+                # e.g. object columns with mixed types
+                LOGGER.warn('Feather save failed, using pickle: %s', ex_obj)
+                if os.path.isfile(cache_base + FEATHER_EXTENSION):
+                    os.remove(cache_base + FEATHER_EXTENSION)
+
+        pickle_directory = cache_base + PICKLE_DIRECTORY_SUFFIX
+        try:
+            ParsedTableCache.save_pickled_columns(pickle_directory, df)
+        except (IOError, OSError) as ex_obj:
+            LOGGER.error('Failed to save parsed table: %s', ex_obj)
+            shutil.rmtree(pickle_directory, ignore_errors=True)
+            return False
+
+        return True
+
+    @staticmethod
+    def remove_cached_tables(tabular_info):
+        """Delete the cache directory for this TabularFileInfo"""
+        if not tabular_info.md5:
+            return
+
+        cache_directory = ParsedTableCache.get_cache_directory(tabular_info)
+        if os.path.isdir(cache_directory):
+            shutil.rmtree(cache_directory, ignore_errors=True)
@@ -6,15 +6,11 @@
 from __future__ import print_function
 import json
 
-import urllib2
-
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
-
 from shared_dataverse_information.dataverse_info.forms import DataverseInfoValidationForm
 from gc_apps.registered_dataverse.registered_dataverse_helper import find_registered_dataverse
 from gc_apps.gis_tabular.models import TabularFileInfo
 from gc_apps.gis_tabular.models import WorldMapTabularLayerInfo
+from gc_apps.gis_basic_file.dv_file_blob_store import DataverseFileBlobStore
 
 from gc_apps.geo_utils.msg_util import *
 from gc_apps.geo_utils.error_result_msg import ErrResultMsg, FAILED_NOT_A_REGISTERED_DATAVERSE
@@ -142,9 +138,17 @@ def get_tabular_file_from_dv_api_info(dv_session_token, dataverse_info_dict):
 
         # delete the rest
         if len(existing_sets) > 0:
-            # delete older TabularFileInfo objects
-            TabularFileInfo.objects.filter(id__in=existing_tabular_info_ids).delete()
+            # delete older TabularFileInfo objects, one at a time to release the stored files
+            for old_tabular_info in TabularFileInfo.objects.filter(id__in=existing_tabular_info_ids):
+                old_tabular_info.delete()
+
 
+    #------------------------------
+    # Add session token to the download url.  Gives permission to download/retrieve the file
+    #   - http://localhost:8080/api/access/datafile/FILEID?key=YOURAPIKEY
+    #------------------------------
+    datafile_download_url = dataverse_info_dict.get('datafile_download_url', '')
+    datafile_download_url = '%s?key=%s' % (datafile_download_url, dv_session_token)
 
     #------------------------------
     # (5) Get or create a new TabularFileInfo object
@@ -167,12 +171,12 @@ def get_tabular_file_from_dv_api_info(dv_session_token, dataverse_info_dict):
         tabular_info.save()
         msg('tabular_info info saved')
 
-        # If the file is still available, return it
-        if tabular_info.is_dv_file_available():
+        # If the file is still available and unchanged on the Dataverse, return it
+        if DataverseFileBlobStore.is_local_copy_current(tabular_info, datafile_download_url):
             add_worldmap_layerinfo_if_exists(tabular_info)
             return True, tabular_info.md5
         else:
-            # But the file isn't there!!  Delete ShapefileInfo and make a new one
+            # But the file isn't there or has changed!!  Delete TabularFileInfo and make a new one
             tabular_info.delete()
 
     except TabularFileInfo.DoesNotExist:
@@ -195,27 +199,16 @@ def get_tabular_file_from_dv_api_info(dv_session_token, dataverse_info_dict):
     #------------------------------
     # Download and attach file
     #------------------------------
-    datafile_download_url = dataverse_info_dict.get('datafile_download_url', '')
-
-    # Add session token.  Gives permission to download/retrieve the file
-    #   - http://localhost:8080/api/access/datafile/FILEID?key=YOURAPIKEY
-    #
-    datafile_download_url = '%s?key=%s' % (datafile_download_url, dv_session_token)
     msg('datafile_download_url: %s' % datafile_download_url)
     datafile_filename = dataverse_info_dict.get('datafile_label', '')
 
-    img_temp = NamedTemporaryFile(delete=True)
-
-    try:
-        img_temp.write(urllib2.urlopen(datafile_download_url).read())
-    except urllib2.HTTPError as e:
+    # Link a stored copy of the file or stream it into the dv_file storage
+    #
+    success, err_msg = DataverseFileBlobStore.get_dv_file(tabular_info,\
+                                    datafile_download_url, datafile_filename)
+    if not success:
         tabular_info.delete() # clear tabular info
-        err_msg = 'Failed to download tabular file. HTTPError: %s \n\nurl: %s' % (str(e), datafile_download_url)
         return False, ErrResultMsg(None, err_msg)
-    img_temp.flush()
-
-    tabular_info.dv_file.save(datafile_filename, File(img_temp))
-    tabular_info.save()
     add_worldmap_layerinfo_if_exists(tabular_info)
 
     return True, tabular_info.md5
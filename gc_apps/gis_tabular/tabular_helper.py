@@ -1,10 +1,12 @@
-from os.path import isfile
+from os.path import isfile, getsize
 import sys
 import csv
 import json
 import pandas as pd
 
 from gc_apps.gis_tabular.models import TabularFileInfo
+from gc_apps.gis_tabular.parsed_table_cache import ParsedTableCache
+from gc_apps.gis_tabular.tabular_sniffer import TabularFileSniffer
 import unicodedata
 
 import logging
@@ -17,13 +19,33 @@ unicodedata.normalize('NFKD', title).encode('ascii','ignore')
 
 NUM_PREVIEW_ROWS = 5
 
+# Files larger than this are examined using a sample of rows
+#   and a newline count instead of reading the whole file
+STREAMING_STATS_MIN_FILE_SIZE = 25 * 1024 * 1024 # 25 MB
+
+# Rows read for the preview and column type inference (streaming mode)
+TYPE_INFERENCE_SAMPLE_ROWS = 10000
+
+# Bytes read at a time when counting rows
+ROW_COUNT_BLOCK_SIZE = 1024 * 1024 # 1 MB
+
 class TabFileStats(object):
 
-    def __init__(self, fname, delim=',', tabular_info=None):
+    def __init__(self, fname, delim=',', tabular_info=None, streaming=None):
+        """
+        streaming: True - read a sample and count rows via newlines
+                   False - read the whole file
+                   None - use streaming if the file is larger than
+                          STREAMING_STATS_MIN_FILE_SIZE
+        """
         assert isfile(fname), "TabFileStats.  File does not exist: %s" % fname
 
         self.fname = fname
 
+        if streaming is None:
+            streaming = getsize(fname) > STREAMING_STATS_MIN_FILE_SIZE
+        self.streaming = streaming
+
         self.delimiter = str(delim)
         #print 'init delim:', self.delimiter, len(self.delimiter)
         #'\t' #str(delim)  #b','    #delim
@@ -33,6 +55,7 @@ class TabFileStats(object):
         self.num_rows = 0
         self.num_cols = 0
         self.preview_rows = []
+        self.column_dtypes = {}     # { column name : pandas dtype name }
 
         self.error_found = False
         self.error_message = None
@@ -61,6 +84,12 @@ class TabFileStats(object):
 
         assert tabular_info.dv_file is not None, "tabular_info.file cannot be None"
 
+        # Detect the delimiter, encoding and column types (first time only)
+        #
+        success, err_msg = TabularFileSniffer.sniff_tabular_info(tabular_info)
+        if not success:
+            logger.error('Tabular file %s not sniffed: %s', tabular_info.id, err_msg)
+
         return TabFileStats(fname=tabular_info.dv_file.file.name\
                             , delim=tabular_info.delimiter\
                             , tabular_info=tabular_info
@@ -70,12 +99,30 @@ class TabFileStats(object):
         global NUM_PREVIEW_ROWS
         """
         Open the file: collect num_rows, num_cols and preview_row data
-        """
 
+        In streaming mode, only the first TYPE_INFERENCE_SAMPLE_ROWS are
+        parsed.  The row count is from a newline scan, so memory use doesn't
+        grow with the file.  (Quoted values containing newlines will
+        inflate the count.)
+
+        Otherwise, a tabular_info file is read via the ParsedTableCache
+
+        A tabular_info file is read with the column types found by the
+        TabularFileSniffer
+        """
         try:
-            df = pd.read_csv(self.fname,\
-                        sep=self.delimiter,\
-                        )
+            if self.streaming and self.tabular_info is not None:
+                df = pd.read_csv(self.fname,\
+                                 nrows=TYPE_INFERENCE_SAMPLE_ROWS,\
+                                 **TabularFileSniffer.get_read_csv_kwargs(self.tabular_info))
+            elif self.streaming:
+                df = pd.read_csv(self.fname,\
+                                 sep=self.delimiter,\
+                                 nrows=TYPE_INFERENCE_SAMPLE_ROWS)
+            elif self.tabular_info is not None:
+                df = ParsedTableCache.read_table(self.tabular_info)
+            else:
+                df = pd.read_csv(self.fname, sep=self.delimiter)
         except pd.parser.CParserError as e:
             err_msg = ('Could not process the file. '
                         'At least one row had too many values. '
@@ -87,7 +134,15 @@ class TabFileStats(object):
 
         self.column_names = df.columns.values.tolist()
         self.num_cols = len(self.column_names)
-        self.num_rows = len(df.index)
+        self.column_dtypes = dict([(col_name, df[col_name].dtype.name)\
+                                   for col_name in self.column_names])
+
+        if self.streaming:
+            self.num_rows = TabFileStats.count_data_rows(self.fname)
+            if self.tabular_info is not None and self.tabular_info.has_header_row is False:
+                self.num_rows += 1
+        else:
+            self.num_rows = len(df.index)
 
         self.preview_rows = df.head(NUM_PREVIEW_ROWS).values.tolist()
 
@@ -98,11 +153,58 @@ class TabFileStats(object):
         self.stats_collected = True
 
 
+    @staticmethod
+    def count_line_endings(text):
+        """Count '\r\n', '\n' and old Mac-style '\r' line endings"""
+        return text.count('\n') + text.count('\r') - text.count('\r\n')
+
+    @staticmethod
+    def count_data_rows(fname):
+        """
+        Count the lines after the header row, reading
+        ROW_COUNT_BLOCK_SIZE bytes at a time.
+        Lines may end in '\r\n', '\n' or '\r'.
+        Trailing blank lines aren't counted.
+        """
+        num_line_endings = 0
+        num_trailing = 0    # line endings at the end of the file
+        last_block = ''
+        with open(fname, 'rb') as fh:
+            while True:
+                block = fh.read(ROW_COUNT_BLOCK_SIZE)
+                if not block:
+                    break
+                block_line_endings = TabFileStats.count_line_endings(block)
+                # A '\r\n' split across two blocks would be counted twice
+                if last_block.endswith('\r') and block.startswith('\n'):
+                    block_line_endings -= 1
+
+                num_line_endings += block_line_endings
+                stripped_block = block.rstrip('\r\n')
+                if stripped_block:
+                    num_trailing = TabFileStats.count_line_endings(\
+                                        block[len(stripped_block):])
+                else:
+                    num_trailing += block_line_endings
+                last_block = block
+
+        # Don't count trailing line endings
+        num_line_endings -= num_trailing
+
+        # (number of lines) - (header row) == remaining line endings
+        return max(num_line_endings, 0)
+
     def special_case_col_formatting(self, df):
-        """Will eventually need to be factored out"""
+        """
+        Only used for files without a column_schema.  Otherwise,
+        identifier columns are already read as strings
+        """
         if df is None:
             return
 
+        if self.tabular_info is not None and self.tabular_info.column_schema:
+            return
+
         # Treat census block groups as string instead of numbers
         #   - 12-digit numeric code that may receive zero-padding
         #
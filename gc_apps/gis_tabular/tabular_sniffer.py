@@ -0,0 +1,439 @@
+"""
+Detect the format of a tabular file in one streaming pass:
+
+    - delimiter: tab, comma, semicolon or pipe
+    - encoding: utf-8 (with or without a BOM), otherwise latin-1
+    - header row: present unless the first row looks like data
+    - column types: int64, float64, bool or str
+
+Numeric-looking identifiers with leading zeros (FIPS codes, census
+tracts, zip codes, etc) are typed "str" so the zeros aren't lost.
+
+The results are saved on the TabularFileInfo--see update_tabular_info()--
+and used to read the file with an explicit dtype.  A delimiter chosen by
+a user (delimiter_chosen) or a header row choice already on the
+TabularFileInfo is used rather than detected:
+
+    TabularFileSniffer.sniff_tabular_info(tabular_info)
+
+    df = pd.read_csv(tabular_info.get_dv_file_fullpath(),\
+                     **TabularFileSniffer.get_read_csv_kwargs(tabular_info))
+"""
+import csv
+import re
+import logging
+from itertools import chain
+
+from django.conf import settings
+
+LOGGER = logging.getLogger(__name__)
+
+CANDIDATE_DELIMITERS = ('\t', ',', ';', '|')
+
+# Wins ties between candidate delimiters
+DEFAULT_DELIMITER = '\t'
+
+# Lines used to choose the delimiter
+DELIMITER_SAMPLE_LINES = 100
+
+# Data rows examined for column types.  (Overridden by the
+#   TABULAR_SNIFF_MAX_ROWS setting; None means the whole file)
+SNIFF_MAX_ROWS = 200000
+
+UTF8_BOM = '\xef\xbb\xbf'
+
+ENCODING_UTF8 = 'utf-8'
+ENCODING_UTF8_BOM = 'utf-8-sig'
+ENCODING_LATIN1 = 'latin-1'
+
+# Encodings passed on to pd.read_csv.  Plain utf-8 files are read
+#   as before, without an explicit encoding
+READ_CSV_ENCODINGS = (ENCODING_UTF8_BOM, ENCODING_LATIN1)
+
+# Column types
+DTYPE_INT = 'int64'
+DTYPE_FLOAT = 'float64'
+DTYPE_BOOL = 'bool'
+DTYPE_STR = 'str'
+
+NUMERIC_DTYPES = (DTYPE_INT, DTYPE_FLOAT)
+
+# pandas dtype for each column type
+READ_CSV_DTYPES = {DTYPE_INT: 'int64',
+                   DTYPE_FLOAT: 'float64',
+                   DTYPE_BOOL: 'bool',
+                   DTYPE_STR: object}
+
+# Values pandas reads as missing (NaN) by default
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN',\
+                       '-NaN', '-nan', '1.#IND', '1.#QNAN', 'N/A', 'NA',\
+                       'NULL', 'NaN', 'nan', 'null'])
+
+BOOL_VALUES = frozenset(['True', 'TRUE', 'true', 'False', 'FALSE', 'false'])
+
+INT_PATTERN = re.compile(r'^[+-]?(\d+)$')
+FLOAT_PATTERN = re.compile(r'^[+-]?(?:(\d+)\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$')
+
+INT64_MAX = 2**63 - 1
+
+# Name of column n when the file has no header row
+NO_HEADER_COLUMN_NAME = 'column_%d'
+
+
+class ColumnTypeTracker(object):
+    """
+    Narrow a column's type as values are added:
+        bool -> str, int -> float -> str.  str is final.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.dtype = None           # None until a non-missing value is seen
+        self.has_missing = False
+
+        # All values are numbers but kept as strings.
+        #   e.g. leading zeros or too large for an int64
+        self.is_numeric_text = False
+
+    def is_final(self):
+        """No later value can change the type"""
+        return self.dtype == DTYPE_STR and not self.is_numeric_text
+
+    @staticmethod
+    def has_leading_zero(digits):
+        return len(digits) > 1 and digits[0] == '0'
+
+    @staticmethod
+    def get_value_type(val):
+        """
+        :returns: (column type, is numeric text)
+        """
+        int_match = INT_PATTERN.match(val)
+        if int_match:
+            if ColumnTypeTracker.has_leading_zero(int_match.group(1)):
+                return DTYPE_STR, True
+            if abs(int(val)) > INT64_MAX:
+                return DTYPE_STR, True
+            return DTYPE_INT, False
+
+        float_match = FLOAT_PATTERN.match(val)
+        if float_match:
+            if ColumnTypeTracker.has_leading_zero(float_match.group(1) or ''):
+                return DTYPE_STR, True
+            return DTYPE_FLOAT, False
+
+        if val in BOOL_VALUES:
+            return DTYPE_BOOL, False
+
+        return DTYPE_STR, False
+
+    def add_value(self, val):
+        if val in NA_VALUES:
+            self.has_missing = True
+            return
+
+        val_type, is_numeric_text = ColumnTypeTracker.get_value_type(val)
+
+        if self.dtype is None:
+            self.dtype = val_type
+            self.is_numeric_text = is_numeric_text
+        elif val_type == self.dtype:
+            self.is_numeric_text = self.is_numeric_text and is_numeric_text
+        elif self.dtype in NUMERIC_DTYPES and val_type in NUMERIC_DTYPES:
+            self.dtype = DTYPE_FLOAT
+        elif self.dtype in NUMERIC_DTYPES and is_numeric_text:
+            self.dtype = DTYPE_STR
+            self.is_numeric_text = True
+        elif self.dtype == DTYPE_STR and val_type in NUMERIC_DTYPES:
+            pass    # numbers may be mixed with numeric text
+        else:
+            self.dtype = DTYPE_STR
+            self.is_numeric_text = False
+
+    def get_dtype(self):
+        """
+        Type used to read the column:
+            - no values: str
+            - ints with missing values: float64 (as pandas would)
+            - bools with missing values: str
+        """
+        if self.dtype is None:
+            return DTYPE_STR
+        if self.has_missing:
+            if self.dtype == DTYPE_INT:
+                return DTYPE_FLOAT
+            if self.dtype == DTYPE_BOOL:
+                return DTYPE_STR
+        return self.dtype
+
+    def get_schema_info(self):
+        return dict(name=self.name,
+                    dtype=self.get_dtype(),
+                    numeric_text=self.is_numeric_text)
+
+
+class TabularFileSniffer(object):
+    """
+    Detect the delimiter, encoding, header row and column types of a
+    tabular file, reading it once.
+    """
+    def __init__(self, fname, **kwargs):
+        """
+        Optional kwargs:
+            - default_delimiter: used if no delimiter fits. Default: tab
+            - delimiter: known delimiter, not detected
+            - has_header_row: known True/False, not detected
+            - max_rows: data rows to examine for column types
+        """
+        self.fname = fname
+        self.default_delimiter = str(kwargs.get('default_delimiter', DEFAULT_DELIMITER))
+        self.known_delimiter = kwargs.get('delimiter') or None
+        self.known_has_header_row = kwargs.get('has_header_row')
+        self.max_rows = kwargs.get('max_rows',\
+                                   getattr(settings, 'TABULAR_SNIFF_MAX_ROWS', SNIFF_MAX_ROWS))
+
+        self.delimiter = self.default_delimiter
+        self.encoding = ENCODING_UTF8
+        self.has_header_row = True
+        self.column_schema = []
+        self.num_rows_sniffed = 0
+
+        self.is_utf8 = True
+
+        self.has_error = False
+        self.error_message = None
+
+    def add_error(self, err_msg):
+        LOGGER.error(err_msg)
+        self.has_error = True
+        self.error_message = err_msg
+
+    def check_encoding(self, lines):
+        """
+        Pass lines through, noting if any aren't utf-8
+        """
+        for line in lines:
+            if self.is_utf8:
+                try:
+                    line.decode(ENCODING_UTF8)
+                except UnicodeDecodeError:
+                    self.is_utf8 = False
+            yield line
+
+    def choose_delimiter(self, sample_lines):
+        """
+        Choose the candidate delimiter that splits every sample row into
+        the same number (> 1) of fields.  If more than one fits, use the one
+        with the most fields; ties go to the default delimiter.
+        """
+        candidates = [self.default_delimiter] +\
+                     [x for x in CANDIDATE_DELIMITERS if x != self.default_delimiter]
+
+        best_delimiter = None
+        best_num_fields = 1
+        for delimiter in candidates:
+            try:
+                rows = [row for row in csv.reader(sample_lines, delimiter=delimiter) if row]
+            except csv.Error:
+                continue
+
+            # The last row may be cut off inside a quoted value
+            if len(rows) > 1:
+                rows = rows[:-1]
+
+            field_counts = set([len(row) for row in rows])
+            if len(field_counts) != 1:
+                continue
+            num_fields = field_counts.pop()
+            if num_fields > best_num_fields:
+                best_delimiter = delimiter
+                best_num_fields = num_fields
+
+        if best_delimiter is None:
+            return self.default_delimiter
+        return best_delimiter
+
+    def is_header_row(self, first_row, trackers):
+        """
+        The first row is data (not a header) if, for every numeric
+        column, its value is also a number
+        """
+        numeric_trackers = [x for x in trackers if x.get_dtype() in NUMERIC_DTYPES]
+        if not numeric_trackers:
+            return True
+
+        for tracker_idx, tracker in enumerate(trackers):
+            if not tracker in numeric_trackers:
+                continue
+            if tracker_idx >= len(first_row):
+                return True
+            val_type, _ = ColumnTypeTracker.get_value_type(first_row[tracker_idx])
+            if not val_type in NUMERIC_DTYPES:
+                return True
+        return False
+
+    def sniff(self):
+        """
+        Read the file and set the attributes
+
+        :returns: boolean
+        """
+        try:
+            # universal newlines: some files only use '\r'
+            with open(self.fname, 'rU') as fh:
+                return self.sniff_lines(fh)
+        except (IOError, csv.Error) as ex_obj:
+            self.add_error('Failed to examine the tabular file: %s' % ex_obj)
+            return False
+
+    def sniff_lines(self, fh):
+        """
+        - The first DELIMITER_SAMPLE_LINES lines choose the delimiter
+        - Those lines and the rest of the file are then parsed once
+        """
+        sample_lines = []
+        for line in fh:
+            sample_lines.append(line)
+            if len(sample_lines) >= DELIMITER_SAMPLE_LINES:
+                break
+
+        if not sample_lines:
+            self.add_error('The tabular file is empty')
+            return False
+
+        has_bom = sample_lines[0].startswith(UTF8_BOM)
+        if has_bom:
+            sample_lines[0] = sample_lines[0][len(UTF8_BOM):]
+
+        if self.known_delimiter:
+            self.delimiter = str(self.known_delimiter)
+        else:
+            self.delimiter = self.choose_delimiter(sample_lines)
+
+        reader = csv.reader(self.check_encoding(chain(sample_lines, fh)),\
+                            delimiter=self.delimiter)
+
+        first_row = next(reader, None)
+        if not first_row:
+            self.add_error('The tabular file has no rows')
+            return False
+
+        trackers = [ColumnTypeTracker(name) for name in first_row]
+        num_columns = len(trackers)
+
+        for row in reader:
+            if not row:
+                continue
+            for val, tracker in zip(row[:num_columns], trackers):
+                if not tracker.is_final():
+                    tracker.add_value(val)
+            # Short rows: the remaining columns are missing
+            for tracker in trackers[len(row):]:
+                tracker.has_missing = True
+            self.num_rows_sniffed += 1
+            if self.max_rows is not None and self.num_rows_sniffed >= self.max_rows:
+                break
+
+        if self.known_has_header_row is None:
+            self.has_header_row = self.is_header_row(first_row, trackers)
+        else:
+            self.has_header_row = self.known_has_header_row
+        if not self.has_header_row:
+            for col_idx, (val, tracker) in enumerate(zip(first_row, trackers)):
+                tracker.name = NO_HEADER_COLUMN_NAME % (col_idx + 1)
+                tracker.add_value(val)
+            self.num_rows_sniffed += 1
+
+        if has_bom:
+            self.encoding = ENCODING_UTF8_BOM
+        elif self.is_utf8:
+            self.encoding = ENCODING_UTF8
+        else:
+            self.encoding = ENCODING_LATIN1
+
+        self.column_schema = [x.get_schema_info() for x in trackers]
+
+        return True
+
+    def update_tabular_info(self, tabular_info, save=True):
+        """
+        Save the results on a TabularFileInfo.  A delimiter chosen by a
+        user and a has_header_row that isn't empty are left as is
+        """
+        assert self.column_schema, 'Call "sniff" before "update_tabular_info"'
+
+        if not tabular_info.delimiter_chosen:
+            tabular_info.delimiter = self.delimiter
+        if tabular_info.has_header_row is None:
+            tabular_info.has_header_row = self.has_header_row
+        tabular_info.file_encoding = self.encoding
+        tabular_info.column_schema = self.column_schema
+
+        if save:
+            tabular_info.save()
+
+    @staticmethod
+    def sniff_tabular_info(tabular_info, save=True):
+        """
+        Sniff a TabularFileInfo's dv_file, if it hasn't been done
+
+        :returns: (True, None) or (False, error message)
+        """
+        if tabular_info.column_schema:
+            return True, None
+
+        known_delimiter = None
+        if tabular_info.delimiter_chosen:
+            known_delimiter = tabular_info.delimiter
+
+        sniffer = TabularFileSniffer(tabular_info.get_dv_file_fullpath(),\
+                        default_delimiter=tabular_info.delimiter or DEFAULT_DELIMITER,\
+                        delimiter=known_delimiter,\
+                        has_header_row=tabular_info.has_header_row)
+        if not sniffer.sniff():
+            return False, sniffer.error_message
+
+        sniffer.update_tabular_info(tabular_info, save=save)
+        return True, None
+
+    @staticmethod
+    def get_column_info(tabular_info, column_name):
+        """
+        :returns: column_schema entry for column_name or None
+        """
+        for column_info in (tabular_info.column_schema or []):
+            if column_info['name'] == column_name:
+                return column_info
+        return None
+
+    @staticmethod
+    def get_read_csv_kwargs(tabular_info, columns=None):
+        """
+        pd.read_csv kwargs for a sniffed TabularFileInfo.
+        (Only "sep" if there's no column_schema.)
+
+        :param columns: list of column names to read (usecols).  Default: all
+        """
+        read_kwargs = dict(sep=str(tabular_info.delimiter))
+
+        column_schema = tabular_info.column_schema
+        if not column_schema:
+            if columns:
+                read_kwargs['usecols'] = columns
+            return read_kwargs
+
+        if tabular_info.file_encoding in READ_CSV_ENCODINGS:
+            read_kwargs['encoding'] = tabular_info.file_encoding
+
+        if tabular_info.has_header_row is False:
+            read_kwargs['header'] = None
+            read_kwargs['names'] = [x['name'] for x in column_schema]
+
+        dtypes = dict([(x['name'], READ_CSV_DTYPES[x['dtype']])\
+                       for x in column_schema\
+                       if columns is None or x['name'] in columns])
+        read_kwargs['dtype'] = dtypes
+
+        if columns:
+            read_kwargs['usecols'] = columns
+
+        return read_kwargs
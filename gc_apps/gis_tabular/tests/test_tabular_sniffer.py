@@ -0,0 +1,157 @@
+from os.path import dirname, join
+import tempfile
+
+from django.test import TestCase
+
+from gc_apps.gis_tabular.models import TabularFileInfo
+from gc_apps.gis_tabular.tabular_sniffer import TabularFileSniffer,\
+    ENCODING_UTF8, ENCODING_UTF8_BOM, ENCODING_LATIN1
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+CBG_FILENAME = join(dirname(__file__), 'input', 'CBG_Annual_and_Longitudinal_Measures.tab')
+BOSTON_INCOME_FILENAME = join(dirname(__file__), 'input', 'boston_income.csv')
+
+# python manage.py test gc_apps.gis_tabular.tests.test_tabular_sniffer
+#
+
+class TabularFileSnifferTestCase(TestCase):
+
+    def get_sniffer(self, content, **kwargs):
+        """Sniff content written to a temp file"""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            sniffer = TabularFileSniffer(tmp_file.name, **kwargs)
+            self.assertEqual(sniffer.sniff(), True)
+        return sniffer
+
+    @staticmethod
+    def get_dtypes(sniffer):
+        return dict([(x['name'], x['dtype']) for x in sniffer.column_schema])
+
+    def test_01_files(self):
+        """test_01_files"""
+        msgt(self.test_01_files.__doc__)
+
+        msgd('Test 01: tab delimited, block group ids with a leading zero')
+        sniffer = TabularFileSniffer(CBG_FILENAME)
+        self.assertEqual(sniffer.sniff(), True)
+        self.assertEqual(sniffer.delimiter, '\t')
+        self.assertEqual(sniffer.has_header_row, True)
+        self.assertEqual(sniffer.num_rows_sniffed, 554)
+        self.assertEqual(sniffer.column_schema[0],\
+                         dict(name='BG_ID_10', dtype='str', numeric_text=True))
+
+        msgd('Test 02: comma delimited, "\\r" line endings')
+        sniffer = TabularFileSniffer(BOSTON_INCOME_FILENAME)
+        self.assertEqual(sniffer.sniff(), True)
+        self.assertEqual(sniffer.delimiter, ',')
+        self.assertEqual(sniffer.num_rows_sniffed, 156)
+        self.assertEqual(self.get_dtypes(sniffer)['TRACT'], 'int64')
+
+    def test_02_types(self):
+        """test_02_types"""
+        msgt(self.test_02_types.__doc__)
+
+        sniffer = self.get_sniffer('fips,name,pop,rate,flag\n'
+                                   '01001,"Autauga, AL",55000,1.5,True\n'
+                                   '01003,Baldwin,,2,False\n'
+                                   '12001,"multi\nline",3,NA,true\n')
+        self.assertEqual(sniffer.delimiter, ',')
+        self.assertEqual(sniffer.encoding, ENCODING_UTF8)
+        self.assertEqual(self.get_dtypes(sniffer),\
+                         dict(fips='str', name='str', pop='float64',\
+                              rate='float64', flag='bool'))
+        self.assertEqual(sniffer.column_schema[0]['numeric_text'], True)
+        self.assertEqual(sniffer.column_schema[1]['numeric_text'], False)
+
+    def test_03_encoding_and_header(self):
+        """test_03_encoding_and_header"""
+        msgt(self.test_03_encoding_and_header.__doc__)
+
+        msgd('Test 01: utf-8 BOM')
+        sniffer = self.get_sniffer('\xef\xbb\xbfid;v\n1;caf\xc3\xa9\n')
+        self.assertEqual(sniffer.delimiter, ';')
+        self.assertEqual(sniffer.encoding, ENCODING_UTF8_BOM)
+        self.assertEqual(sniffer.column_schema[0]['name'], 'id')
+
+        msgd('Test 02: latin-1')
+        sniffer = self.get_sniffer('id|v\n1|caf\xe9\n')
+        self.assertEqual(sniffer.delimiter, '|')
+        self.assertEqual(sniffer.encoding, ENCODING_LATIN1)
+
+        msgd('Test 03: no header row')
+        sniffer = self.get_sniffer('1,2.5,a\n4,5,b\n')
+        self.assertEqual(sniffer.has_header_row, False)
+        self.assertEqual(sniffer.num_rows_sniffed, 2)
+        self.assertEqual(self.get_dtypes(sniffer),\
+                         dict(column_1='int64', column_2='float64', column_3='str'))
+
+    def test_04_read_csv_kwargs(self):
+        """test_04_read_csv_kwargs"""
+        msgt(self.test_04_read_csv_kwargs.__doc__)
+
+        tabular_info = TabularFileInfo(delimiter=',')
+
+        msgd('Test 01: No column_schema')
+        self.assertEqual(TabularFileSniffer.get_read_csv_kwargs(tabular_info),\
+                         dict(sep=','))
+
+        sniffer = self.get_sniffer('fips,pop\n01001,55000\n')
+        sniffer.update_tabular_info(tabular_info, save=False)
+
+        msgd('Test 02: Explicit dtypes')
+        self.assertEqual(TabularFileSniffer.get_read_csv_kwargs(tabular_info),\
+                         dict(sep=',', dtype=dict(fips=object, pop='int64')))
+
+        msgd('Test 03: Selected columns')
+        self.assertEqual(TabularFileSniffer.get_read_csv_kwargs(tabular_info, ['fips']),\
+                         dict(sep=',', dtype=dict(fips=object), usecols=['fips']))
+
+        self.assertEqual(TabularFileSniffer.get_column_info(tabular_info, 'fips'),\
+                         dict(name='fips', dtype='str', numeric_text=True))
+        self.assertEqual(TabularFileSniffer.get_column_info(tabular_info, 'nope'), None)
+
+    def test_05_known_format(self):
+        """test_05_known_format"""
+        msgt(self.test_05_known_format.__doc__)
+
+        msgd('Test 01: Known delimiter and header row are used as is')
+        sniffer = self.get_sniffer('1,2\t3\n4,5\t6\n', delimiter='\t', has_header_row=True)
+        self.assertEqual(sniffer.delimiter, '\t')
+        self.assertEqual(sniffer.has_header_row, True)
+        self.assertEqual([x['name'] for x in sniffer.column_schema], ['1,2', '3'])
+
+        msgd('Test 02: Chosen delimiter and header row are kept')
+        tabular_info = TabularFileInfo(delimiter='\t', delimiter_chosen=True,\
+                                       has_header_row=False)
+        sniffer = self.get_sniffer('id,v\n1,a\n')
+        sniffer.update_tabular_info(tabular_info, save=False)
+        self.assertEqual(tabular_info.delimiter, '\t')
+        self.assertEqual(tabular_info.has_header_row, False)
+
+        tabular_info = TabularFileInfo(delimiter='')
+        sniffer.update_tabular_info(tabular_info, save=False)
+        self.assertEqual(tabular_info.delimiter, ',')
+        self.assertEqual(tabular_info.has_header_row, True)
+
+    def test_06_sniff_tabular_info(self):
+        """test_06_sniff_tabular_info"""
+        msgt(self.test_06_sniff_tabular_info.__doc__)
+
+        msgd('Test 01: comma delimited file, no delimiter chosen')
+        tabular_info = TabularFileInfo()
+        self.assertEqual(tabular_info.delimiter, '\t')
+        self.assertEqual(tabular_info.has_header_row, None)
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as tmp_file:
+            tmp_file.write('fips,name\n01001,"Autauga, AL"\n01003,Baldwin\n')
+            tmp_file.flush()
+            tabular_info.get_dv_file_fullpath = lambda: tmp_file.name
+
+            (success, err_msg) = TabularFileSniffer.sniff_tabular_info(tabular_info,\
+                                                                       save=False)
+        self.assertEqual(success, True)
+        self.assertEqual(tabular_info.delimiter, ',')
+        self.assertEqual(tabular_info.has_header_row, True)
+        self.assertEqual(TabularFileSniffer.get_read_csv_kwargs(tabular_info)['sep'], ',')
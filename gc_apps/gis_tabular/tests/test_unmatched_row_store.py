@@ -0,0 +1,147 @@
+import os
+
+import pandas as pd
+
+from django.test import TestCase
+
+from gc_apps.gis_tabular.models import WorldMapJoinLayerInfo, WorldMapLatLngInfo
+from gc_apps.gis_tabular.unmatched_row_store import UnmatchedRowStore, PARTIAL_FILE_SUFFIX
+from gc_apps.gis_tabular.unmatched_row_pager import UnmatchedRowPager
+from gc_apps.geo_utils.csv_stream_util import iterate_csv_rows
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.gis_tabular.tests.test_unmatched_row_store
+#
+
+class UnmatchedRowStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.worldmap_info = WorldMapJoinLayerInfo(md5='b' * 32)
+
+        self.df = pd.DataFrame(dict(tract=['0001', '0002', '0003', '0004'],
+                                    note=['a', 'multi\nline', 'quote "q"', 'd']),
+                               columns=['tract', 'note'])
+
+    def tearDown(self):
+        UnmatchedRowStore.remove_rows(self.worldmap_info)
+
+    def test_01_save_and_read(self):
+        """test_01_save_and_read"""
+        msgt(self.test_01_save_and_read.__doc__)
+
+        self.assertEqual(UnmatchedRowStore.is_built(self.worldmap_info), False)
+
+        (success, err_msg) = UnmatchedRowStore.save_rows(self.worldmap_info, self.df)
+        self.assertEqual(success, True)
+        self.assertEqual(UnmatchedRowStore.is_built(self.worldmap_info), True)
+        self.assertEqual(UnmatchedRowStore.get_row_count(self.worldmap_info), 4)
+
+        msgd('Test 01: Read a page of rows')
+        header, rows = UnmatchedRowStore.read_rows(self.worldmap_info, start=1, count=2)
+        self.assertEqual(header, ['tract', 'note'])
+        self.assertEqual(rows, [['0002', 'multi\nline'], ['0003', 'quote "q"']])
+
+        msgd('Test 02: Read past the end')
+        header, rows = UnmatchedRowStore.read_rows(self.worldmap_info, start=3, count=20)
+        self.assertEqual(rows, [['0004', 'd']])
+        header, rows = UnmatchedRowStore.read_rows(self.worldmap_info, start=10, count=20)
+        self.assertEqual(rows, [])
+
+        msgd('Test 03: csv blocks')
+        csv_text = ''.join(UnmatchedRowStore.iterate_csv_blocks(self.worldmap_info, count=1))
+        self.assertEqual(csv_text, 'tract,note\n0001,a\n')
+
+        csv_text = ''.join(UnmatchedRowStore.iterate_csv_blocks(self.worldmap_info,\
+                                        count=1, include_header_row=False))
+        self.assertEqual(csv_text, '0001,a\n')
+
+        msgd('Test 04: Remove')
+        UnmatchedRowStore.remove_rows(self.worldmap_info)
+        self.assertEqual(UnmatchedRowStore.is_built(self.worldmap_info), False)
+
+    def test_02_iterate_csv_rows(self):
+        """test_02_iterate_csv_rows"""
+        msgt(self.test_02_iterate_csv_rows.__doc__)
+
+        rows = [['0001', 'a'], ['0002', 'multi\nline'], ['0003', 'quote "q"']]
+
+        csv_chunks = list(iterate_csv_rows(rows, header_row=['tract', 'note'],\
+                                           rows_per_chunk=2))
+        self.assertEqual(len(csv_chunks), 2)
+        self.assertEqual(''.join(csv_chunks),\
+                         'tract,note\r\n0001,a\r\n0002,"multi\nline"\r\n0003,"quote ""q"""\r\n')
+
+    def test_03_pager(self):
+        """test_03_pager"""
+        msgt(self.test_03_pager.__doc__)
+
+        UnmatchedRowStore.save_rows(self.worldmap_info, self.df)
+
+        msgd('Test 01: offset and limit')
+        pager = UnmatchedRowPager(self.worldmap_info, dict(offset='1', limit='2'))
+        page_dict = pager.get_page_dict()
+        self.assertEqual(pager.has_error, False)
+        self.assertEqual(page_dict['rows'], [['0002', 'multi\nline'], ['0003', 'quote "q"']])
+        self.assertEqual(page_dict['total_row_count'], 4)
+        self.assertEqual(page_dict['previous_cursor'], UnmatchedRowPager.encode_cursor(0))
+
+        msgd('Test 02: next cursor')
+        pager = UnmatchedRowPager(self.worldmap_info,\
+                                  dict(cursor=page_dict['next_cursor'], limit='2'))
+        page_dict = pager.get_page_dict()
+        self.assertEqual(page_dict['offset'], 3)
+        self.assertEqual(page_dict['rows'], [['0004', 'd']])
+        self.assertEqual(page_dict['next_cursor'], None)
+
+        msgd('Test 03: bad params')
+        for params in (dict(cursor='not-a-cursor'), dict(offset='-1'), dict(limit='x')):
+            pager = UnmatchedRowPager(self.worldmap_info, params)
+            self.assertEqual(pager.get_page_dict(), None)
+            self.assertEqual(pager.has_error, True)
+
+    def test_04_lat_lng_rows(self):
+        """test_04_lat_lng_rows"""
+        msgt(self.test_04_lat_lng_rows.__doc__)
+
+        lat_lng_info = WorldMapLatLngInfo(md5='b' * 32)
+        self.assertNotEqual(UnmatchedRowStore.get_csv_path(lat_lng_info),\
+                            UnmatchedRowStore.get_csv_path(self.worldmap_info))
+
+        rows = [[u'a', 1, 2], [u'b\xe9', u'lat'], [u'c', None, 4]]
+        (success, err_msg) = UnmatchedRowStore.save_row_list(\
+                                    lat_lng_info, ['name', 'lat', 'lng'], rows)
+        self.assertEqual(success, True)
+
+        header, page_rows = UnmatchedRowStore.read_rows(lat_lng_info, start=1, count=2)
+        self.assertEqual(header, ['name', 'lat', 'lng'])
+        self.assertEqual(page_rows, [['b\xc3\xa9', 'lat'], ['c', '', '4']])
+
+        UnmatchedRowStore.remove_rows(lat_lng_info)
+
+    def test_05_build_lock(self):
+        """test_05_build_lock"""
+        msgt(self.test_05_build_lock.__doc__)
+
+        lat_lng_info = WorldMapLatLngInfo(md5='c' * 32,\
+                            core_data=dict(unmapped_records_list=[['a', '1', '2']]),\
+                            attribute_data=[dict(name='name'), dict(name='lat'),\
+                                            dict(name='lng')])
+        lock_path = UnmatchedRowStore.get_lock_path(lat_lng_info)
+
+        msgd('Test 01: Another process holds the lock')
+        self.assertEqual(UnmatchedRowStore.acquire_build_lock(lat_lng_info), True)
+        self.assertEqual(UnmatchedRowStore.acquire_build_lock(lat_lng_info), False)
+        self.assertEqual(UnmatchedRowStore.is_built(lat_lng_info), False)
+
+        msgd('Test 02: Stale lock removed, rows built')
+        os.utime(lock_path, (0, 0))
+        (success, err_msg) = UnmatchedRowStore.build_if_needed(lat_lng_info)
+        self.assertEqual(success, True)
+        self.assertEqual(os.path.isfile(lock_path), False)
+        self.assertEqual(UnmatchedRowStore.read_rows(lat_lng_info)[1], [['a', '1', '2']])
+
+        csv_directory = os.path.dirname(UnmatchedRowStore.get_csv_path(lat_lng_info))
+        self.assertEqual([x for x in os.listdir(csv_directory)\
+                          if x.endswith(PARTIAL_FILE_SUFFIX)], [])
+
+        UnmatchedRowStore.remove_rows(lat_lng_info)
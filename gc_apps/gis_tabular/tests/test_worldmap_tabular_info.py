@@ -7,6 +7,7 @@ from django.core import management
 
 from gc_apps.gis_tabular.models import TabularFileInfo, WorldMapTabularLayerInfo
 from gc_apps.gis_tabular.tabular_helper import TabFileStats
+from gc_apps.gis_tabular.parsed_table_cache import ParsedTableCache
 from gc_apps.geo_utils.msg_util import msgt, msg
 from django.core.files import File
 
@@ -108,5 +109,25 @@ class WorldMapTabularInfoTestCase(TestCase):
         expected_colnames = ['BG_ID_10', 'DisSens_2010', 'PublicDenigration_2010', 'PrivateNeglect_2010', 'Housing_2010', 'UncivilUse_2010', 'BigBuild_2010', 'Trash_2010', 'Graffiti_2010', 'DisSens_2011', 'PublicDenigration_2011', 'PrivateNeglect_2011', 'Housing_2011', 'UncivilUse_2011', 'BigBuild_2011', 'Trash_2011', 'Graffiti_2011', 'DisSens_2012', 'PublicDenigration_2012', 'PrivateNeglect_2012', 'Housing_2012', 'UncivilUse_2012', 'BigBuild_2012', 'Trash_2012', 'Graffiti_2012', 'DisSens_2013', 'PublicDenigration_2013', 'PrivateNeglect_2013', 'Housing_2013', 'UncivilUse_2013', 'BigBuild_2013', 'Trash_2013', 'Graffiti_2013', 'DisSens_2014', 'PublicDenigration_2014', 'PrivateNeglect_2014', 'Housing_2014', 'UncivilUse_2014', 'BigBuild_2014', 'Trash_2014', 'Graffiti_2014', 'DisSens_long', 'PublicDenigration_long', 'PrivateNeglect_long', 'Housing_long', 'UncivilUse_long', 'BigBuild_long', 'Trash_long', 'Graffiti_long']
         self.assertEqual(tab_file_info.column_names, expected_colnames)
 
+        # The parsed table was cached: load a single column
+        cache_key = ParsedTableCache.get_cache_key(tab_file_info)
+        df = ParsedTableCache.load_cached_table(tab_file_info, cache_key, ['BG_ID_10'])
+        self.assertTrue(df is not None)
+        self.assertEqual(df.columns.tolist(), ['BG_ID_10'])
+        self.assertEqual(len(df.index), 554)
+
+        ParsedTableCache.remove_cached_tables(tab_file_info)
+        self.assertEqual(ParsedTableCache.load_cached_table(tab_file_info, cache_key), None)
+
+        # Streaming mode: sampled rows and a newline count
+        tab_file_stats = TabFileStats(cbg_filepath,
+                                      delim=tab_file_info.delimiter,
+                                      streaming=True)
+        self.assertTrue(not tab_file_stats.has_error())
+        self.assertEqual(tab_file_stats.num_rows, 554)
+        self.assertEqual(tab_file_stats.num_cols, 49)
+        self.assertEqual(tab_file_stats.column_names, expected_colnames)
+        self.assertEqual(tab_file_stats.column_dtypes['BG_ID_10'], 'object')
+
     def test_03_test_static_method(self):
         msgt(self.test_03_test_static_method.__doc__)
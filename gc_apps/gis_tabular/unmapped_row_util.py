@@ -10,10 +10,13 @@ import pandas as pd
 
 
 from gc_apps.gis_tabular.models import WorldMapJoinLayerInfo
+from gc_apps.gis_tabular.parsed_table_cache import ParsedTableCache
+from gc_apps.gis_tabular.unmatched_row_store import UnmatchedRowStore
 
 from gc_apps.geo_utils.tabular_util import get_orig_column_name,\
         get_worldmap_colname_format,\
         is_pandas_dtype_numeric
+from gc_apps.geo_utils.join_key_formatter import format_join_keys
 from gc_apps.geo_utils.msg_util import msgt, msg
 
 
@@ -78,6 +81,28 @@ class UnmatchedRowHelper(object):
 
         return self.build_failed_rows(as_csv=True)
 
+    def get_failed_rows_as_csv_iterator(self):
+        """
+        The failed rows as a .csv, yielded in blocks--for a StreamingHttpResponse.
+        All rows if show_all_failed_rows, otherwise up to max_failed_rows_to_build
+        """
+        assert self.has_unmatched_rows,\
+            'Before calling this, check that "has_unmatched_rows" is True'
+
+        if not self.build_unmatched_row_store():
+            return None
+
+        return UnmatchedRowStore.iterate_csv_blocks(\
+                                self.worldmap_info,\
+                                count=self.get_csv_row_limit(),\
+                                include_header_row=self.include_header_row)
+
+    def get_csv_row_limit(self):
+        """None (no limit) if show_all_failed_rows"""
+        if self.show_all_failed_rows:
+            return None
+        return self.max_failed_rows_to_build
+
 
 
     def check_for_unmatched_rows(self):
@@ -116,12 +141,64 @@ class UnmatchedRowHelper(object):
 
 
     def build_failed_rows(self, as_csv=False):
+        """
+        Read the failed rows from the UnmatchedRowStore--building
+        the store on the first call
+
+            - as_csv: up to max_failed_rows_to_build rows as a .csv string
+                (all rows if show_all_failed_rows)
+            - otherwise: up to max_failed_rows_to_display rows as a list of lists
+        """
+        if not self.build_unmatched_row_store():
+            return None
+
+        # Return the data as a CSV file
+        #
+        if as_csv:
+            return ''.join(UnmatchedRowStore.iterate_csv_blocks(\
+                                self.worldmap_info,\
+                                count=self.get_csv_row_limit(),\
+                                include_header_row=self.include_header_row))
+
+        # Return the data as a list of lists
+        #
+        num_rows = None
+        if self.max_failed_rows_to_display and self.max_failed_rows_to_display > 0:
+            num_rows = self.max_failed_rows_to_display
+
+        header, rows = UnmatchedRowStore.read_rows(self.worldmap_info, 0, num_rows)
+
+        if self.include_header_row:
+            return [header] + rows
+        return rows
+
+    def build_unmatched_row_store(self):
+        """
+        Build the UnmatchedRowStore on the first call
+
+        :returns: boolean
+        """
+        if self.has_error:
+            return False
+
+        (success, err_msg) = UnmatchedRowStore.build_if_needed(self.worldmap_info)
+        if not success:
+            self.add_error_msg(err_msg)
+            return False
+
+        self.total_row_count = UnmatchedRowStore.get_row_count(self.worldmap_info)
+        return True
+
+    def get_unmatched_dataframe(self):
         """
         Scenario 1: Filter rows in the original file matching the join column
                 against the values list
 
         Scenario 2: New column was created (zero-padded, etc).  Add that new column
                     and then filter rows using that new column and the values list
+
+        Returns a DataFrame with all of the unmatched rows--
+        used to build the UnmatchedRowStore
         """
         if self.has_error:
             return None
@@ -129,14 +206,12 @@ class UnmatchedRowHelper(object):
         tabular_info = self.worldmap_info.tabular_info
 
         try:
-            df = pd.read_csv(tabular_info.dv_file.path,\
-                        sep=tabular_info.delimiter,\
-                        )
+            df = ParsedTableCache.read_table(tabular_info)
         except pd.parser.CParserError as e:
             err_msg = ('Could not process the file. '
                         'At least one row had too many values. '
                         '(error: %s)' % e.message)
-            self.add_error(err_msg)
+            self.add_error_msg(err_msg)
             return None
 
         new_columns = [get_worldmap_colname_format(x) for x in df.columns]
@@ -145,78 +220,32 @@ class UnmatchedRowHelper(object):
         # ------------------------------------------------------
         # No formatted column created! Filter values and return
         # ------------------------------------------------------
-
         if self.was_formatted_column_created is False and self.table_join_attribute in df.columns:
 
-
             if is_pandas_dtype_numeric(df[self.table_join_attribute].dtype):
                 unmatched_vals = self.convert_values_to_numeric(self.unmatched_record_values)
             else:
                 unmatched_vals = self.unmatched_record_values
 
-            df_filtered = df.loc[df[self.table_join_attribute].isin(unmatched_vals)]
-            self.total_row_count = len(df_filtered.index)
-
-            if as_csv:
-                df_filtered = df_filtered[:self.max_failed_rows_to_build]
-                return df_filtered.to_csv(index=False, header=True)
-
-            # Return the data as a list of lists
-            #
-            if self.max_failed_rows_to_display and self.max_failed_rows_to_display > 0:
-                df_filtered = df_filtered[:self.max_failed_rows_to_display]
-
-            return df_filtered.values.tolist()
+            return df.loc[df[self.table_join_attribute].isin(unmatched_vals)]
 
         # ------------------------------------------------------
         # Hasty attempt, only working with zero padded items
+        #   - make the column
         # ------------------------------------------------------
-        if self.zero_pad_length is None:
-            func_col_fmt = lambda x: '%s' % x
-        else:
-            zero_pad_fmt = '{0:0>%s}' % self.zero_pad_length
-            func_col_fmt = lambda x: zero_pad_fmt.format(x)
-
-        # ----------------------------------
-        # make the column
-        # ----------------------------------
         orig_column_name = get_orig_column_name(self.table_join_attribute)
 
-        df[self.table_join_attribute] = df[orig_column_name].apply(\
-                            lambda x: func_col_fmt(x))
-
-        df2 = df.loc[df[self.table_join_attribute].isin(self.unmatched_record_values)]
-        self.total_row_count = len(df2.index)
+        df[self.table_join_attribute] = format_join_keys(df[orig_column_name],\
+                                                         self.zero_pad_length)
 
-        # Return the data as a CSV file
-        #
-        if as_csv:
-            df2 = df2[:self.max_failed_rows_to_build]
-
-            return df2.to_csv(index=False, header=self.include_header_row)
-
-        # Return the data as a list of lists
-        #
-        if self.max_failed_rows_to_display and self.max_failed_rows_to_display > 0:
-            df2 = df2[:self.max_failed_rows_to_display]
-
-        if self.include_header_row:
-            return [df2.columns.tolist()] + df2.values.tolist()
-        else:
-            return df2.values.tolist()
+        return df.loc[df[self.table_join_attribute].isin(self.unmatched_record_values)]
 
 
     def convert_values_to_numeric(self, val_list):
+        """
+        Convert the unmatched values to numbers in one pass.
+        Values that aren't numeric are dropped
+        """
         assert val_list is not None, 'val_list cannot be None'
 
-        updated_list = []
-        for val in val_list:
-            if isinstance(val, (str, unicode)):
-                try:
-                    new_val = int(val)
-                except ValueError:
-                    new_val = float(val)
-                updated_list.append(new_val)
-            else:
-                updated_list.append(val)
-        return updated_list
+        return pd.to_numeric(pd.Series(val_list), errors='coerce').dropna()
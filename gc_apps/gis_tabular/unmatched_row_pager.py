@@ -0,0 +1,149 @@
+"""
+Pages of unmatched rows, read from the UnmatchedRowStore
+
+A page is requested with either:
+    - offset and limit, e.g. ?offset=2000&limit=50
+    - an opaque cursor from a previous page, e.g. ?cursor=b2Zmc2V0OjIwNTA
+
+    pager = UnmatchedRowPager(worldmap_info, request.GET)
+    if pager.has_error:
+        ...pager.error_message...
+    pager.get_page_dict()
+        {'column_names': [...], 'rows': [[...], ...],
+         'offset': 2000, 'limit': 50, 'total_row_count': 80000,
+         'next_cursor': 'b2Zmc2V0OjIwNTA', 'previous_cursor': 'b2Zmc2V0OjE5NTA'}
+"""
+import base64
+import logging
+
+from gc_apps.gis_tabular.unmatched_row_store import UnmatchedRowStore
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 1000
+
+PARAM_OFFSET = 'offset'
+PARAM_LIMIT = 'limit'
+PARAM_CURSOR = 'cursor'
+
+CURSOR_PREFIX = 'offset:'
+
+
+class UnmatchedRowPager(object):
+    """
+    Read a page of unmatched rows for a WorldMapJoinLayerInfo
+    or WorldMapLatLngInfo
+    """
+    def __init__(self, worldmap_info, params):
+        """
+        :param worldmap_info: WorldMapJoinLayerInfo or WorldMapLatLngInfo
+        :param params: dict-like, e.g. request.GET
+        """
+        self.worldmap_info = worldmap_info
+
+        self.offset = 0
+        self.limit = DEFAULT_PAGE_LIMIT
+
+        self.has_error = False
+        self.error_message = None
+
+        self.set_offset_and_limit(params)
+
+    def add_error(self, err_msg):
+        LOGGER.error(err_msg)
+        self.has_error = True
+        self.error_message = err_msg
+
+    @staticmethod
+    def encode_cursor(offset):
+        return base64.urlsafe_b64encode('%s%d' % (CURSOR_PREFIX, offset)).rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        :returns: offset or None if the cursor isn't valid
+        """
+        try:
+            cursor = str(cursor)
+            decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        except (TypeError, ValueError, UnicodeEncodeError):
+            return None
+
+        if not decoded.startswith(CURSOR_PREFIX):
+            return None
+
+        try:
+            return int(decoded[len(CURSOR_PREFIX):])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def get_int_param(params, name, default_val):
+        """:returns: int or None if the param isn't an integer"""
+        val = params.get(name, None)
+        if val in (None, ''):
+            return default_val
+        try:
+            return int(val)
+        except ValueError:
+            return None
+
+    def set_offset_and_limit(self, params):
+
+        if params.get(PARAM_CURSOR):
+            self.offset = UnmatchedRowPager.decode_cursor(params.get(PARAM_CURSOR))
+            if self.offset is None:
+                self.add_error('The cursor is not valid.')
+                return
+        else:
+            self.offset = UnmatchedRowPager.get_int_param(params, PARAM_OFFSET, 0)
+
+        self.limit = UnmatchedRowPager.get_int_param(params, PARAM_LIMIT, DEFAULT_PAGE_LIMIT)
+
+        if self.offset is None or self.offset < 0:
+            self.add_error('"%s" must be 0 or greater.' % PARAM_OFFSET)
+            return
+
+        if self.limit is None or self.limit < 1:
+            self.add_error('"%s" must be 1 or greater.' % PARAM_LIMIT)
+            return
+
+        self.limit = min(self.limit, MAX_PAGE_LIMIT)
+
+    def get_page_dict(self):
+        """
+        Read the page--building the UnmatchedRowStore on the first call
+
+        :returns: dict (JSON serializable) or None on error
+        """
+        if self.has_error:
+            return None
+
+        (success, err_msg) = UnmatchedRowStore.build_if_needed(self.worldmap_info)
+        if not success:
+            self.add_error(err_msg)
+            return None
+
+        total_row_count = UnmatchedRowStore.get_row_count(self.worldmap_info)
+
+        header, rows = UnmatchedRowStore.read_rows(self.worldmap_info,\
+                                                   self.offset,\
+                                                   self.limit)
+
+        next_cursor = None
+        if self.offset + self.limit < total_row_count:
+            next_cursor = UnmatchedRowPager.encode_cursor(self.offset + self.limit)
+
+        previous_cursor = None
+        if self.offset > 0:
+            previous_cursor = UnmatchedRowPager.encode_cursor(\
+                                    max(0, self.offset - self.limit))
+
+        return dict(column_names=header,
+                    rows=rows,
+                    offset=self.offset,
+                    limit=self.limit,
+                    total_row_count=total_row_count,
+                    next_cursor=next_cursor,
+                    previous_cursor=previous_cursor)
@@ -0,0 +1,477 @@
+"""
+Materialized unmatched rows for a WorldMapJoinLayerInfo or WorldMapLatLngInfo
+
+The rows of a tabular file that failed to map are found once and saved
+as a .csv with a row index:
+
+    unmatched_rows/(layer type)/(md5).csv    header + unmatched rows
+    unmatched_rows/(layer type)/(md5).idx    byte offset of each row (int64)
+
+    - Join layers: rows are found with the UnmatchedRowHelper
+    - Lat/Lng layers: rows are sent back by the WorldMap (core_data)
+
+Pages of rows, and the csv download, are read directly from these files
+instead of re-parsing and filtering the original table.  Reading a page
+seeks to two entries of the index, so its cost doesn't depend on the
+page's position in the file.
+
+The files are built when the layer is created--see MapJobRunner--or,
+for older layers, on first use.  A "(md5).lock" file, created with
+O_EXCL, keeps concurrent requests from building the same files: the
+others wait for the build to finish.
+
+    if UnmatchedRowStore.build_if_needed(worldmap_info):
+        header, rows = UnmatchedRowStore.read_rows(worldmap_info, start=0, count=20)
+"""
+import os
+import csv
+import time
+import errno
+import logging
+import tempfile
+
+import numpy as np
+
+from gc_apps.gis_basic_file.models import DV_FILE_SYSTEM_STORAGE
+from gc_apps.gis_tabular.tabular_sniffer import READ_CSV_ENCODINGS
+from gc_apps.layer_types.static_vals import TYPE_LAT_LNG_LAYER
+
+LOGGER = logging.getLogger(__name__)
+
+UNMATCHED_ROW_DIRECTORY_NAME = 'unmatched_rows'
+JOIN_DIRECTORY_NAME = 'join'
+LAT_LNG_DIRECTORY_NAME = 'lat_lng'
+
+CSV_EXTENSION = '.csv'
+INDEX_EXTENSION = '.idx'
+PARTIAL_FILE_SUFFIX = '.part'
+PARTIAL_FILE_MODE = 0o644
+LOCK_EXTENSION = '.lock'
+
+# Seconds to wait for another process to build the files
+BUILD_WAIT_SECONDS = 60
+BUILD_WAIT_INTERVAL = 0.5
+
+# A lock older than this was left by a build that died
+STALE_LOCK_SECONDS = 15 * 60
+
+INDEX_DTYPE = np.int64
+
+# Bytes read at a time when streaming the .csv
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UnmatchedRowStore(object):
+    """Static methods for building and reading unmatched row files"""
+
+    @staticmethod
+    def is_lat_lng_info(worldmap_info):
+        return worldmap_info.get_layer_type() == TYPE_LAT_LNG_LAYER
+
+    @staticmethod
+    def get_base_path(worldmap_info):
+        if UnmatchedRowStore.is_lat_lng_info(worldmap_info):
+            layer_directory_name = LAT_LNG_DIRECTORY_NAME
+        else:
+            layer_directory_name = JOIN_DIRECTORY_NAME
+
+        return DV_FILE_SYSTEM_STORAGE.path(\
+                    os.path.join(UNMATCHED_ROW_DIRECTORY_NAME,\
+                                 layer_directory_name,\
+                                 worldmap_info.md5))
+
+    @staticmethod
+    def get_csv_path(worldmap_info):
+        return UnmatchedRowStore.get_base_path(worldmap_info) + CSV_EXTENSION
+
+    @staticmethod
+    def get_index_path(worldmap_info):
+        return UnmatchedRowStore.get_base_path(worldmap_info) + INDEX_EXTENSION
+
+    @staticmethod
+    def get_lock_path(worldmap_info):
+        return UnmatchedRowStore.get_base_path(worldmap_info) + LOCK_EXTENSION
+
+    @staticmethod
+    def make_directory(worldmap_info):
+        directory = os.path.dirname(UnmatchedRowStore.get_base_path(worldmap_info))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # made by another process
+                if not os.path.isdir(directory):
+                    raise
+
+    @staticmethod
+    def is_built(worldmap_info):
+        return os.path.isfile(UnmatchedRowStore.get_csv_path(worldmap_info)) and\
+               os.path.isfile(UnmatchedRowStore.get_index_path(worldmap_info))
+
+    @staticmethod
+    def build_if_needed(worldmap_info):
+        """
+        Build the unmatched row files, unless they exist
+
+        :returns: (True, None) or (False, error message)
+        """
+        if UnmatchedRowStore.is_built(worldmap_info):
+            return True, None
+
+        try:
+            is_locked = UnmatchedRowStore.acquire_build_lock(worldmap_info)
+        except (IOError, OSError) as ex_obj:
+            err_msg = 'Failed to lock the unmatched rows: %s' % ex_obj
+            LOGGER.error(err_msg)
+            return False, err_msg
+
+        if not is_locked:
+            # Another process is building the files
+            if UnmatchedRowStore.wait_for_build(worldmap_info):
+                return True, None
+            return False, 'The unmatched rows are still being prepared. Please try again.'
+
+        try:
+            # Built while waiting on the lock?
+            if UnmatchedRowStore.is_built(worldmap_info):
+                return True, None
+            return UnmatchedRowStore.build_rows(worldmap_info)
+        finally:
+            UnmatchedRowStore.release_build_lock(worldmap_info)
+
+    @staticmethod
+    def acquire_build_lock(worldmap_info):
+        """
+        Create the lock file--a stale lock is removed once
+
+        :returns: True if this process holds the lock
+        """
+        UnmatchedRowStore.make_directory(worldmap_info)
+        lock_path = UnmatchedRowStore.get_lock_path(worldmap_info)
+
+        for attempt in range(2):
+            try:
+                lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(lock_fd, str(os.getpid()))
+                os.close(lock_fd)
+                return True
+            except OSError as ex_obj:
+                if ex_obj.errno != errno.EEXIST:
+                    raise
+
+            try:
+                lock_age = time.time() - os.path.getmtime(lock_path)
+            except OSError:
+                continue    # just released
+            if attempt > 0 or lock_age < STALE_LOCK_SECONDS:
+                return False
+
+            LOGGER.warn('Removing stale unmatched row lock: %s', lock_path)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+        return False
+
+    @staticmethod
+    def release_build_lock(worldmap_info):
+        try:
+            os.remove(UnmatchedRowStore.get_lock_path(worldmap_info))
+        except OSError:
+            pass
+
+    @staticmethod
+    def wait_for_build(worldmap_info):
+        """
+        Wait up to BUILD_WAIT_SECONDS for another process's build
+
+        :returns: True if the files were built
+        """
+        lock_path = UnmatchedRowStore.get_lock_path(worldmap_info)
+
+        wait_until = time.time() + BUILD_WAIT_SECONDS
+        while time.time() < wait_until:
+            if UnmatchedRowStore.is_built(worldmap_info):
+                return True
+            if not os.path.isfile(lock_path):
+                break   # the build failed
+            time.sleep(BUILD_WAIT_INTERVAL)
+
+        return UnmatchedRowStore.is_built(worldmap_info)
+
+    @staticmethod
+    def build_rows(worldmap_info):
+        """
+        Find and save the unmatched rows
+
+        :returns: (True, None) or (False, error message)
+        """
+        if UnmatchedRowStore.is_lat_lng_info(worldmap_info):
+            return UnmatchedRowStore.build_lat_lng_rows(worldmap_info)
+
+        # Avoid a circular import
+        from gc_apps.gis_tabular.unmapped_row_util import UnmatchedRowHelper
+
+        unmatched_row_helper = UnmatchedRowHelper(worldmap_info)
+        if unmatched_row_helper.has_error:
+            return False, unmatched_row_helper.error_message
+
+        if not unmatched_row_helper.has_unmatched_rows:
+            return False, 'No unmatched records found.'
+
+        df = unmatched_row_helper.get_unmatched_dataframe()
+        if df is None:
+            return False, unmatched_row_helper.error_message
+
+        # Files read with an explicit encoding have unicode values
+        encoding = None
+        if worldmap_info.tabular_info.file_encoding in READ_CSV_ENCODINGS:
+            encoding = 'utf-8'
+
+        return UnmatchedRowStore.save_rows(worldmap_info, df, encoding=encoding)
+
+    @staticmethod
+    def build_lat_lng_rows(worldmap_info):
+        """
+        Save the rows the WorldMap failed to map.  These may not have the
+        same number of values as there are columns (e.g. erroneous data)
+
+        :returns: (True, None) or (False, error message)
+        """
+        unmapped_rows = None
+        if worldmap_info.core_data:
+            unmapped_rows = worldmap_info.core_data.get('unmapped_records_list', None)
+
+        if not unmapped_rows:
+            return False, 'No unmatched records found.'
+
+        column_names = [x.get('name', 'NaN') for x in (worldmap_info.attribute_data or [])]
+
+        return UnmatchedRowStore.save_row_list(worldmap_info, column_names, unmapped_rows)
+
+    @staticmethod
+    def make_partial_path(final_path):
+        """A unique ".part" file next to final_path"""
+        (fd, partial_path) = tempfile.mkstemp(\
+                                prefix=os.path.basename(final_path) + '.',\
+                                suffix=PARTIAL_FILE_SUFFIX,\
+                                dir=os.path.dirname(final_path))
+        os.close(fd)
+        # mkstemp files are only readable by their owner
+        os.chmod(partial_path, PARTIAL_FILE_MODE)
+        return partial_path
+
+    @staticmethod
+    def get_partial_paths(worldmap_info):
+        """
+        Make the directory, if needed, and unique partial files--so
+        concurrent builds never write to the same file
+
+        :returns: (partial csv path, partial index path)
+        """
+        UnmatchedRowStore.make_directory(worldmap_info)
+
+        return (UnmatchedRowStore.make_partial_path(\
+                        UnmatchedRowStore.get_csv_path(worldmap_info)),\
+                UnmatchedRowStore.make_partial_path(\
+                        UnmatchedRowStore.get_index_path(worldmap_info)))
+
+    @staticmethod
+    def rename_partial_files(worldmap_info, partial_paths):
+        (partial_csv_path, partial_index_path) = partial_paths
+
+        os.rename(partial_csv_path, UnmatchedRowStore.get_csv_path(worldmap_info))
+        os.rename(partial_index_path, UnmatchedRowStore.get_index_path(worldmap_info))
+
+    @staticmethod
+    def remove_partial_files(partial_paths, ex_obj):
+        """Clean up after a failed save
+
+        :returns: (False, error message)
+        """
+        for path in partial_paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+        err_msg = 'Failed to save unmatched rows: %s' % ex_obj
+        LOGGER.error(err_msg)
+        return False, err_msg
+
+    @staticmethod
+    def save_row_list(worldmap_info, header_row, rows):
+        """
+        Write the rows to the .csv, recording each row's offset.
+        Each file is written as a ".part" file, then renamed.
+
+        :returns: (True, None) or (False, error message)
+        """
+        try:
+            partial_paths = UnmatchedRowStore.get_partial_paths(worldmap_info)
+        except (IOError, OSError) as ex_obj:
+            return UnmatchedRowStore.remove_partial_files([], ex_obj)
+        (partial_csv_path, partial_index_path) = partial_paths
+
+        try:
+            row_offsets = []
+            with open(partial_csv_path, 'wb') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(header_row)
+                for row in rows:
+                    row_offsets.append(fh.tell())
+                    writer.writerow([UnmatchedRowStore.format_value(val) for val in row])
+
+            np.array(row_offsets, dtype=INDEX_DTYPE).tofile(partial_index_path)
+
+            UnmatchedRowStore.rename_partial_files(worldmap_info, partial_paths)
+        except (IOError, OSError) as ex_obj:
+            return UnmatchedRowStore.remove_partial_files(partial_paths, ex_obj)
+
+        return True, None
+
+    @staticmethod
+    def format_value(val):
+        """csv module values are byte strings"""
+        if isinstance(val, unicode):
+            return val.encode('utf-8')
+        return val
+
+    @staticmethod
+    def save_rows(worldmap_info, df, encoding=None):
+        """
+        Write the DataFrame to the .csv and build the row index.
+        Each file is written as a ".part" file, then renamed.
+
+        :returns: (True, None) or (False, error message)
+        """
+        try:
+            partial_paths = UnmatchedRowStore.get_partial_paths(worldmap_info)
+        except (IOError, OSError) as ex_obj:
+            return UnmatchedRowStore.remove_partial_files([], ex_obj)
+        (partial_csv_path, partial_index_path) = partial_paths
+
+        try:
+            df.to_csv(partial_csv_path, index=False, header=True, encoding=encoding)
+
+            with open(partial_csv_path, 'rb') as fh:
+                row_offsets = UnmatchedRowStore.get_row_offsets(fh)
+            np.array(row_offsets, dtype=INDEX_DTYPE).tofile(partial_index_path)
+
+            UnmatchedRowStore.rename_partial_files(worldmap_info, partial_paths)
+        except (IOError, OSError) as ex_obj:
+            return UnmatchedRowStore.remove_partial_files(partial_paths, ex_obj)
+
+        return True, None
+
+    @staticmethod
+    def get_row_offsets(fh):
+        """
+        Byte offsets of each row after the header.  A row continues
+        onto the next line if it has an open quote.
+        """
+        row_offsets = []
+        offset = 0
+        num_quotes = 0
+        is_header = True
+        for line in fh:
+            if num_quotes % 2 == 0:
+                # start of a row
+                if is_header:
+                    is_header = False
+                else:
+                    row_offsets.append(offset)
+                num_quotes = 0
+            num_quotes += line.count('"')
+            offset += len(line)
+
+        return row_offsets
+
+    @staticmethod
+    def read_row_offset(index_fh, row_num):
+        """Read a single entry of the index"""
+        index_fh.seek(row_num * np.dtype(INDEX_DTYPE).itemsize)
+        return int(np.fromfile(index_fh, dtype=INDEX_DTYPE, count=1)[0])
+
+    @staticmethod
+    def get_row_count(worldmap_info):
+        """Number of stored rows, not including the header"""
+        index_path = UnmatchedRowStore.get_index_path(worldmap_info)
+        return os.path.getsize(index_path) // np.dtype(INDEX_DTYPE).itemsize
+
+    @staticmethod
+    def get_byte_range(worldmap_info, start, count=None):
+        """
+        (first byte, last byte + 1) of rows start to start + count.
+        Rows start at 0 (the row after the header)
+        """
+        row_count = UnmatchedRowStore.get_row_count(worldmap_info)
+        csv_size = os.path.getsize(UnmatchedRowStore.get_csv_path(worldmap_info))
+
+        if start >= row_count:
+            return (csv_size, csv_size)
+
+        with open(UnmatchedRowStore.get_index_path(worldmap_info), 'rb') as index_fh:
+            start_offset = UnmatchedRowStore.read_row_offset(index_fh, start)
+
+            end_offset = csv_size
+            if count is not None and start + count < row_count:
+                end_offset = UnmatchedRowStore.read_row_offset(index_fh, start + count)
+
+        return (start_offset, end_offset)
+
+    @staticmethod
+    def read_header(worldmap_info):
+        with open(UnmatchedRowStore.get_csv_path(worldmap_info), 'rb') as fh:
+            return next(csv.reader(fh))
+
+    @staticmethod
+    def read_rows(worldmap_info, start=0, count=None):
+        """
+        Read rows start to start + count (all rows if count is None)
+
+        :returns: (header row, list of rows).  Values are strings
+        """
+        (start_offset, end_offset) = UnmatchedRowStore.get_byte_range(\
+                                            worldmap_info, start, count)
+
+        with open(UnmatchedRowStore.get_csv_path(worldmap_info), 'rb') as fh:
+            header = next(csv.reader(fh))
+            fh.seek(start_offset)
+            csv_text = fh.read(end_offset - start_offset)
+
+        rows = list(csv.reader(csv_text.splitlines(True)))
+
+        return header, rows
+
+    @staticmethod
+    def iterate_csv_blocks(worldmap_info, count=None, include_header_row=True):
+        """
+        Yield the .csv in blocks of READ_BLOCK_SIZE bytes--the header
+        (optional) and the first count rows (all rows if count is None)
+        """
+        (start_offset, end_offset) = UnmatchedRowStore.get_byte_range(\
+                                            worldmap_info, 0, count)
+        if not include_header_row:
+            position = start_offset
+        else:
+            position = 0
+
+        with open(UnmatchedRowStore.get_csv_path(worldmap_info), 'rb') as fh:
+            fh.seek(position)
+            while position < end_offset:
+                block = fh.read(min(READ_BLOCK_SIZE, end_offset - position))
+                if not block:
+                    break
+                position += len(block)
+                yield block
+
+    @staticmethod
+    def remove_rows(worldmap_info):
+        """Delete the unmatched row files"""
+        if not worldmap_info.md5:
+            return
+
+        for path in (UnmatchedRowStore.get_csv_path(worldmap_info),\
+                     UnmatchedRowStore.get_index_path(worldmap_info)):
+            if os.path.isfile(path):
+                os.remove(path)
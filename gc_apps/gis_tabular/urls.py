@@ -33,6 +33,12 @@ urlpatterns = [
     url(r'^view-unmatched-lat-lng-rows-json/(?P<tab_md5>\w{32})$', views.view_unmatched_lat_lng_rows_json,\
         name='view_unmatched_lat_lng_rows'),
 
+    url(r'^unmatched-join-rows-page-json/(?P<tab_md5>\w{32})$', views.view_unmatched_join_rows_page_json,\
+        name='view_unmatched_join_rows_page'),
+
+    url(r'^unmatched-lat-lng-rows-page-json/(?P<tab_md5>\w{32})$', views.view_unmatched_lat_lng_rows_page_json,\
+        name='view_unmatched_lat_lng_rows_page'),
+
     url(r'^download-unmatched-lat-lng-rows/(?P<tab_md5>\w{32})$', views.download_unmatched_lat_lng_rows,\
         name='download_unmatched_lat_lng_rows'),
 
@@ -45,6 +51,9 @@ urlpatterns = [
     url(r'^process-tabular-form/$', views_create_layer.view_map_tabular_file_form,\
         name='view_map_tabular_file_form'),
 
+    url(r'^join-preflight-form/$', views_create_layer.view_join_preflight_form,\
+        name='view_join_preflight_form'),
+
     url(r'^delete-map/$', views_delete.view_delete_tabular_map, name="view_delete_tabular_map"),
 
 ]
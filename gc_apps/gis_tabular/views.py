@@ -5,7 +5,6 @@ Tabular views for:
         - Available geospatial types
         - Available geospatial layers
 """
-import csv
 
 from django.shortcuts import render
 
@@ -15,6 +14,7 @@ from django.template.loader import render_to_string
 from gc_apps.gis_tabular.models import TabularFileInfo,\
                     WorldMapJoinLayerInfo, WorldMapLatLngInfo
 from gc_apps.gis_tabular.unmapped_row_util import UnmatchedRowHelper
+from gc_apps.gis_tabular.unmatched_row_pager import UnmatchedRowPager
 
 from gc_apps.gis_tabular.forms import LatLngColumnsForm, ChooseSingleColumnForm,\
     SELECT_LABEL, INITIAL_SELECT_CHOICE
@@ -25,7 +25,6 @@ from gc_apps.worldmap_layers.models import WorldMapLayerInfo
 
 from gc_apps.worldmap_connect.utils import get_latest_jointarget_information,\
         get_geocode_types_and_join_layers
-from gc_apps.gis_tabular.unmapped_row_util import MAX_FAILED_ROWS_TO_BUILD
 
 from gc_apps.geo_utils.geoconnect_step_names import GEOCONNECT_STEP_KEY,\
     GEOCONNECT_STEPS, STEP1_EXAMINE, STEP2_STYLE,\
@@ -33,7 +32,8 @@ from gc_apps.geo_utils.geoconnect_step_names import GEOCONNECT_STEP_KEY,\
 from gc_apps.geo_utils.view_util import get_common_lookup
 
 from gc_apps.geo_utils.message_helper_json import MessageHelperJSON
-from gc_apps.geo_utils.time_util import get_datetime_string_for_file
+from gc_apps.geo_utils.csv_stream_util import iterate_csv_rows,\
+    get_csv_download_response
 
 from gc_apps.gis_tabular.forms import GEO_TYPE_LATITUDE_LONGITUDE
 
@@ -106,8 +106,7 @@ def build_map_html(request, worldmap_info):
     template_dict = get_common_lookup(request)
 
     failed_records_list = worldmap_info.get_failed_rows()
-    num_failed_download_records = min(MAX_FAILED_ROWS_TO_BUILD,\
-                            worldmap_info.get_unmapped_record_count())
+    num_failed_download_records = worldmap_info.get_unmapped_record_count()
 
     template_dict.update(dict(worldmap_layerinfo=worldmap_info,
             INITIAL_SELECT_CHOICE=INITIAL_SELECT_CHOICE,
@@ -181,7 +180,10 @@ def view_unmatched_join_rows_json(request, tab_md5):
 
 
 def download_unmatched_join_rows(request, tab_md5):
-    """Download the unmatched tabular *join* data in csv format"""
+    """
+    Download the unmatched tabular *join* data in csv format.
+    All rows are streamed from the UnmatchedRowStore
+    """
     # Retrieve the Tabular file information
     #
     try:
@@ -195,22 +197,19 @@ def download_unmatched_join_rows(request, tab_md5):
     else:
         return HttpResponse("No unmatched records found.")
 
-
     kwargs = dict(show_all_failed_rows=True)
     unmatched_row_helper = UnmatchedRowHelper(worldmap_info, **kwargs)
-    csv_string = unmatched_row_helper.get_failed_rows_as_csv()
-
     if unmatched_row_helper.has_error:
         return HttpResponse(unmatched_row_helper.error_message)
 
-    response = HttpResponse(csv_string, content_type='text/csv')
-
-    file_name = 'unmapped_rows__%s.csv' % (get_datetime_string_for_file())
-    response['Content-Disposition'] = 'attachment; filename="%s"' % file_name
+    if not unmatched_row_helper.has_unmatched_rows:
+        return HttpResponse("No unmatched records found.")
 
-    return response
+    csv_chunks = unmatched_row_helper.get_failed_rows_as_csv_iterator()
+    if unmatched_row_helper.has_error:
+        return HttpResponse(unmatched_row_helper.error_message)
 
-    #return HttpResponse(csv_string, content_type='text/csv')
+    return get_csv_download_response(csv_chunks)
 
 
 def download_unmatched_lat_lng_rows(request, tab_md5):
@@ -237,18 +236,9 @@ def download_unmatched_lat_lng_rows(request, tab_md5):
     #
     unmatched_rows = worldmap_info.core_data.get('unmapped_records_list', [])
 
-    response = HttpResponse(content_type='text/csv')
+    csv_chunks = iterate_csv_rows(unmatched_rows, header_row=column_names)
 
-    file_name = 'unmapped_rows__%s.csv' % (get_datetime_string_for_file())
-
-    response['Content-Disposition'] = 'attachment; filename="%s"' % file_name
-
-    writer = csv.writer(response)
-    writer.writerow(column_names)
-    for row_info in unmatched_rows:
-        writer.writerow(row_info)
-
-    return response
+    return get_csv_download_response(csv_chunks)
 
 
 def view_unmatched_lat_lng_rows_json(request, tab_md5):
@@ -289,6 +279,51 @@ def view_unmatched_lat_lng_rows_json(request, tab_md5):
     return HttpResponse(json_msg, content_type="application/json")
 
 
+def view_unmatched_join_rows_page_json(request, tab_md5):
+    """
+    A page of the unmatched rows resulting from a Table Join.
+    See UnmatchedRowPager for the offset/limit/cursor params
+    """
+    try:
+        worldmap_info = WorldMapJoinLayerInfo.objects.get(md5=tab_md5)
+    except WorldMapJoinLayerInfo.DoesNotExist:
+        raise Http404('No WorldMapJoinLayerInfo for md5: %s' % tab_md5)
+
+    return get_unmatched_rows_page_response(request, worldmap_info)
+
+
+def view_unmatched_lat_lng_rows_page_json(request, tab_md5):
+    """
+    A page of the unmatched rows resulting from trying to map lat/lng columns.
+    See UnmatchedRowPager for the offset/limit/cursor params
+    """
+    try:
+        worldmap_info = WorldMapLatLngInfo.objects.get(md5=tab_md5)
+    except WorldMapLatLngInfo.DoesNotExist:
+        raise Http404('No WorldMapLatLngInfo for md5: %s' % tab_md5)
+
+    return get_unmatched_rows_page_response(request, worldmap_info)
+
+
+def get_unmatched_rows_page_response(request, worldmap_info):
+    """
+    JSON response with a page of unmatched rows
+    """
+    if worldmap_info.get_unmapped_record_count() < 1:
+        json_msg = MessageHelperJSON.get_json_fail_msg("No unmatched records found.")
+        return HttpResponse(json_msg, content_type="application/json")
+
+    pager = UnmatchedRowPager(worldmap_info, request.GET)
+    page_dict = pager.get_page_dict()
+    if pager.has_error:
+        json_msg = MessageHelperJSON.get_json_fail_msg(pager.error_message)
+        return HttpResponse(json_msg, status=400, content_type="application/json")
+
+    json_msg = MessageHelperJSON.get_json_success_msg(msg="Records found",\
+                                                      data_dict=page_dict)
+    return HttpResponse(json_msg, content_type="application/json")
+
+
 def view_tabular_file_latest(request):
 
     tabular_info = TabularFileInfo.objects.first()
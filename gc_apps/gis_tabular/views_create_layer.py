@@ -10,24 +10,22 @@ from django.views.decorators.http import require_POST
 from gc_apps.geo_utils.message_helper_json import MessageHelperJSON, format_errors_as_text
 from gc_apps.geo_utils.msg_util import msg, msgt
 
-from gc_apps.gis_basic_file.dataverse_info_service import get_dataverse_info_dict
-
 from gc_apps.gis_tabular.models import TabularFileInfo # for testing
-from gc_apps.gis_tabular.models import WorldMapTabularLayerInfo
 from gc_apps.gis_tabular.forms import LatLngColumnsForm, ChooseSingleColumnForm
 
-from gc_apps.dv_notify.metadata_updater import MetadataUpdater
-
 from gc_apps.geo_utils.geoconnect_step_names import PANEL_TITLE_MAP_DATA_FILE,\
     PANEL_TITLE_STYLE_MAP
 
-from gc_apps.worldmap_connect.utils import get_geocode_types_and_join_layers
+from gc_apps.worldmap_connect.utils import get_geocode_types_and_join_layers,\
+    get_latest_jointarget_information
 
-from gc_apps.worldmap_connect.lat_lng_service import create_map_from_datatable_lat_lng
-from gc_apps.worldmap_connect.table_join_map_maker import TableJoinMapMaker
+from gc_apps.worldmap_connect.join_preflight import JoinPreflightCheck
+from gc_apps.worldmap_connect.map_job_runner import MapJobRunner,\
+    PARAM_CHOSEN_COLUMN, PARAM_CHOSEN_LAYER, PARAM_LAT_COLUMN, PARAM_LNG_COLUMN
+from gc_apps.worldmap_connect.views import get_map_job_response
+from gc_apps.layer_types.static_vals import TYPE_JOIN_LAYER, TYPE_LAT_LNG_LAYER
 
 #from gc_apps.gis_tabular.dataverse_test_info import DataverseTestInfo
-from gc_apps.gis_tabular.views import build_map_html
 
 import logging
 LOGGER = logging.getLogger(__name__)
@@ -79,72 +77,88 @@ def view_map_tabular_file_form(request):
 
     print 'cleaned_data', form_single_column.cleaned_data
 
-    # -----------------------------------------
-    # Get Dataverse info dict
-    # -----------------------------------------
-    dataverse_metadata_dict = get_dataverse_info_dict(tabular_info)
-
     # -----------------------------------------
     # Use the WorldMap API and
     # try to create a layer
+    #   - If settings.WORLDMAP_ASYNC_MAP_JOBS is True, the
+    #     response has a "status_url" to poll
     # -----------------------------------------
-    tj_map_maker = TableJoinMapMaker(tabular_info,
-                        dataverse_metadata_dict,
-                        form_single_column.cleaned_data.get('chosen_column'),
-                        form_single_column.cleaned_data.get('chosen_layer'),
-                        )
-    success = tj_map_maker.run_map_create()
-    msg('success: %s' % success)
-    if not success:
-        json_msg = MessageHelperJSON.get_json_fail_msg(\
-                    'Sorry! ' + tj_map_maker.get_error_msg())
-        msg('error msg: %s' % json_msg)
-        return HttpResponse(json_msg, content_type="application/json", status=200)
+    map_job = MapJobRunner.create_job(TYPE_JOIN_LAYER,\
+                    tabular_info.md5,\
+                    {PARAM_CHOSEN_COLUMN: form_single_column.cleaned_data.get('chosen_column'),\
+                     PARAM_CHOSEN_LAYER: form_single_column.cleaned_data.get('chosen_layer')})
+    map_job = MapJobRunner.start_job(map_job)
 
-    # -----------------------------------------
-    # Succeeded!  Create a WorldMapTabularLayerInfo object
-    # -----------------------------------------
-    worldmap_tabular_info = WorldMapTabularLayerInfo.build_from_worldmap_json(tabular_info,\
-                                tj_map_maker.get_map_info())
+    return get_map_job_response(request, map_job)
 
+    #json_msg = MessageHelperJSON.get_json_success_msg('You got here! (view_map_tabular_file_form)')
+    #return HttpResponse(json_msg, content_type="application/json", status=200)
+
+
+@require_POST
+def view_join_preflight_form(request):
+    """
+    AJAX call: Using the column and layer selected in the join form,
+    predict the number of rows that will map--without calling the WorldMap.
+
+    Uses a JoinTargetKeySet for the selected layer.  If none is
+    available, "preflight_available" is False.
+    """
+    tabular_file_info_id = request.POST.get('tabular_file_info_id', -1)
 
-    if worldmap_tabular_info is None:
-        LOGGER.error("Failed to create WorldMapTabularLayerInfo using %s",\
-            tj_map_maker.get_map_info())
-        user_msg = 'Sorry! Failed to create map. Please try again. (code: s1)'
-        json_msg = MessageHelperJSON.get_json_fail_msg(user_msg)
+    try:
+        tabular_info = TabularFileInfo.objects.get(pk=tabular_file_info_id)
+    except TabularFileInfo.DoesNotExist:
+        err_msg = 'Sorry! The Tabular File was not found. (tabular_file_info_id)'
+        json_msg = MessageHelperJSON.get_json_fail_msg(err_msg)
         return HttpResponse(json_msg, content_type="application/json", status=200)
 
-    # -----------------------------------------
-    # Notify Dataverse of the new map
-    # -----------------------------------------
-    MetadataUpdater.update_dataverse_with_metadata(worldmap_tabular_info)
+    (geocode_types_from_worldmap, available_layers_list) = get_geocode_types_and_join_layers()
+
+    form_single_column = ChooseSingleColumnForm(tabular_info.id,\
+                    available_layers_list,\
+                    tabular_info.column_names,\
+                    request.POST)
+    if not form_single_column.is_valid():
+        json_msg = MessageHelperJSON.get_json_fail_msg(\
+                        format_errors_as_text(form_single_column, for_web=True))
+        return HttpResponse(json_msg, content_type="application/json", status=200)
 
     # -----------------------------------------
-    # Build the Map HTML chunk to replace the form
+    # Retrieve the join target
     # -----------------------------------------
-    map_html, user_message_html = build_map_html(request, worldmap_tabular_info)
-    if map_html is None:    # Failed!  Send an error
-        LOGGER.error("Failed to create map HTML using WorldMapTabularLayerInfo: %s (%d)",\
-            worldmap_tabular_info, worldmap_tabular_info.id)
-        user_msg = 'Sorry! Failed to create map. Please try again. (code: s2)'
-        json_msg = MessageHelperJSON.get_json_fail_msg(user_msg)
+    join_target_info = get_latest_jointarget_information()
+    single_join_target_info = None
+    if join_target_info is not None:
+        single_join_target_info = join_target_info.get_single_join_target_info(\
+                            form_single_column.cleaned_data.get('chosen_layer'))
+    if single_join_target_info is None:
+        json_msg = MessageHelperJSON.get_json_fail_msg(\
+                        'Sorry! Failed to retrieve target layer information.')
         return HttpResponse(json_msg, content_type="application/json", status=200)
 
     # -----------------------------------------
-    # Looks good.  In the JSON response, send
-    #   back the map HTML
+    # Check the join
     # -----------------------------------------
-    data_dict = dict(map_html=map_html,
-                user_message_html=user_message_html,
-                id_main_panel_title=PANEL_TITLE_STYLE_MAP)
+    preflight = JoinPreflightCheck(tabular_info,\
+                        form_single_column.cleaned_data.get('chosen_column'),\
+                        single_join_target_info)
 
-    json_msg = MessageHelperJSON.get_json_success_msg("great job", data_dict=data_dict)
+    if not preflight.run_check():
+        if preflight.has_error:
+            json_msg = MessageHelperJSON.get_json_fail_msg(\
+                            'Sorry! ' + preflight.error_message)
+        else:
+            json_msg = MessageHelperJSON.get_json_success_msg(\
+                            data_dict=dict(preflight_available=False))
+        return HttpResponse(json_msg, content_type="application/json", status=200)
 
-    return HttpResponse(json_msg, content_type="application/json", status=200)
+    data_dict = preflight.get_results()
+    data_dict['preflight_available'] = True
 
-    #json_msg = MessageHelperJSON.get_json_success_msg('You got here! (view_map_tabular_file_form)')
-    #return HttpResponse(json_msg, content_type="application/json", status=200)
+    json_msg = MessageHelperJSON.get_json_success_msg(preflight.get_user_message(),\
+                                                      data_dict=data_dict)
+    return HttpResponse(json_msg, content_type="application/json", status=200)
 
 
 @require_POST
@@ -176,80 +190,20 @@ def view_process_lat_lng_form(request):
         return HttpResponse(json_msg, content_type="application/json", status=200)
 
 
-    (success, worldmap_data_or_err_msg) = create_map_from_datatable_lat_lng(\
-                        tabular_info,\
-                        form_lat_lng.get_latitude_colname(),\
-                        form_lat_lng.get_longitude_colname(),\
-                        )
-
-    # -----------------------------------------
-    # Failed! Send error message
-    # -----------------------------------------
-    if not success:
-        json_msg = MessageHelperJSON.get_json_fail_msg(\
-                'Sorry! ' + worldmap_data_or_err_msg)
-        return HttpResponse(json_msg, content_type="application/json", status=200)
-
-
     # -----------------------------------------
-    # Succeeded!  Create a WorldMapTabularLayerInfo object
-    # -----------------------------------------
-    user_msg, response_data = worldmap_data_or_err_msg
-    #json_msg = MessageHelperJSON.get_json_success_msg(user_msg, data_dict=response_data)
-    #return HttpResponse(json_msg, content_type="application/json", status=200)
-
-    worldmap_latlng_info = WorldMapTabularLayerInfo.build_from_worldmap_json(tabular_info,\
-                            response_data)
-
-    if worldmap_latlng_info is None:
-        LOGGER.error("Failed to create WorldMapLatLngInfo using data: %s",\
-                    response_data)
-        user_msg = 'Sorry! Failed to create map. Please try again. (code: s4)'
-        json_msg = MessageHelperJSON.get_json_fail_msg(user_msg)
-        return HttpResponse(json_msg, content_type="application/json", status=200)
-
-
-    # -----------------------------------------
-    # Notify Dataverse of the new map
+    # Use the WorldMap API and
+    # try to create a layer
+    #   - If settings.WORLDMAP_ASYNC_MAP_JOBS is True, the
+    #     response has a "status_url" to poll
     # -----------------------------------------
-    MetadataUpdater.update_dataverse_with_metadata(worldmap_latlng_info)
+    map_job = MapJobRunner.create_job(TYPE_LAT_LNG_LAYER,\
+                    tabular_info.md5,\
+                    {PARAM_LAT_COLUMN: form_lat_lng.get_latitude_colname(),\
+                     PARAM_LNG_COLUMN: form_lat_lng.get_longitude_colname()})
+    map_job = MapJobRunner.start_job(map_job)
 
-    # -----------------------------------------
-    # Possible that this failed?
-    # Make sure at least 1 row mapped
-    # -----------------------------------------
     # Skip for now!  Error in row counts for Lat/Lng!
-    """
-    if worldmap_latlng_info.did_any_rows_map() is False:
-        # Delete the worldmap_latlng_info object
-        worldmap_latlng_info.delete()
-
-        # Send back a user error message
-        user_msg = "Sorry!  We couldn't map any of those latitude and longitude values."
-        return HttpResponse(MessageHelperJSON.get_json_fail_msg(user_msg),\
-                content_type="application/json",\
-                status=200)
-    """
-    # -----------------------------------------
-    # Build the Map HTML chunk to replace the form
-    # -----------------------------------------
-    map_html, user_message_html = build_map_html(request, worldmap_latlng_info)
-    if map_html is None:    # Failed!  Send an error
-        LOGGER.error("Failed to create map HTML using WorldMapLatLngInfo: %s (%d)",\
-            worldmap_latlng_info, worldmap_latlng_info.id)
-        user_msg = 'Sorry! Failed to create map. Please try again. (code: s5)'
-        json_msg = MessageHelperJSON.get_json_fail_msg(user_msg)
-        return HttpResponse(json_msg, content_type="application/json", status=200)
-
-
-    # -----------------------------------------
-    # Looks good.  In the JSON response, send
-    #   back the map HTML
-    # -----------------------------------------
-    data_dict = dict(map_html=map_html,
-                user_message_html=user_message_html,
-                id_main_panel_title=PANEL_TITLE_STYLE_MAP)
+    #   (Check that at least 1 row mapped via
+    #    worldmap_latlng_info.did_any_rows_map())
 
-    json_msg = MessageHelperJSON.get_json_success_msg("great job", data_dict=data_dict)
-
-    return HttpResponse(json_msg, content_type="application/json", status=200)
+    return get_map_job_response(request, map_job)
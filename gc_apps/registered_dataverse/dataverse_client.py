@@ -0,0 +1,188 @@
+"""
+Pooled HTTP clients for Dataverse installations
+
+There's one keep-alive requests.Session per RegisteredDataverse (per
+process), keyed on the installation url--"scheme://host", the same
+format as RegisteredDataverse.dataverse_url.  Any url on the
+installation finds its client:
+
+    client = DataverseClient.get_client(callback_url)
+    r = client.post(callback_url, data=json.dumps(token_data))
+
+At most settings.DATAVERSE_MAX_CONNECTIONS_PER_HOST requests to an
+installation run at once.  Additional requests wait up to
+settings.DATAVERSE_CONNECTION_WAIT_TIMEOUT seconds for a free slot,
+then raise requests.exceptions.Timeout--a slot might never come back,
+e.g. from an unclosed streamed response.  A streamed response holds
+its slot until closed.
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+    from urlparse import urlparse   # 2.x
+except ImportError:
+    from urllib.parse import urlparse   # 3.x
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds between checks for a free request slot
+SLOT_WAIT_INTERVAL = 0.05
+
+
+class DataverseClient(object):
+    """
+    Pooled session for a single Dataverse installation
+    """
+    _clients = {}
+    _clients_pid = None
+    _clients_lock = threading.Lock()
+
+    def __init__(self, dataverse_url):
+        self.dataverse_url = dataverse_url
+
+        max_connections = getattr(settings, 'DATAVERSE_MAX_CONNECTIONS_PER_HOST', 4)
+
+        # Caps concurrent requests, see request().  The pool doesn't
+        #   block: requests can't set a pool timeout, so blocking on a
+        #   full pool could wait forever
+        self.request_slots = threading.BoundedSemaphore(max_connections)
+
+        adapter = HTTPAdapter(pool_connections=1,\
+                              pool_maxsize=max_connections,\
+                              pool_block=False)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def get_client_key(url):
+        """
+        :returns: "scheme://host" for the url, lowercase, or None
+        """
+        if not url:
+            return None
+
+        parsed_url = urlparse(url)
+        if not (parsed_url.scheme and parsed_url.netloc):
+            return None
+
+        return '://'.join([parsed_url.scheme, parsed_url.netloc]).lower()
+
+    @staticmethod
+    def get_client(url):
+        """
+        :param url: any url on the Dataverse installation
+        :returns: DataverseClient
+
+        Clients are rebuilt after a fork so processes don't share sockets
+        """
+        client_key = DataverseClient.get_client_key(url)
+        if client_key is None:
+            # Let requests raise the usual error, e.g. MissingSchema
+            LOGGER.error('Not a valid Dataverse url: %s', url)
+            client_key = ''
+
+        with DataverseClient._clients_lock:
+            if DataverseClient._clients_pid != os.getpid():
+                DataverseClient._clients = {}
+                DataverseClient._clients_pid = os.getpid()
+
+            client = DataverseClient._clients.get(client_key, None)
+            if client is None:
+                LOGGER.debug('New Dataverse client: %s', client_key)
+                client = DataverseClient(client_key)
+                DataverseClient._clients[client_key] = client
+
+        return client
+
+    @staticmethod
+    def get_client_for_registered_dataverse(registered_dataverse):
+        """:param registered_dataverse: RegisteredDataverse"""
+        return DataverseClient.get_client(registered_dataverse.dataverse_url)
+
+    @staticmethod
+    def reset_clients():
+        """Close the pooled connections for every installation"""
+        with DataverseClient._clients_lock:
+            for client in DataverseClient._clients.values():
+                client.session.close()
+            DataverseClient._clients = {}
+
+    def acquire_request_slot(self):
+        """
+        Wait up to settings.DATAVERSE_CONNECTION_WAIT_TIMEOUT for a free
+        request slot.  (Python 2's Semaphore.acquire has no timeout.)
+
+        :returns: boolean, True if a slot was acquired
+        """
+        wait_timeout = getattr(settings, 'DATAVERSE_CONNECTION_WAIT_TIMEOUT', 30)
+        deadline = time.time() + wait_timeout
+
+        while not self.request_slots.acquire(False):
+            if time.time() >= deadline:
+                return False
+            time.sleep(SLOT_WAIT_INTERVAL)
+        return True
+
+    def release_slot_on_close(self, resp):
+        """
+        Release the request slot held by a streamed response
+        when it's closed--once, however often close() is called
+        """
+        original_close = resp.close
+        slot_held = [True]
+        slot_lock = threading.Lock()
+
+        def close_and_release():
+            try:
+                original_close()
+            finally:
+                with slot_lock:
+                    release_slot = slot_held[0]
+                    slot_held[0] = False
+                if release_slot:
+                    self.request_slots.release()
+
+        resp.close = close_and_release
+
+    def request(self, method, url, **kwargs):
+        """
+        :param kwargs: passed to requests.Session.request.  With
+            stream=True, close the response to free its request slot
+        :returns: requests.Response
+        """
+        if not self.acquire_request_slot():
+            LOGGER.error('No free connection to %s', self.dataverse_url)
+            raise requests.exceptions.Timeout(\
+                    'No free connection to %s after %s seconds'\
+                    % (self.dataverse_url,\
+                       getattr(settings, 'DATAVERSE_CONNECTION_WAIT_TIMEOUT', 30)))
+
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except Exception:
+            self.request_slots.release()
+            raise
+
+        if kwargs.get('stream', False):
+            self.release_slot_on_close(resp)
+        else:
+            # The body has been read, the connection is back in the pool
+            self.request_slots.release()
+
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
@@ -1,9 +1,15 @@
+import threading
+
+import requests
+
 from gc_apps.geo_utils.msg_util import *
 
 from django.test import TestCase
+from django.test.utils import override_settings
 
 from gc_apps.registered_dataverse.models import RegisteredDataverse
 from gc_apps.registered_dataverse.registered_dataverse_helper import find_registered_dataverse
+from gc_apps.registered_dataverse.dataverse_client import DataverseClient
 
 class RegisteredDataverseParseTest(TestCase):
     fixtures = ['testdata.json']
@@ -64,4 +70,98 @@ class RegisteredDataverseParseTest(TestCase):
         self.fail_to_find_existing_registered_dv('http://dvn-build.hmdc.harvard.edu:443')   # not https
         
         
-        
\ No newline at end of file
+        
+
+class DataverseClientTest(TestCase):
+
+    def tearDown(self):
+        DataverseClient.reset_clients()
+
+    def test_client_per_installation(self):
+
+        msgn('check client keys')
+        self.assertEqual(DataverseClient.get_client_key('HTTPS://Dataverse.Harvard.edu/api/access/datafile/1'),\
+                         'https://dataverse.harvard.edu')
+        self.assertEqual(DataverseClient.get_client_key('not a url'), None)
+
+        msgn('same client for the same installation')
+        client = DataverseClient.get_client('https://dataverse.harvard.edu/api/worldmap/update-layer-metadata/')
+        self.assertTrue(client is DataverseClient.get_client('https://dataverse.harvard.edu/callback'))
+        self.assertTrue(client is DataverseClient.get_client_for_registered_dataverse(\
+                            RegisteredDataverse(dataverse_url='https://dataverse.harvard.edu')))
+
+        self.assertFalse(client is DataverseClient.get_client('https://demo.dataverse.org/api/'))
+
+    @override_settings(DATAVERSE_MAX_CONNECTIONS_PER_HOST=2,\
+                       DATAVERSE_CONNECTION_WAIT_TIMEOUT=0.2)
+    def test_request_slots(self):
+
+        client = DataverseClient.get_client('https://dataverse.harvard.edu')
+        client.session = FakeSession()
+
+        msgn('streamed responses hold a slot until closed')
+        resp1 = client.get('https://dataverse.harvard.edu/file/1', stream=True)
+        resp2 = client.get('https://dataverse.harvard.edu/file/2', stream=True)
+        self.assertRaises(requests.exceptions.Timeout,\
+                          client.get, 'https://dataverse.harvard.edu/file/3')
+        self.assertEqual(client.session.num_requests, 2)
+
+        resp1.close()
+        resp1.close()   # released once
+        client.get('https://dataverse.harvard.edu/file/3')
+        resp2.close()
+
+        msgn('a failed request frees its slot')
+        client.session.error = requests.exceptions.ConnectionError('down')
+        for _ in range(3):
+            self.assertRaises(requests.exceptions.ConnectionError,\
+                              client.get, 'https://dataverse.harvard.edu/api/')
+        client.session.error = None
+
+        msgn('at most 2 concurrent requests from 6 threads')
+        client.session.release_event = threading.Event()
+        threads = [threading.Thread(target=client.get,\
+                                    args=('https://dataverse.harvard.edu/api/',))\
+                   for _ in range(6)]
+        with self.settings(DATAVERSE_CONNECTION_WAIT_TIMEOUT=5):
+            for thread in threads:
+                thread.start()
+            client.session.release_event.wait(0.2)
+            self.assertEqual(client.session.num_running, 2)
+            client.session.release_event.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(client.session.max_running, 2)
+        self.assertEqual(client.session.num_requests, 3 + 6)
+
+
+class FakeResponse(object):
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    """Count the requests running at once"""
+    def __init__(self):
+        self.num_requests = 0
+        self.num_running = 0
+        self.max_running = 0
+        self.error = None
+        self.release_event = None
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if self.error is not None:
+            raise self.error
+        with self.lock:
+            self.num_requests += 1
+            self.num_running += 1
+            self.max_running = max(self.max_running, self.num_running)
+        if self.release_event is not None:
+            self.release_event.wait(5)
+        with self.lock:
+            self.num_running -= 1
+        return FakeResponse()
+
+    def close(self):
+        pass
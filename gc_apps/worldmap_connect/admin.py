@@ -1,9 +1,26 @@
 from django.contrib import admin
 
-from gc_apps.worldmap_connect.models import JoinTargetInformation
+from gc_apps.worldmap_connect.models import JoinTargetInformation, JoinTargetKeySet,\
+    MapJob
 
 class JoinTargetInformationAdmin(admin.ModelAdmin):
     save_on_top = True
     list_display = ('name', 'created', 'modified')
 
 admin.site.register(JoinTargetInformation, JoinTargetInformationAdmin)
+
+class JoinTargetKeySetAdmin(admin.ModelAdmin):
+    save_on_top = True
+    list_display = ('target_layer_name', 'target_layer_id', 'target_column_name',\
+                    'num_keys', 'modified')
+    readonly_fields = ('created', 'modified')
+
+admin.site.register(JoinTargetKeySet, JoinTargetKeySetAdmin)
+
+class MapJobAdmin(admin.ModelAdmin):
+    save_on_top = True
+    list_display = ('layer_type', 'state', 'gis_data_md5', 'started', 'finished', 'created')
+    list_filter = ('state', 'layer_type')
+    readonly_fields = ('created', 'modified', 'md5')
+
+admin.site.register(MapJob, MapJobAdmin)
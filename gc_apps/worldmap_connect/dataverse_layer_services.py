@@ -28,6 +28,7 @@ from shared_dataverse_information.worldmap_api_helper.url_helper import\
         DELETE_TABLEJOIN
 
 from gc_apps.geo_utils.message_helper_json import MessageHelperJSON
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 
 """
 Functions that interact with the WorldMap API to:
@@ -83,10 +84,9 @@ def delete_map_layer(gis_data_info, worldmap_layer_info):
     print ('DELETE_LAYER_API_PATH: %s' % DELETE_LAYER_API_PATH)
     print ("data_params: %s" % data_params)
     try:
-        r = requests.post(DELETE_LAYER_API_PATH\
+        r = WorldMapClient.post(DELETE_LAYER_API_PATH\
                         , data=data_params\
-                        , auth=settings.WORLDMAP_ACCOUNT_AUTH\
-                        , timeout=settings.WORLDMAP_SHORT_TIMEOUT)
+                        , read_timeout=settings.WORLDMAP_SHORT_TIMEOUT)
     except requests.exceptions.ConnectionError as exception_obj:
 
         err_msg =  ('Failed to retrieve data from the WorldMap.'
@@ -134,9 +134,8 @@ def delete_worldmap_tablejoin(worldmap_layer_info):
     print ('delete_api_path: %s' % delete_api_path)
 
     try:
-        r = requests.post(delete_api_path\
-                        , auth=settings.WORLDMAP_ACCOUNT_AUTH\
-                        , timeout=settings.WORLDMAP_SHORT_TIMEOUT)
+        r = WorldMapClient.post(delete_api_path\
+                        , read_timeout=settings.WORLDMAP_SHORT_TIMEOUT)
     except requests.exceptions.ConnectionError as exception_obj:
 
         err_msg = """Failed to delete the map.
@@ -207,10 +206,11 @@ def get_layer_info_using_dv_info(params_dict):
     # Make the request
     #--------------------------------------
     try:
-        resp = requests.post(GET_LAYER_INFO_BY_DATAVERSE_INSTALLATION_AND_FILE_API_PATH\
+        # A lookup, safe to retry
+        resp = WorldMapClient.post(GET_LAYER_INFO_BY_DATAVERSE_INSTALLATION_AND_FILE_API_PATH\
                         , data=data_params\
-                        , auth=settings.WORLDMAP_ACCOUNT_AUTH\
-                        , timeout=settings.WORLDMAP_SHORT_TIMEOUT)
+                        , read_timeout=settings.WORLDMAP_SHORT_TIMEOUT\
+                        , retry=True)
     except requests.exceptions.ConnectionError as exception_obj:
 
         err_msg = """Sorry! Failed to retrieve data from the WorldMap.
@@ -278,9 +278,8 @@ def get_join_targets():
     # Make the request
     #--------------------------------------
     try:
-        r = requests.get(GET_JOIN_TARGETS\
-                        , auth=settings.WORLDMAP_ACCOUNT_AUTH\
-                        , timeout=settings.WORLDMAP_SHORT_TIMEOUT)
+        r = WorldMapClient.get(GET_JOIN_TARGETS\
+                        , read_timeout=settings.WORLDMAP_SHORT_TIMEOUT)
     except requests.exceptions.ConnectionError as exception_obj:
 
         err_msg = """Sorry! Failed to retrieve data from the WorldMap.
@@ -0,0 +1,449 @@
+"""
+Add a formatted join column to a tabular file--reading only the join column
+
+Used by TableJoinMapMaker when the WorldMap target column is a string
+and/or zero-padded.
+
+    (1) is_formatted_column_needed(): the column's type comes from the
+        TabularFileInfo's column_schema.  (Without a column_schema, the
+        join column is read in chunks of chunk_size rows to find its type.)
+        Only the zero padding check reads the column--with usecols, so
+        other columns aren't parsed.
+    (2) write_join_file(): the join column is read in chunks again,
+        formatted, and appended to the original rows as they're copied
+        to the TabularFileInfo's dv_join_file.
+
+Memory use depends on chunk_size, not the size of the file.
+
+    formatter = JoinColumnFormatter(tabular_info, 'BG_ID_10', single_join_target_info)
+    if formatter.is_formatted_column_needed():
+        formatter.write_join_file('BG_ID_10_formatted')
+"""
+import os
+import logging
+from csv import QUOTE_NONNUMERIC
+
+import pandas as pd
+import numpy as np
+
+from gc_apps.geo_utils.join_key_formatter import format_join_keys,\
+    format_join_values_as_strings
+from gc_apps.gis_tabular.parsed_table_cache import ParsedTableCache
+from gc_apps.gis_tabular.tabular_sniffer import TabularFileSniffer,\
+    READ_CSV_DTYPES, ENCODING_UTF8, ENCODING_LATIN1
+
+LOGGER = logging.getLogger(__name__)
+
+JOIN_FORMAT_CHUNK_SIZE = 50000  # rows
+
+PARTIAL_FILE_SUFFIX = '.part'
+
+NUMERIC_DTYPE_KINDS = 'iuf'
+
+
+class JoinColumnFormatter(object):
+    """
+    Format a tabular file's join column to match a WorldMap join target
+    """
+    def __init__(self, tabular_info, column_name, single_join_target_info, **kwargs):
+        """
+        :param tabular_info: TabularFileInfo
+        :param column_name: name of the join column
+        :param single_join_target_info: SingleJoinTargetInfo
+        Optional kwargs:
+            - chunk_size: rows parsed at a time
+        """
+        self.tabular_info = tabular_info
+        self.column_name = column_name
+        self.single_join_target_info = single_join_target_info
+        self.chunk_size = kwargs.get('chunk_size', JOIN_FORMAT_CHUNK_SIZE)
+
+        self.file_path = tabular_info.get_dv_file_fullpath()
+        self.delimiter = str(tabular_info.delimiter)
+
+        # dtype of the join column across all chunks
+        self.column_dtype = None
+
+        # True if the column_schema's dtype didn't fit a value past the
+        #   rows sniffed, e.g. text in an int64 column
+        self.ignore_schema_dtype = False
+
+        self.num_rows = 0
+
+        self.has_error = False
+        self.error_message = None
+
+    def add_error(self, err_msg):
+        LOGGER.error(err_msg)
+        self.has_error = True
+        self.error_message = err_msg
+
+    def read_join_column(self, dtype=None):
+        """
+        Iterate through the join column in chunks of self.chunk_size rows.
+        The column_schema's dtype is used unless dtype is given.
+        May raise pd.parser.CParserError, or ValueError if a value
+        doesn't fit the column_schema's dtype--see use_inferred_dtype()
+        """
+        read_kwargs = TabularFileSniffer.get_read_csv_kwargs(self.tabular_info,\
+                                                             columns=[self.column_name])
+        read_kwargs['chunksize'] = self.chunk_size
+        if self.ignore_schema_dtype:
+            read_kwargs.pop('dtype', None)
+        if dtype is not None:
+            read_kwargs['dtype'] = {self.column_name: dtype}
+
+        return pd.read_csv(self.file_path, **read_kwargs)
+
+    def use_inferred_dtype(self, ex_obj):
+        """
+        A value past the sniffed rows doesn't fit the column_schema's
+        dtype.  Read the join column without it from now on and set
+        self.column_dtype from all of its chunks
+        """
+        LOGGER.warn('Join column type for tabular file %s did not fit: %s',\
+                    self.tabular_info.id, ex_obj)
+        self.ignore_schema_dtype = True
+
+        chunk_dtypes = [chunk[self.column_name].dtype\
+                        for chunk in self.read_join_column()]
+        self.column_dtype = JoinColumnFormatter.combine_dtypes(chunk_dtypes)
+
+    def read_join_values(self):
+        """
+        The whole join column as a Series, read in chunks with usecols--
+        other columns aren't parsed.  The values have the dtype the
+        column would have if the file were read in one piece.
+
+        May raise pd.parser.CParserError
+        """
+        try:
+            chunks = [chunk[self.column_name] for chunk in self.read_join_column()]
+        except pd.parser.CParserError:
+            raise
+        except ValueError as ex_obj:
+            if self.ignore_schema_dtype:
+                raise
+            self.use_inferred_dtype(ex_obj)
+            chunks = [chunk[self.column_name] for chunk in self.read_join_column()]
+
+        if not chunks:
+            return pd.Series([], name=self.column_name, dtype=object)
+
+        column_dtype = JoinColumnFormatter.combine_dtypes([x.dtype for x in chunks])
+        if column_dtype == 'object' and any(x.dtype != 'object' for x in chunks):
+            # Numeric chunks have to be re-read as text
+            chunks = [chunk[self.column_name]\
+                      for chunk in self.read_join_column(dtype=object)]
+
+        return pd.concat(chunks).astype(column_dtype)
+
+    def get_column_names(self):
+        """Column names from the column_schema or the header row"""
+        if self.tabular_info.column_schema:
+            return [x['name'] for x in self.tabular_info.column_schema]
+        return pd.read_csv(self.file_path, sep=self.delimiter, nrows=1).columns.tolist()
+
+    @staticmethod
+    def combine_dtypes(chunk_dtypes):
+        """
+        dtype the join column would have if read in one piece:
+            - same dtype for every chunk: that dtype
+            - mix of ints and floats: float64
+            - otherwise: object
+        """
+        if not chunk_dtypes:
+            return np.dtype('object')
+
+        if all(dtype == chunk_dtypes[0] for dtype in chunk_dtypes):
+            return chunk_dtypes[0]
+
+        if all(dtype.kind in NUMERIC_DTYPE_KINDS for dtype in chunk_dtypes):
+            return np.dtype('float64')
+
+        return np.dtype('object')
+
+    @staticmethod
+    def count_wrong_length(column, zero_pad_length):
+        """
+        Number of values whose text isn't zero_pad_length long.
+        (astype('str') fails on unicode values, e.g. from latin-1 files)
+        """
+        value_lengths = np.char.str_len(format_join_values_as_strings(column))
+        return int((value_lengths != zero_pad_length).sum())
+
+    def get_zero_pad_length(self):
+        """Zero pad length of the target column or None"""
+        if self.single_join_target_info.requires_zero_padding():
+            return self.single_join_target_info.zero_pad_length
+        return None
+
+    def is_formatted_column_needed(self):
+        """
+        Only called when the target column is a string and/or specifies
+        zero-padding.  The selected join column needs formatting if:
+            (a) It is type numeric
+            (b) The values do not meet the minimal length (zero padding)
+
+        Sets self.column_dtype.  Check self.has_error afterwards
+        """
+        if not self.column_name in self.get_column_names():
+            self.add_error('Failed to find column "%s" for formatting.' %\
+                           self.column_name)
+            return False
+
+        zero_pad_length = self.get_zero_pad_length()
+
+        column_info = None
+        if not self.ignore_schema_dtype:
+            column_info = TabularFileSniffer.get_column_info(self.tabular_info,\
+                                                             self.column_name)
+        if column_info is not None:
+            return self.is_formatted_column_needed_from_schema(column_info,\
+                                                               zero_pad_length)
+
+        chunk_dtypes = []
+        num_wrong_length = 0
+
+        try:
+            for chunk in self.read_join_column():
+                column = chunk[self.column_name]
+                chunk_dtypes.append(column.dtype)
+                if zero_pad_length is not None and column.dtype == 'object':
+                    num_wrong_length += JoinColumnFormatter.count_wrong_length(column, zero_pad_length)
+        except pd.parser.CParserError as ex_obj:
+            self.add_error(('Could not process the file. '
+                            'At least one row had too many values. '
+                            '(error: %s)') % ex_obj)
+            return False
+
+        self.column_dtype = JoinColumnFormatter.combine_dtypes(chunk_dtypes)
+
+        # --------------------------------------------
+        # (a) Is this a numeric column?
+        # If so, we need a formatted column b/c we're matching against a string.
+        # --------------------------------------------
+        if self.column_dtype != 'object':
+            return True
+
+        #   Our chosen column is character but the target doesn't have
+        #   a zero padding requirement
+        #
+        if zero_pad_length is None:
+            return False
+
+        # --------------------------------------------
+        # (b) Are the values in our column the correct length for a join?
+        #   Chunks that were numeric have to be re-read as text
+        # --------------------------------------------
+        if any(dtype != 'object' for dtype in chunk_dtypes):
+            num_wrong_length = 0
+            for chunk in self.read_join_column(dtype=object):
+                num_wrong_length += JoinColumnFormatter.count_wrong_length(\
+                                        chunk[self.column_name], zero_pad_length)
+
+        return num_wrong_length > 0
+
+    def is_formatted_column_needed_from_schema(self, column_info, zero_pad_length):
+        """
+        is_formatted_column_needed() using the column_schema.
+        Numeric text (e.g. "01001") is formatted as well--the
+        WorldMap would read it as a number.
+        """
+        self.column_dtype = np.dtype(READ_CSV_DTYPES[column_info['dtype']])
+
+        # (a) numeric or numeric text
+        if self.column_dtype != 'object' or column_info['numeric_text']:
+            return True
+
+        if zero_pad_length is None:
+            return False
+
+        # (b) Are the values the correct length for a join?
+        num_wrong_length = 0
+        try:
+            for chunk in self.read_join_column():
+                num_wrong_length += JoinColumnFormatter.count_wrong_length(\
+                                        chunk[self.column_name], zero_pad_length)
+        except pd.parser.CParserError as ex_obj:
+            self.add_error(('Could not process the file. '
+                            'At least one row had too many values. '
+                            '(error: %s)') % ex_obj)
+            return False
+        except ValueError as ex_obj:
+            # A value past the sniffed rows doesn't fit the dtype:
+            #   check the column without the column_schema
+            LOGGER.warn('Join column type for tabular file %s did not fit: %s',\
+                        self.tabular_info.id, ex_obj)
+            self.ignore_schema_dtype = True
+            return self.is_formatted_column_needed()
+
+        return num_wrong_length > 0
+
+    @staticmethod
+    def iterate_raw_records(fh):
+        """
+        Yield each record of the open file as it appears in the file,
+        without the line ending.  Lines inside a quoted value are joined.
+        """
+        record_lines = []
+        num_quotes = 0
+        for line in fh:
+            record_lines.append(line)
+            num_quotes += line.count('"')
+            if num_quotes % 2 == 1:
+                continue    # open quote, the record continues
+            yield ''.join(record_lines).rstrip('\r\n')
+            record_lines = []
+            num_quotes = 0
+
+        if record_lines:
+            yield ''.join(record_lines).rstrip('\r\n')
+
+    @staticmethod
+    def quote_value(val, encoding=ENCODING_UTF8):
+        """
+        Quote a value to be written next to the file's raw records.
+        Unicode values--e.g. from utf-8-sig or latin-1 files--are
+        encoded like the file
+        """
+        if isinstance(val, unicode):
+            val = val.encode(encoding)
+        return '"%s"' % val.replace('"', '""')
+
+    def get_output_encoding(self):
+        """
+        Encoding of the dv_file's records.  (For utf-8-sig, the BOM
+        is only at the start of the file--it's not added to each value)
+        """
+        if self.tabular_info.file_encoding == ENCODING_LATIN1:
+            return ENCODING_LATIN1
+        return ENCODING_UTF8
+
+    def get_join_file_storage_name(self):
+        """Storage name for a new dv_join_file"""
+        join_file_field = self.tabular_info.dv_join_file.field
+        return join_file_field.storage.get_available_name(\
+                    join_file_field.generate_filename(self.tabular_info,\
+                                                      self.tabular_info.datafile_label))
+
+    def write_join_file(self, new_column_name):
+        """
+        Copy the file, appending new_column_name as a formatted version
+        of the join column, to the dv_join_file.  The tabular_info is saved.
+
+        is_formatted_column_needed() must be called first.
+
+        :returns: boolean
+        """
+        assert self.column_dtype is not None,\
+            'Call "is_formatted_column_needed" before "write_join_file"'
+
+        if self.has_error:
+            return False
+
+        storage_name = self.get_join_file_storage_name()
+        full_path = self.tabular_info.dv_join_file.field.storage.path(storage_name)
+        partial_path = full_path + PARTIAL_FILE_SUFFIX
+
+        directory = os.path.dirname(full_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        try:
+            try:
+                success = self.write_join_rows(partial_path, new_column_name)
+            except (pd.parser.CParserError, UnicodeError):
+                raise
+            except ValueError as ex_obj:
+                if self.ignore_schema_dtype:
+                    raise
+                self.use_inferred_dtype(ex_obj)
+                success = self.write_join_rows(partial_path, new_column_name)
+
+            if not success:
+                # Rows couldn't be matched to the parsed values.  Use the
+                # (slower) parsed table instead
+                LOGGER.warn('Row mismatch for tabular file %s. Writing the join file'\
+                            ' from the parsed table.', self.tabular_info.id)
+                success = self.write_join_rows_from_table(partial_path, new_column_name)
+        except (IOError, OSError, ValueError) as ex_obj:
+            # ValueError includes pd.parser.CParserError and UnicodeError
+            self.add_error('Failed to write the formatted file: %s' % ex_obj)
+            success = False
+
+        if not success:
+            if os.path.isfile(partial_path):
+                os.remove(partial_path)
+            return False
+
+        os.rename(partial_path, full_path)
+
+        self.tabular_info.dv_join_file.name = storage_name
+        self.tabular_info.save()
+
+        return True
+
+    def write_join_rows(self, output_path, new_column_name):
+        """
+        Stream the original records to output_path, each followed by its
+        formatted join column value
+
+        :returns: False if the records don't line up with the parsed rows
+        """
+        dtype = None
+        if self.column_dtype == 'object':
+            dtype = object
+        elif self.column_dtype.kind == 'f':
+            dtype = self.column_dtype
+
+        zero_pad_length = self.get_zero_pad_length()
+        encoding = self.get_output_encoding()
+        self.num_rows = 0
+
+        with open(self.file_path, 'rb') as input_fh, open(output_path, 'wb') as output_fh:
+            raw_records = (record for record in\
+                           JoinColumnFormatter.iterate_raw_records(input_fh)\
+                           if record.strip())
+
+            header = next(raw_records, None)
+            if header is None:
+                return False
+            output_fh.write('%s%s%s\n' % (header, self.delimiter,\
+                                          JoinColumnFormatter.quote_value(new_column_name,\
+                                                                          encoding)))
+
+            for chunk in self.read_join_column(dtype=dtype):
+                formatted_values = format_join_keys(chunk[self.column_name],\
+                                                    zero_pad_length)
+                for val in formatted_values:
+                    record = next(raw_records, None)
+                    if record is None:
+                        return False
+                    output_fh.write('%s%s%s\n' % (record, self.delimiter,\
+                                                  JoinColumnFormatter.quote_value(val, encoding)))
+                    self.num_rows += 1
+
+            # Any records left over?
+            if next(raw_records, None) is not None:
+                return False
+
+        return True
+
+    def write_join_rows_from_table(self, output_path, new_column_name):
+        """
+        Load the full table and write it, with the new column, to output_path
+        """
+        df = ParsedTableCache.read_table(self.tabular_info)
+
+        df[new_column_name] = format_join_keys(df[self.column_name],\
+                                               self.get_zero_pad_length())
+        self.num_rows = len(df.index)
+
+        df.to_csv(output_path,\
+                  sep=self.delimiter,\
+                  quoting=QUOTE_NONNUMERIC,\
+                  index=False,\
+                  columns=df.columns,\
+                  encoding=self.get_output_encoding())
+        return True
@@ -1,5 +1,4 @@
 import logging
-import requests
 import sys
 
 from django.conf import settings
@@ -12,6 +11,7 @@ from shared_dataverse_information.worldmap_api_helper.url_helper import\
     UPLOAD_JOIN_DATATABLE_API_PATH,\
     GET_TABLEJOIN_INFO
 from gc_apps.worldmap_connect.utils import get_latest_jointarget_information
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 
 
 LOGGER = logging.getLogger('gc_apps.worldmap_connect.join_layer_service')
@@ -32,9 +32,8 @@ def get_tablejoin_info(tablejoin_id):
     msg('api_url: %s' % api_url)
 
     try:
-        r = requests.get(api_url,
-                        auth=settings.WORLDMAP_ACCOUNT_AUTH,
-                        timeout=settings.WORLDMAP_SHORT_TIMEOUT
+        r = WorldMapClient.get(api_url,
+                        read_timeout=settings.WORLDMAP_SHORT_TIMEOUT
                         )
     except RequestsConnectionError as e:
         print 'err', e
@@ -0,0 +1,232 @@
+"""
+Predict how many rows of a tabular file will join to a WorldMap layer--
+before uploading the file.
+
+The join column is formatted the same way as for the upload (see
+JoinColumnFormatter) and checked against a JoinTargetKeySet: the target
+column's values, loaded once from a bulk export.
+
+    (1) Load a key set, e.g. from a .csv export of the target layer:
+
+        JoinTargetKeySetLoader.load_keys_from_csv(target_layer_id, 'tracts.csv', 'CT_ID_10')
+
+    (2) Check a tabular file:
+
+        preflight = JoinPreflightCheck(tabular_info, 'CT_ID_10', single_join_target_info)
+        if preflight.run_check():
+            preflight.get_results()
+                {'num_rows': 1200, 'num_matched': 1180, 'num_unmatched': 20,
+                 'match_percentage': 98.3, 'unmatched_samples': ['250250001', ...], ...}
+
+If there's no key set for the join target, is_key_set_available() is
+False and the upload proceeds as before.
+"""
+import os
+import logging
+
+import pandas as pd
+
+from gc_apps.geo_utils.join_key_formatter import format_join_keys
+from gc_apps.worldmap_connect.join_column_formatter import JoinColumnFormatter
+from gc_apps.worldmap_connect.models import JoinTargetKeySet
+
+LOGGER = logging.getLogger(__name__)
+
+NUM_UNMATCHED_SAMPLES = 10
+
+# { JoinTargetKeySet id : (modified, pandas Index of keys) }
+#   Key sets are read from disk once per process
+LOADED_KEY_SETS = {}
+
+
+class JoinTargetKeySetLoader(object):
+    """Static methods for saving and reading JoinTargetKeySets"""
+
+    @staticmethod
+    def load_keys_from_csv(target_layer_id, csv_path, column_name, **kwargs):
+        """
+        Save the unique values of column_name as the key set
+        for target_layer_id.  Values are read as text; leading zeros are kept.
+
+        Optional kwargs:
+            - target_layer_name
+            - delimiter: default ','
+
+        :returns: JoinTargetKeySet
+        """
+        keys = pd.read_csv(csv_path,\
+                           sep=kwargs.get('delimiter', ','),\
+                           usecols=[column_name],\
+                           dtype=object,\
+                           na_filter=False)[column_name]
+        keys = keys.str.strip()
+        keys = keys[keys != ''].drop_duplicates()
+
+        key_set = JoinTargetKeySet.objects.filter(target_layer_id=target_layer_id).first()
+        if key_set is None:
+            key_set = JoinTargetKeySet(target_layer_id=target_layer_id)
+        elif key_set.key_file:
+            key_set.key_file.delete(save=False)
+
+        key_set.target_layer_name = kwargs.get('target_layer_name', key_set.target_layer_name)
+        key_set.target_column_name = column_name
+        key_set.num_keys = len(keys)
+
+        # Write the keys, one per line
+        #
+        key_file_field = key_set.key_file.field
+        storage_name = key_file_field.storage.get_available_name(\
+                            key_file_field.generate_filename(key_set,\
+                                                'keys_%s.txt' % target_layer_id))
+        key_file_path = key_file_field.storage.path(storage_name)
+        if not os.path.isdir(os.path.dirname(key_file_path)):
+            os.makedirs(os.path.dirname(key_file_path))
+
+        with open(key_file_path, 'wb') as fh:
+            for key in keys:
+                fh.write('%s\n' % key)
+
+        key_set.key_file.name = storage_name
+        key_set.save()
+
+        return key_set
+
+    @staticmethod
+    def get_keys(key_set):
+        """
+        :returns: pandas Index of the key strings
+        """
+        loaded = LOADED_KEY_SETS.get(key_set.id)
+        if loaded is not None and loaded[0] == key_set.modified:
+            return loaded[1]
+
+        keys = pd.read_csv(key_set.key_file.path,\
+                           header=None,\
+                           names=['key'],\
+                           dtype=object,\
+                           na_filter=False)['key']
+
+        keys_index = pd.Index(keys)
+        LOADED_KEY_SETS[key_set.id] = (key_set.modified, keys_index)
+
+        return keys_index
+
+
+class JoinPreflightCheck(object):
+    """
+    Check a tabular file's join column against a JoinTargetKeySet
+    """
+    def __init__(self, tabular_info, column_name, single_join_target_info, **kwargs):
+        """
+        :param tabular_info: TabularFileInfo
+        :param column_name: name of the join column
+        :param single_join_target_info: SingleJoinTargetInfo
+        Optional kwargs:
+            - num_unmatched_samples: number of unmatched values to return
+        """
+        self.tabular_info = tabular_info
+        self.column_name = column_name
+        self.single_join_target_info = single_join_target_info
+        self.num_unmatched_samples = kwargs.get('num_unmatched_samples',\
+                                                NUM_UNMATCHED_SAMPLES)
+
+        self.key_set = JoinTargetKeySet.objects.filter(\
+                            target_layer_id=single_join_target_info.target_id).first()
+
+        self.num_rows = 0
+        self.num_matched = 0
+        self.unmatched_samples = []
+
+        self.has_error = False
+        self.error_message = None
+
+    def add_error(self, err_msg):
+        LOGGER.error(err_msg)
+        self.has_error = True
+        self.error_message = err_msg
+
+    def is_key_set_available(self):
+        return self.key_set is not None and bool(self.key_set.key_file)
+
+    def get_join_values(self):
+        """
+        The join column as it will be uploaded: formatted if
+        the target column is a string or zero-padded.
+        Numeric targets are compared as numbers.
+
+        Only the join column is parsed, in chunks--see
+        JoinColumnFormatter.read_join_values
+
+        :returns: (join column Series, target keys Index)
+        """
+        join_column_formatter = JoinColumnFormatter(self.tabular_info,\
+                                        self.column_name,\
+                                        self.single_join_target_info)
+        values = join_column_formatter.read_join_values()
+
+        keys = JoinTargetKeySetLoader.get_keys(self.key_set)
+
+        if self.single_join_target_info.does_join_column_potentially_need_formatting():
+            zero_pad_length = None
+            if self.single_join_target_info.requires_zero_padding():
+                zero_pad_length = self.single_join_target_info.zero_pad_length
+            return format_join_keys(values, zero_pad_length), keys
+
+        return pd.to_numeric(values, errors='coerce'),\
+               pd.Index(pd.to_numeric(keys, errors='coerce'))
+
+    def run_check(self):
+        """
+        :returns: boolean.  False if there's no key set or on error
+        """
+        if not self.is_key_set_available():
+            return False
+
+        if not self.column_name in (self.tabular_info.column_names or []):
+            self.add_error('Failed to find column "%s" for the join.' % self.column_name)
+            return False
+
+        try:
+            values, keys = self.get_join_values()
+        except (IOError, ValueError) as ex_obj:
+            # ValueError includes pd.parser.CParserError
+            self.add_error('Could not check the join column: %s' % ex_obj)
+            return False
+
+        is_matched = values.isin(keys)
+
+        self.num_rows = len(values.index)
+        self.num_matched = int(is_matched.sum())
+
+        unmatched = values[~is_matched].drop_duplicates()
+        self.unmatched_samples = [('%s' % val)\
+                                  for val in unmatched[:self.num_unmatched_samples]]
+
+        return True
+
+    def get_match_percentage(self):
+        if self.num_rows == 0:
+            return 0.0
+        return round(100.0 * self.num_matched / self.num_rows, 1)
+
+    def get_results(self):
+        """Results as a dict (JSON serializable)"""
+        return dict(target_layer_id=self.key_set.target_layer_id,
+                    target_layer_name=self.key_set.target_layer_name,
+                    num_rows=self.num_rows,
+                    num_matched=self.num_matched,
+                    num_unmatched=self.num_rows - self.num_matched,
+                    match_percentage=self.get_match_percentage(),
+                    unmatched_samples=self.unmatched_samples)
+
+    def get_user_message(self):
+        """e.g. 'Expected to map 1,180 of 1,200 rows (98.3%).'"""
+        user_msg = 'Expected to map %s of %s rows (%s%%).' %\
+                   ('{:,}'.format(self.num_matched),\
+                    '{:,}'.format(self.num_rows),\
+                    self.get_match_percentage())
+
+        if self.unmatched_samples:
+            user_msg += ' Unmatched values include: %s' %\
+                        ', '.join(self.unmatched_samples)
+        return user_msg
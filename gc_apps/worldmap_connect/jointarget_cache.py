@@ -0,0 +1,158 @@
+"""
+Process-level cache of the WorldMap JoinTarget information
+
+The join form reads the JoinTargets on every page load.  Instead of
+querying the database--or calling the WorldMap--each time, the latest
+JoinTargetInformation (and its parsed JoinTargetFormatter) is kept in
+memory for the life of the process.
+
+Stale-while-revalidate:
+    - younger than settings.WORLDMAP_JOIN_TARGET_TTL: served from memory
+    - older: still served from memory, while a background thread
+        refreshes it--from the database if another process already
+        did, otherwise from the WorldMap API
+    - the WorldMap is only called within the request on a cold start,
+        when the database has no JoinTargetInformation at all
+
+    join_target_info = JoinTargetCache.get_join_target_info()
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from gc_apps.worldmap_connect.models import JoinTargetInformation
+from gc_apps.worldmap_connect.dataverse_layer_services import get_join_targets
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_JOIN_TARGET_TTL = 60 # seconds
+
+
+class JoinTargetCache(object):
+    """
+    Static methods wrapping the process-wide JoinTargetInformation
+    """
+    _join_target_info = None
+    _refreshing = False
+    _last_refresh_attempt = None    # time.time()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_ttl():
+        return getattr(settings, 'WORLDMAP_JOIN_TARGET_TTL', DEFAULT_JOIN_TARGET_TTL)
+
+    @staticmethod
+    def reset():
+        """Empty the cache, e.g. after the JoinTargetInformation is deleted"""
+        with JoinTargetCache._lock:
+            JoinTargetCache._join_target_info = None
+            JoinTargetCache._last_refresh_attempt = None
+
+    @staticmethod
+    def set_join_target_info(join_target_info):
+        with JoinTargetCache._lock:
+            JoinTargetCache._join_target_info = join_target_info
+
+    @staticmethod
+    def is_stale(join_target_info):
+        age = timezone.now() - join_target_info.created
+        return age > timedelta(seconds=JoinTargetCache.get_ttl())
+
+    @staticmethod
+    def get_join_target_info():
+        """
+        :returns: JoinTargetInformation or None
+        """
+        join_target_info = JoinTargetCache._join_target_info
+
+        if join_target_info is None:
+            # Cold start: use the latest saved info--even if it's old
+            join_target_info = JoinTargetInformation.objects.first()
+            if join_target_info is None:
+                # Nothing to serve, wait on the WorldMap
+                return JoinTargetCache.refresh()
+
+            JoinTargetCache.set_join_target_info(join_target_info)
+
+        if JoinTargetCache.is_stale(join_target_info):
+            JoinTargetCache.start_background_refresh()
+
+        return join_target_info
+
+    @staticmethod
+    def start_background_refresh():
+        """
+        Refresh in a thread, unless a refresh is running or was
+        attempted within the TTL (e.g. the WorldMap is down)
+
+        :returns: True if a refresh was started
+        """
+        with JoinTargetCache._lock:
+            if JoinTargetCache._refreshing:
+                return False
+
+            last_attempt = JoinTargetCache._last_refresh_attempt
+            if last_attempt is not None and\
+                time.time() - last_attempt < JoinTargetCache.get_ttl():
+                return False
+
+            JoinTargetCache._refreshing = True
+            JoinTargetCache._last_refresh_attempt = time.time()
+
+        refresh_thread = threading.Thread(target=JoinTargetCache.run_background_refresh,\
+                                          name='join-target-refresh')
+        refresh_thread.daemon = True
+        refresh_thread.start()
+        return True
+
+    @staticmethod
+    def run_background_refresh():
+        try:
+            JoinTargetCache.refresh()
+        except Exception:
+            LOGGER.exception('Failed to refresh the JoinTargetInformation')
+        finally:
+            with JoinTargetCache._lock:
+                JoinTargetCache._refreshing = False
+            # The thread's own db connection
+            connection.close()
+
+    @staticmethod
+    def refresh():
+        """
+        Load recent JoinTargetInformation saved by another process or,
+        if there is none, retrieve it from the WorldMap and save it.
+
+        On failure, the cache is left as is.
+
+        :returns: JoinTargetInformation or None
+        """
+        recent_time_window = timezone.now() -\
+                                timedelta(seconds=JoinTargetCache.get_ttl())
+
+        join_target_info = JoinTargetInformation.objects.filter(\
+                                created__gte=recent_time_window).first()
+
+        if join_target_info is None:
+            (success, dict_info_or_err) = get_join_targets()
+            if not success:
+                LOGGER.error('Failed to retrieve JoinTargetInformation from\
+ the WorldMap: %s', dict_info_or_err)
+                return JoinTargetCache._join_target_info
+
+            join_target_info = JoinTargetInformation(\
+                    name=timezone.now().strftime("%Y-%m-%d %H:%M:%S"),\
+                    target_info=dict_info_or_err)
+            join_target_info.save()
+
+        # Parse the JSON here, not in a user request
+        join_target_info.get_formatter()
+
+        JoinTargetCache.set_join_target_info(join_target_info)
+
+        return join_target_info
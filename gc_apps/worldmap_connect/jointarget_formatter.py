@@ -45,6 +45,9 @@ class JoinTargetFormatter(object):
 
         self.target_info = target_info
 
+        # { join target id : info dict }, built once by initial_check()
+        self.targets_by_id = {}
+
         self.initial_check()
 
     def is_valid(self):
@@ -96,8 +99,21 @@ class JoinTargetFormatter(object):
             self.add_error("There are no JoinTargets available.")
             return False
 
+        self.targets_by_id = dict((info['id'], info)\
+                                  for info in self.target_info['data']\
+                                  if 'id' in info)
+
         return True
 
+    def get_target_by_id(self, target_layer_id):
+        """
+        Return the info dict for a join target id, or None
+        """
+        if target_layer_id is None:
+            return None
+
+        return self.targets_by_id.get(target_layer_id)
+
 
     @staticmethod
     def get_formatted_name(geocode_type, year=None, title=None):
@@ -128,17 +144,11 @@ class JoinTargetFormatter(object):
         if target_layer_id is None:
             return (None, None, None)
 
-        for info in self.target_info['data']:
-            if 'id' in info and target_layer_id == info['id']:
-                return SingleJoinTargetInfo(info)
-                #return SingleJoinTargetInfo(
-                #                info['layer'],
-                #                info['attribute']['attribute'],
-                #                info['attribute']['type'],
-                #                self.get_formatting_zero_pad_length(target_layer_id)
-                #                    )
+        info = self.get_target_by_id(target_layer_id)
+        if info is None:
+            return None
 
-        return None
+        return SingleJoinTargetInfo(info)
 
     def get_geocode_types(self):
         """
@@ -207,15 +217,11 @@ class JoinTargetFormatter(object):
 
 
     def get_format_info_for_target_layer(self, target_layer_id):
-        if target_layer_id is None:
+        info = self.get_target_by_id(target_layer_id)
+        if info is None:
             return None
 
-        for info in self.target_info['data']:
-            if 'id' in info and target_layer_id == info['id']:
-                if 'expected_format' in info:
-                    return info['expected_format']
-
-        return None
+        return info.get('expected_format')
 
     def get_formatting_zero_pad_length(self, target_layer_id):
         """
@@ -1,18 +1,20 @@
 import logging
-import requests
 
 from django.conf import settings
 from requests.exceptions import ConnectionError as RequestsConnectionError
 
 from shared_dataverse_information.worldmap_api_helper.url_helper import MAP_LAT_LNG_TABLE_API_PATH
 from gc_apps.gis_basic_file.dataverse_info_service import get_dataverse_info_dict
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 
 LOGGER = logging.getLogger('gc_apps.worldmap_connect.lat_lng_service')
 
 
-def create_map_from_datatable_lat_lng(tabular_info, lat_col, lng_col):
+def create_map_from_datatable_lat_lng(tabular_info, lat_col, lng_col, progress_callback=None):
     """
     Use the WorldMap API to uplodat a datatable and join it to an existing layer
+
+    progress_callback: Optional. function(bytes_sent, total_bytes) for the upload
     """
     print 'create_map_from_datatable_lat_lng 1'
     if tabular_info is None:
@@ -64,11 +66,11 @@ def create_map_from_datatable_lat_lng(tabular_info, lat_col, lng_col):
     print '-' * 40
 
     try:
-        r = requests.post(MAP_LAT_LNG_TABLE_API_PATH,
-                        data=map_params,
-                        files=files,
-                        auth=settings.WORLDMAP_ACCOUNT_AUTH,
-                        timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
+        r = WorldMapClient.post_files(MAP_LAT_LNG_TABLE_API_PATH,
+                        map_params,
+                        files,
+                        progress_callback=progress_callback,
+                        read_timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
                         )
     except RequestsConnectionError as e:
         print 'err', e
@@ -0,0 +1,320 @@
+"""
+Create WorldMap layers through a MapJob
+
+Each of the three mapping flows may block for up to
+settings.WORLDMAP_DEFAULT_TIMEOUT while the WorldMap imports the file:
+
+    - TYPE_SHAPEFILE_LAYER: SendShapefileService
+    - TYPE_JOIN_LAYER: TableJoinMapMaker
+    - TYPE_LAT_LNG_LAYER: create_map_from_datatable_lat_lng
+    - MAP_JOB_TYPE_ALL_SHAPEFILES: SendMultiShapefileService,
+        one layer per shapefile set in a .zip
+
+When settings.WORLDMAP_ASYNC_MAP_JOBS is True, the job is sent to a
+Celery worker (tasks.run_map_job) and the browser polls the job's
+state via view_map_job_status.  Otherwise, the job is run within the
+request--as before.
+
+    map_job = MapJobRunner.create_job(TYPE_JOIN_LAYER, tabular_info.md5,\
+                    dict(chosen_column='tract', chosen_layer=7))
+    MapJobRunner.start_job(map_job)
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from gc_apps.layer_types.static_vals import TYPE_SHAPEFILE_LAYER,\
+                TYPE_JOIN_LAYER, TYPE_LAT_LNG_LAYER
+from gc_apps.worldmap_connect.models import MapJob, MAP_JOB_STATE_PENDING,\
+                MAP_JOB_TYPE_ALL_SHAPEFILES
+
+from gc_apps.gis_basic_file.dataverse_info_service import get_dataverse_info_dict
+from gc_apps.gis_tabular.models import TabularFileInfo, WorldMapTabularLayerInfo
+from gc_apps.gis_tabular.unmatched_row_store import UnmatchedRowStore
+from gc_apps.gis_shapefiles.models import ShapefileInfo
+from gc_apps.dv_notify.metadata_updater import MetadataUpdater
+
+from gc_apps.worldmap_connect.send_shapefile_service import SendShapefileService
+from gc_apps.worldmap_connect.send_multi_shapefile_service import SendMultiShapefileService
+from gc_apps.worldmap_connect.table_join_map_maker import TableJoinMapMaker
+from gc_apps.worldmap_connect.lat_lng_service import create_map_from_datatable_lat_lng
+
+LOGGER = logging.getLogger(__name__)
+
+# job_params keys
+PARAM_CHOSEN_COLUMN = 'chosen_column'
+PARAM_CHOSEN_LAYER = 'chosen_layer'
+PARAM_LAT_COLUMN = 'lat_column'
+PARAM_LNG_COLUMN = 'lng_column'
+
+
+class MapJobRunner(object):
+    """
+    Run a MapJob, recording its state transitions
+    """
+    def __init__(self, map_job):
+        assert isinstance(map_job, MapJob), "map_job must be a MapJob object"
+
+        self.map_job = map_job
+
+        self.has_error = False
+        self.error_message = None
+
+    def add_error(self, err_msg):
+        LOGGER.error(err_msg)
+        self.has_error = True
+        self.error_message = err_msg
+
+    @staticmethod
+    def create_job(layer_type, gis_data_md5, job_params=None):
+        """
+        :returns: a saved MapJob, state PENDING
+        """
+        map_job = MapJob(layer_type=layer_type,
+                         gis_data_md5=gis_data_md5,
+                         job_params=job_params or {})
+        map_job.save()
+        return map_job
+
+    @staticmethod
+    def is_async_enabled():
+        return getattr(settings, 'WORLDMAP_ASYNC_MAP_JOBS', False) is True
+
+    @staticmethod
+    def start_job(map_job):
+        """
+        Queue the job on Celery or, if async is off, run it now
+
+        :returns: the MapJob (reloaded after an inline run)
+        """
+        if MapJobRunner.is_async_enabled():
+            # Lazy import: celery is only needed when async is on
+            from gc_apps.worldmap_connect.tasks import run_map_job
+
+            try:
+                async_result = run_map_job.delay(map_job.id)
+            except Exception as ex_obj:
+                # e.g. the broker is down: don't leave the job PENDING
+                LOGGER.exception('Failed to queue MapJob: %s', map_job.id)
+                map_job.mark_failure('Sorry! Failed to start creating'
+                                     ' the map. Please try again. (%s)' % ex_obj)
+                return map_job
+
+            # The worker may have already picked up the job
+            MapJob.objects.filter(pk=map_job.id, state=MAP_JOB_STATE_PENDING)\
+                    .update(celery_task_id=async_result.id)
+            return map_job
+
+        runner = MapJobRunner(map_job)
+        runner.run_job()
+        return runner.map_job
+
+    @staticmethod
+    def fail_if_timed_out(map_job):
+        """
+        A PENDING or RUNNING job older than settings.WORLDMAP_MAP_JOB_TIMEOUT
+        was lost--e.g. the worker died--so mark it as failed.
+
+        :returns: the MapJob
+        """
+        if map_job.is_finished():
+            return map_job
+
+        job_start = map_job.started or map_job.created
+        cutoff_time = timezone.now() - timedelta(seconds=settings.WORLDMAP_MAP_JOB_TIMEOUT)
+        if job_start >= cutoff_time:
+            return map_job
+
+        LOGGER.error('MapJob timed out: %s (%s)', map_job.id, map_job.state)
+
+        # Only if still unfinished: the worker may have just finished it
+        map_job.mark_failure('Sorry! Creating the map took too long.'
+                             ' Please try again.')
+        return map_job
+
+    def run_job(self, celery_task_id=None):
+        """
+        Create the WorldMap layer
+
+        :returns: boolean
+        """
+        if self.map_job.is_finished():
+            LOGGER.info('MapJob already finished: %s', self.map_job.id)
+            return self.map_job.is_success()
+
+        if not self.map_job.mark_running(celery_task_id):
+            # e.g. timed out while waiting for a worker
+            return self.map_job.is_success()
+
+        job_methods = {TYPE_SHAPEFILE_LAYER: self.run_shapefile_job,
+                       TYPE_JOIN_LAYER: self.run_join_job,
+                       TYPE_LAT_LNG_LAYER: self.run_lat_lng_job,
+                       MAP_JOB_TYPE_ALL_SHAPEFILES: self.run_all_shapefiles_job}
+
+        job_method = job_methods.get(self.map_job.layer_type, None)
+        if job_method is None:
+            self.add_error('Unknown layer type: %s' % self.map_job.layer_type)
+            worldmap_info = None
+        else:
+            try:
+                worldmap_info = job_method()
+            except Exception as ex_obj:
+                LOGGER.exception('MapJob failed: %s', self.map_job.id)
+                self.add_error('Sorry! Failed to create map. (%s)' % ex_obj)
+                worldmap_info = None
+
+        if worldmap_info is None:
+            self.map_job.mark_failure(self.error_message)
+            return False
+
+        if self.map_job.layer_type == MAP_JOB_TYPE_ALL_SHAPEFILES:
+            # a list of results, one per shapefile set
+            self.map_job.mark_success(job_results=worldmap_info)
+        else:
+            self.map_job.mark_success(worldmap_info)
+        return True
+
+    def get_tabular_info(self):
+        try:
+            return TabularFileInfo.objects.get(md5=self.map_job.gis_data_md5)
+        except TabularFileInfo.DoesNotExist:
+            self.add_error('Sorry! The Tabular File was not found.')
+            return None
+
+    def run_shapefile_job(self):
+        """
+        :returns: WorldMapShapefileLayerInfo or None
+        """
+        send_shp_service = SendShapefileService(**dict(\
+                                shp_md5=self.map_job.gis_data_md5,\
+                                progress_callback=self.map_job.update_upload_progress))
+
+        if not send_shp_service.send_shapefile_to_worldmap():
+            self.add_error("Sorry! The shapefile mapping did not work.<br /><span class='small'>%s</span>"\
+                           % '<br />'.join(send_shp_service.err_msgs))
+            return None
+
+        return send_shp_service.get_worldmap_layerinfo()
+
+    def run_all_shapefiles_job(self):
+        """
+        Map each shapefile set in the .zip
+
+        :returns: list of result dicts--see send_shapefile_info_to_worldmap--
+            or None if no set was mapped
+        """
+        try:
+            shapefile_info = ShapefileInfo.objects.get(md5=self.map_job.gis_data_md5)
+        except ShapefileInfo.DoesNotExist:
+            self.add_error('Sorry, the shapefile was not found')
+            return None
+
+        multi_service = SendMultiShapefileService(shapefile_info)
+        if not multi_service.build_shapefile_infos():
+            self.add_error('Sorry! Failed to split the shapefile sets. %s' %\
+                           '<br />'.join(multi_service.err_msgs))
+            return None
+
+        results = multi_service.send_all_to_worldmap()
+        if not [x for x in results if x['success']]:
+            self.add_error('Sorry! None of the shapefiles were mapped. %s' %\
+                           '<br />'.join(multi_service.err_msgs))
+            return None
+
+        return results
+
+    def run_join_job(self):
+        """
+        :returns: WorldMapJoinLayerInfo or None
+        """
+        tabular_info = self.get_tabular_info()
+        if tabular_info is None:
+            return None
+
+        job_params = self.map_job.job_params or {}
+
+        tj_map_maker = TableJoinMapMaker(tabular_info,
+                            get_dataverse_info_dict(tabular_info),
+                            job_params.get(PARAM_CHOSEN_COLUMN),
+                            job_params.get(PARAM_CHOSEN_LAYER),
+                            progress_callback=self.map_job.update_upload_progress,
+                            )
+        if not tj_map_maker.run_map_create():
+            self.add_error('Sorry! ' + tj_map_maker.get_error_msg())
+            return None
+
+        worldmap_tabular_info = WorldMapTabularLayerInfo.build_from_worldmap_json(\
+                                    tabular_info,\
+                                    tj_map_maker.get_map_info())
+        if worldmap_tabular_info is None:
+            LOGGER.error("Failed to create WorldMapTabularLayerInfo using %s",\
+                tj_map_maker.get_map_info())
+            self.add_error('Sorry! Failed to create map. Please try again. (code: s1)')
+            return None
+
+        MetadataUpdater.update_dataverse_with_metadata(worldmap_tabular_info)
+
+        self.build_unmatched_rows(worldmap_tabular_info)
+
+        return worldmap_tabular_info
+
+    def run_lat_lng_job(self):
+        """
+        :returns: WorldMapLatLngInfo or None
+        """
+        tabular_info = self.get_tabular_info()
+        if tabular_info is None:
+            return None
+
+        job_params = self.map_job.job_params or {}
+
+        (success, worldmap_data_or_err_msg) = create_map_from_datatable_lat_lng(\
+                            tabular_info,\
+                            job_params.get(PARAM_LAT_COLUMN),\
+                            job_params.get(PARAM_LNG_COLUMN),\
+                            progress_callback=self.map_job.update_upload_progress,\
+                            )
+        if not success:
+            self.add_error('Sorry! ' + worldmap_data_or_err_msg)
+            return None
+
+        user_msg, response_data = worldmap_data_or_err_msg
+
+        worldmap_latlng_info = WorldMapTabularLayerInfo.build_from_worldmap_json(\
+                                    tabular_info,\
+                                    response_data)
+        if worldmap_latlng_info is None:
+            LOGGER.error("Failed to create WorldMapLatLngInfo using data: %s",\
+                        response_data)
+            self.add_error('Sorry! Failed to create map. Please try again. (code: s4)')
+            return None
+
+        MetadataUpdater.update_dataverse_with_metadata(worldmap_latlng_info)
+
+        self.build_unmatched_rows(worldmap_latlng_info)
+
+        return worldmap_latlng_info
+
+    def build_unmatched_rows(self, worldmap_tabular_info):
+        """
+        Save the rows that didn't map now--instead of parsing
+        the table in the first request that displays them.
+
+        A failure here doesn't fail the job: the rows are
+        built on first use instead
+        """
+        if worldmap_tabular_info.get_unmapped_record_count() < 1:
+            return
+
+        try:
+            (success, err_msg) = UnmatchedRowStore.build_if_needed(worldmap_tabular_info)
+        except Exception:
+            LOGGER.exception('Failed to build unmatched rows for MapJob: %s',\
+                             self.map_job.id)
+            return
+
+        if not success:
+            LOGGER.warn('Unmatched rows not built for MapJob %s: %s',\
+                        self.map_job.id, err_msg)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.core.files.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worldmap_connect', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JoinTargetKeySet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('target_layer_id', models.IntegerField(help_text=b'JoinTarget id from the WorldMap', unique=True)),
+                ('target_layer_name', models.CharField(blank=True, max_length=255)),
+                ('target_column_name', models.CharField(max_length=255)),
+                ('num_keys', models.IntegerField(default=0)),
+                ('key_file', models.FileField(max_length=255, storage=django.core.files.storage.FileSystemStorage(location=settings.DV_DATAFILE_DIRECTORY), upload_to=b'join_target_keys')),
+            ],
+            options={
+                'ordering': ('target_layer_name',),
+                'verbose_name': 'Join Target key set',
+                'verbose_name_plural': 'Join Target key sets',
+            },
+        ),
+    ]
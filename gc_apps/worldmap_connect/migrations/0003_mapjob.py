@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worldmap_connect', '0002_jointargetkeyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('layer_type', models.CharField(choices=[(b'TYPE_SHAPEFILE_LAYER', b'TYPE_SHAPEFILE_LAYER'), (b'TYPE_JOIN_LAYER', b'TYPE_JOIN_LAYER'), (b'TYPE_LAT_LNG_LAYER', b'TYPE_LAT_LNG_LAYER')], max_length=50)),
+                ('state', models.CharField(choices=[(b'PENDING', b'PENDING'), (b'RUNNING', b'RUNNING'), (b'SUCCESS', b'SUCCESS'), (b'FAILURE', b'FAILURE')], default=b'PENDING', max_length=20)),
+                ('gis_data_md5', models.CharField(help_text=b'md5 of the ShapefileInfo or TabularFileInfo', max_length=40)),
+                ('job_params', jsonfield.fields.JSONField(blank=True, help_text=b'e.g. join column and target layer', null=True)),
+                ('celery_task_id', models.CharField(blank=True, max_length=255)),
+                ('worldmap_info_md5', models.CharField(blank=True, help_text=b'md5 of the WorldMapLayerInfo, after success', max_length=40)),
+                ('error_message', models.TextField(blank=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('md5', models.CharField(blank=True, db_index=True, help_text=b'auto-filled on save', max_length=40)),
+            ],
+            options={
+                'ordering': ('-created',),
+                'verbose_name': 'Map job',
+                'verbose_name_plural': 'Map jobs',
+            },
+        ),
+    ]
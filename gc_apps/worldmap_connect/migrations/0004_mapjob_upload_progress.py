@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worldmap_connect', '0003_mapjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapjob',
+            name='upload_bytes_sent',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mapjob',
+            name='upload_bytes_total',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worldmap_connect', '0004_mapjob_upload_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapjob',
+            name='job_results',
+            field=jsonfield.fields.JSONField(blank=True, help_text=b'e.g. a result for each shapefile set', null=True),
+        ),
+        migrations.AlterField(
+            model_name='mapjob',
+            name='layer_type',
+            field=models.CharField(choices=[(b'TYPE_SHAPEFILE_LAYER', b'TYPE_SHAPEFILE_LAYER'), (b'TYPE_JOIN_LAYER', b'TYPE_JOIN_LAYER'), (b'TYPE_LAT_LNG_LAYER', b'TYPE_LAT_LNG_LAYER'), (b'TYPE_ALL_SHAPEFILE_LAYERS', b'TYPE_ALL_SHAPEFILE_LAYERS')], max_length=50),
+        ),
+    ]
@@ -1,12 +1,20 @@
 from __future__ import absolute_import
+import logging
+from hashlib import md5
 
 from django.db import models
+from django.utils import timezone
 
 from jsonfield import JSONField
 from gc_apps.core.models import TimeStampedModel
+from gc_apps.gis_basic_file.models import DV_FILE_SYSTEM_STORAGE
+from gc_apps.layer_types.static_vals import TYPE_SHAPEFILE_LAYER,\
+                TYPE_JOIN_LAYER, TYPE_LAT_LNG_LAYER
 
 from gc_apps.worldmap_connect.jointarget_formatter import JoinTargetFormatter
 
+LOGGER = logging.getLogger(__name__)
+
 
 class JoinTargetInformation(TimeStampedModel):
     """
@@ -30,61 +38,250 @@ class JoinTargetInformation(TimeStampedModel):
         if not self.id:
             super(JoinTargetInformation, self).save(*args, **kwargs)
 
-        jt_formatter = JoinTargetFormatter(self.target_info)
-        self.is_valid_target_info = jt_formatter.is_valid()
+        # target_info may have changed, parse it again
+        self._jt_formatter = JoinTargetFormatter(self.target_info)
+        self.is_valid_target_info = self._jt_formatter.is_valid()
 
         super(JoinTargetInformation, self).save(*args, **kwargs)
 
+    def get_formatter(self):
+        """
+        Return a JoinTargetFormatter, parsing target_info only once
+        per object.  (See jointarget_cache.py, which keeps this object
+        for the process.)
+        """
+        if getattr(self, '_jt_formatter', None) is None:
+            self._jt_formatter = JoinTargetFormatter(self.target_info)
+        return self._jt_formatter
+
     def get_geocode_types(self):
-        jt_formatter = JoinTargetFormatter(self.target_info)
-        return jt_formatter.get_join_targets_by_type()
+        return self.get_formatter().get_join_targets_by_type()
 
     def get_available_layers_list(self):
-        jt_formatter = JoinTargetFormatter(self.target_info)
         # Get all the join targets
-        return jt_formatter.get_available_layers_list_by_type(None)
-        #return jt_formatter.get_all_target_layers()
+        return self.get_formatter().get_available_layers_list_by_type(None)
 
     def get_format_info_for_target_layer(self, layer_id):
         """
         Retrieve the WorldMap info related to the
         datatable model JoinTargetFormatType
         """
-        jt_formatter = JoinTargetFormatter(self.target_info)
-
-        return jt_formatter.get_format_info_for_target_layer(layer_id)
+        return self.get_formatter().get_format_info_for_target_layer(layer_id)
 
     def get_formatting_zero_pad_length(self, layer_id):
         """
         Helps with formatting columns that need zero padding
         """
-        jt_formatter = JoinTargetFormatter(self.target_info)
-
-        return jt_formatter.get_formatting_zero_pad_length(layer_id)
+        return self.get_formatter().get_formatting_zero_pad_length(layer_id)
 
     def get_available_layers_list_by_type(self, chosen_geocode_type, for_json=False):
-        jt_formatter = JoinTargetFormatter(self.target_info)
         # Get all the join targets
-        return jt_formatter.get_available_layers_list_by_type(chosen_geocode_type, for_json)
+        return self.get_formatter().get_available_layers_list_by_type(\
+                                        chosen_geocode_type, for_json)
 
     def get_single_join_target_info(self, target_layer_id):
         """
         Given a target layer id, retrieve the target name
         """
-        jt_formatter = JoinTargetFormatter(self.target_info)
-
-        return jt_formatter.get_single_join_target_info(target_layer_id)
-
+        return self.get_formatter().get_single_join_target_info(target_layer_id)
 
     def get_join_targets_by_type(self, chosen_geocode_type):
-        jt_formatter = JoinTargetFormatter(self.target_info)
-        return jt_formatter.get_join_targets_by_type(chosen_geocode_type)
+        return self.get_formatter().get_join_targets_by_type(chosen_geocode_type)
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Join Target information'
         verbose_name_plural = verbose_name
 
+class JoinTargetKeySet(TimeStampedModel):
+    """
+    The values in a join target's column, loaded from a bulk export.
+    Used to predict how many rows of a tabular file will join--before
+    uploading the file to the WorldMap.  See join_preflight.py
+
+    The keys are stored as text, one per line, in key_file
+    """
+    target_layer_id = models.IntegerField(unique=True,\
+                        help_text='JoinTarget id from the WorldMap')
+    target_layer_name = models.CharField(max_length=255, blank=True)
+    target_column_name = models.CharField(max_length=255)
+
+    num_keys = models.IntegerField(default=0)
+    key_file = models.FileField(upload_to='join_target_keys',\
+                        storage=DV_FILE_SYSTEM_STORAGE,\
+                        max_length=255)
+
+    def __unicode__(self):
+        return '%s (%s): %s' % (self.target_layer_name,\
+                                self.target_layer_id,\
+                                self.target_column_name)
+
+    class Meta:
+        ordering = ('target_layer_name',)
+        verbose_name = 'Join Target key set'
+        verbose_name_plural = 'Join Target key sets'
+
+
+MAP_JOB_STATE_PENDING = 'PENDING'
+MAP_JOB_STATE_RUNNING = 'RUNNING'
+MAP_JOB_STATE_SUCCESS = 'SUCCESS'
+MAP_JOB_STATE_FAILURE = 'FAILURE'
+
+MAP_JOB_STATES = (MAP_JOB_STATE_PENDING,\
+                MAP_JOB_STATE_RUNNING,\
+                MAP_JOB_STATE_SUCCESS,\
+                MAP_JOB_STATE_FAILURE)
+MAP_JOB_STATE_CHOICES = [(x, x) for x in MAP_JOB_STATES]
+
+# Map every shapefile set in a .zip: one layer per set
+MAP_JOB_TYPE_ALL_SHAPEFILES = 'TYPE_ALL_SHAPEFILE_LAYERS'
+
+MAP_JOB_LAYER_TYPES = (TYPE_SHAPEFILE_LAYER, TYPE_JOIN_LAYER, TYPE_LAT_LNG_LAYER,\
+                MAP_JOB_TYPE_ALL_SHAPEFILES)
+MAP_JOB_LAYER_TYPE_CHOICES = [(x, x) for x in MAP_JOB_LAYER_TYPES]
+
+# Save upload progress at most every 2% of the file
+MAP_JOB_PROGRESS_SAVE_FRACTION = 0.02
+
+
+class MapJob(TimeStampedModel):
+    """
+    A request to create a WorldMap layer from a shapefile, a tabular
+    join or a lat/lng tabular file.
+
+    The job is run by MapJobRunner--via Celery when
+    settings.WORLDMAP_ASYNC_MAP_JOBS is True--and the browser
+    polls its state.  See map_job_runner.py
+
+    PENDING -> RUNNING -> SUCCESS or FAILURE
+    """
+    layer_type = models.CharField(max_length=50,\
+                        choices=MAP_JOB_LAYER_TYPE_CHOICES)
+    state = models.CharField(max_length=20,\
+                        choices=MAP_JOB_STATE_CHOICES,\
+                        default=MAP_JOB_STATE_PENDING)
+
+    gis_data_md5 = models.CharField(max_length=40,\
+                        help_text='md5 of the ShapefileInfo or TabularFileInfo')
+    job_params = JSONField(blank=True, null=True,\
+                        help_text='e.g. join column and target layer')
+
+    celery_task_id = models.CharField(max_length=255, blank=True)
+
+    worldmap_info_md5 = models.CharField(max_length=40, blank=True,\
+                        help_text='md5 of the WorldMapLayerInfo, after success')
+    job_results = JSONField(blank=True, null=True,\
+                        help_text='e.g. a result for each shapefile set')
+    error_message = models.TextField(blank=True)
+
+    upload_bytes_sent = models.BigIntegerField(default=0)
+    upload_bytes_total = models.BigIntegerField(default=0)
+
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    md5 = models.CharField(max_length=40, blank=True,\
+                        db_index=True, help_text='auto-filled on save')
+
+    def __unicode__(self):
+        return '%s (%s): %s' % (self.layer_type, self.state, self.gis_data_md5)
+
+    def is_finished(self):
+        return self.state in (MAP_JOB_STATE_SUCCESS, MAP_JOB_STATE_FAILURE)
+
+    def is_success(self):
+        return self.state == MAP_JOB_STATE_SUCCESS
+
+    def update_if_unfinished(self, **field_values):
+        """
+        Update the job only if it is still PENDING or RUNNING.
+
+        A job marked FAILURE--e.g. timed out by a status poll--is not
+        flipped back by a worker that finishes late.
+
+        :returns: boolean, True if the job was updated
+        """
+        field_values['modified'] = timezone.now()
+        num_updated = MapJob.objects.filter(pk=self.id,\
+                            state__in=(MAP_JOB_STATE_PENDING, MAP_JOB_STATE_RUNNING))\
+                            .update(**field_values)
+        self.refresh_from_db()
+        if not num_updated:
+            LOGGER.warn('MapJob already finished, not updated: %s (%s)',\
+                        self.id, self.state)
+        return num_updated > 0
+
+    def mark_running(self, celery_task_id=None):
+        """
+        :returns: boolean, False if the job was already finished
+        """
+        field_values = dict(state=MAP_JOB_STATE_RUNNING,\
+                            started=timezone.now())
+        if celery_task_id:
+            field_values['celery_task_id'] = celery_task_id
+        return self.update_if_unfinished(**field_values)
+
+    def update_upload_progress(self, bytes_sent, bytes_total):
+        """
+        Upload progress callback, see StreamingMultipartEncoder.
+
+        Called for every block sent, so the database is only
+        updated every MAP_JOB_PROGRESS_SAVE_FRACTION of the upload
+        """
+        save_step = max(1, int(bytes_total * MAP_JOB_PROGRESS_SAVE_FRACTION))
+        if bytes_total == self.upload_bytes_total and\
+            bytes_sent < bytes_total and\
+            bytes_sent - self.upload_bytes_sent < save_step:
+            return
+
+        self.upload_bytes_sent = bytes_sent
+        self.upload_bytes_total = bytes_total
+
+        # Only these fields: don't overwrite the state
+        MapJob.objects.filter(pk=self.id).update(\
+                                upload_bytes_sent=bytes_sent,\
+                                upload_bytes_total=bytes_total)
+
+    def mark_success(self, worldmap_info=None, job_results=None):
+        """
+        :param worldmap_info: WorldMapLayerInfo subclass
+        :param job_results: results of a job making several layers
+        :returns: boolean, False if the job was already finished
+        """
+        field_values = dict(state=MAP_JOB_STATE_SUCCESS,\
+                            job_results=job_results,\
+                            finished=timezone.now())
+        if worldmap_info is not None:
+            field_values['worldmap_info_md5'] = worldmap_info.md5
+        return self.update_if_unfinished(**field_values)
+
+    def mark_failure(self, err_msg):
+        """
+        :returns: boolean, False if the job was already finished
+        """
+        return self.update_if_unfinished(state=MAP_JOB_STATE_FAILURE,\
+                                         error_message=err_msg,\
+                                         finished=timezone.now())
+
+    def save(self, *args, **kwargs):
+        """Save with md5 hash"""
+        if not self.id:
+            super(MapJob, self).save(*args, **kwargs)
+
+        if not self.md5:
+            string_to_hash = '%s%s%s%s' % (self.id,\
+                                        self.layer_type,\
+                                        self.gis_data_md5,\
+                                        self.created)
+            self.md5 = md5(string_to_hash).hexdigest()
+
+        super(MapJob, self).save(*args, **kwargs)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Map job'
+        verbose_name_plural = 'Map jobs'
+
 '''
 class APIValidationSchema(TimeStampedModel):
     """May be used to evaluate API results such as JoinTargetInformation"""
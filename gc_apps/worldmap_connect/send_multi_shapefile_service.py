@@ -0,0 +1,233 @@
+"""
+Map every shapefile set in a .zip archive
+
+A .zip with several complete shapefile sets is split into one .zip--and
+one ShapefileInfo--per set.  The new ShapefileInfo objects are sent to
+the WorldMap using a bounded pool of threads.
+
+    service = SendMultiShapefileService(shapefile_info)
+    if service.build_shapefile_infos():
+        results = service.send_all_to_worldmap()
+
+Each ShapefileInfo created here shares the Dataverse file info of the
+original and points to it via source_shapefile_info.  WorldMap lookups
+and Dataverse metadata updates are keyed on the Dataverse file, so
+they're skipped for these layers--see
+SendShapefileService.send_shapefile_to_worldmap
+"""
+import os
+import logging
+import zipfile
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.temp import NamedTemporaryFile
+from django.db import connection
+from django.db.models import OneToOneField
+
+from gc_apps.gis_shapefiles.models import ShapefileInfo
+from gc_apps.gis_shapefiles.shapefile_zip_check import ShapefileZipCheck
+from gc_apps.worldmap_connect.send_shapefile_service import SendShapefileService
+
+LOGGER = logging.getLogger(__name__)
+
+# ShapefileInfo fields that aren't copied to the per-set objects.
+#   - dv_file_blob: each set has its own .zip, not a blob reference
+FIELDS_NOT_COPIED = ('id', 'md5', 'dv_file', 'dv_file_blob', 'created', 'modified',
+                     'gis_scratch_work_directory', 'name',
+                     'zipfile_checked', 'has_shapefile', 'number_of_features',
+                     'bounding_box', 'column_names', 'column_info',
+                     'extracted_shapefile_load_path',
+                     'source_shapefile_info')
+
+
+def send_shapefile_info_to_worldmap(shapefile_info):
+    """
+    Thread pool worker.  Send one ShapefileInfo to the WorldMap
+
+    returns dict with the set name, success flag, and layer or error info
+    """
+    try:
+        send_shp_service = SendShapefileService(**dict(shapefile_info=shapefile_info))
+        success = send_shp_service.send_shapefile_to_worldmap(\
+                                    check_existing_layers=False,
+                                    update_dataverse=False)
+
+        result = dict(name=shapefile_info.name,
+                      shp_md5=shapefile_info.md5,
+                      success=success)
+        if success:
+            worldmap_layerinfo = send_shp_service.get_worldmap_layerinfo()
+            result['layer_name'] = worldmap_layerinfo.layer_name
+            result['layer_md5'] = worldmap_layerinfo.md5
+            result['layer_link'] = worldmap_layerinfo.core_data.get('layer_link', '')
+        else:
+            result['err_msgs'] = send_shp_service.err_msgs
+        return result
+    finally:
+        # Each thread has its own database connection
+        connection.close()
+
+
+class SendMultiShapefileService(object):
+    """
+    Split a multi-shapefile .zip and send each set to the WorldMap
+    """
+    def __init__(self, shapefile_info, max_workers=None):
+        """
+        :param shapefile_info: ShapefileInfo with a .zip containing 1 or more sets
+        :param max_workers: number of concurrent WorldMap requests.
+            Defaults to settings.WORLDMAP_MAX_CONCURRENT_UPLOADS
+        """
+        assert isinstance(shapefile_info, ShapefileInfo),\
+                "shapefile_info must be a ShapefileInfo object"
+
+        self.shapefile_info = shapefile_info
+        self.max_workers = max_workers or settings.WORLDMAP_MAX_CONCURRENT_UPLOADS
+
+        self.set_shapefile_infos = []   # one ShapefileInfo per shapefile set
+
+        self.has_err = False
+        self.err_msgs = []
+
+    def add_err_msg(self, msg):
+        LOGGER.error(msg)
+        self.has_err = True
+        self.err_msgs.append(msg)
+
+    def get_copied_field_values(self):
+        """Field values shared by each per-set ShapefileInfo"""
+
+        field_values = {}
+        for field in ShapefileInfo._meta.concrete_fields:
+            if field.name in FIELDS_NOT_COPIED:
+                continue
+            if isinstance(field, OneToOneField) and field.rel.parent_link:
+                continue
+            field_values[field.attname] = getattr(self.shapefile_info, field.attname)
+
+        return field_values
+
+    def build_shapefile_infos(self):
+        """
+        In a single pass over the .zip, create a .zip and a
+        ShapefileInfo for each shapefile set
+
+        :returns: boolean
+        """
+        if self.has_err:
+            return False
+
+        if not self.shapefile_info.is_dv_file_available():
+            self.add_err_msg('The shapefile .zip is not available.')
+            return False
+
+        zip_checker = ShapefileZipCheck(self.shapefile_info.get_dv_file_fullpath(),
+                                        **dict(allow_multiple_shapefiles=True))
+        zip_checker.validate()
+        if zip_checker.has_err:
+            self.add_err_msg(zip_checker.error_msg)
+            return False
+
+        scratch_directory = self.shapefile_info.get_scratch_work_directory()
+        field_values = self.get_copied_field_values()
+
+        try:
+            for set_name in zip_checker.get_shapefile_setnames():
+                set_shapefile_info = ShapefileInfo(**field_values)
+                set_shapefile_info.source_shapefile_info = self.shapefile_info
+                if not self.save_set_zip(zip_checker, set_name,\
+                                         set_shapefile_info, scratch_directory):
+                    break
+                self.set_shapefile_infos.append(set_shapefile_info)
+
+                if not zip_checker.load_shapefile_from_open_zip(set_name, set_shapefile_info):
+                    self.add_err_msg('Failed to load shapefile "%s": %s' %\
+                                     (set_name, zip_checker.error_msg))
+                    break
+
+                set_shapefile_info.zipfile_checked = True
+                set_shapefile_info.has_shapefile = True
+                set_shapefile_info.save()
+        except Exception:
+            self.delete_set_shapefile_infos()
+            raise
+        finally:
+            zip_checker.close_zip()
+            self.shapefile_info.delete_scratch_work_directory()
+
+        if self.has_err:
+            # Don't leave some of the sets behind
+            self.delete_set_shapefile_infos()
+            return False
+
+        return True
+
+    def delete_set_shapefile_infos(self):
+        """Delete the per-set ShapefileInfo objects, one at a time
+        to release the stored files"""
+        for set_shapefile_info in self.set_shapefile_infos:
+            set_shapefile_info.delete()
+        self.set_shapefile_infos = []
+
+    def save_set_zip(self, zip_checker, set_name, set_shapefile_info, scratch_directory):
+        """
+        Write the members of one shapefile set to a new .zip and
+        save it as the dv_file of set_shapefile_info
+
+        Members are extracted one at a time to the scratch directory
+        """
+        tmp_zip = NamedTemporaryFile(delete=True, suffix='.zip')
+        set_zip = zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+        try:
+            for member_name in zip_checker.potential_shapefile_sets[set_name]:
+                extracted_path = zip_checker.zip_obj.extract(member_name, scratch_directory)
+                set_zip.write(extracted_path, os.path.basename(member_name))
+                os.remove(extracted_path)
+        except (IOError, OSError, zipfile.BadZipfile) as ex_obj:
+            set_zip.close()
+            tmp_zip.close()
+            self.add_err_msg('Failed to create a .zip for "%s": %s' % (set_name, ex_obj))
+            return False
+
+        set_zip.close()
+        tmp_zip.flush()
+        tmp_zip.seek(0)
+
+        set_shapefile_info.save()
+        try:
+            set_shapefile_info.dv_file.save('%s.zip' % os.path.basename(set_name),\
+                                            File(tmp_zip))
+        except (IOError, OSError) as ex_obj:
+            set_shapefile_info.delete()
+            self.add_err_msg('Failed to save the .zip for "%s": %s' % (set_name, ex_obj))
+            return False
+        finally:
+            tmp_zip.close()
+
+        return True
+
+    def send_all_to_worldmap(self):
+        """
+        Send each per-set ShapefileInfo to the WorldMap using
+        at most self.max_workers concurrent requests
+
+        :returns: list of result dicts, in the order of self.set_shapefile_infos
+        """
+        if not self.set_shapefile_infos:
+            return []
+
+        pool = ThreadPool(min(self.max_workers, len(self.set_shapefile_infos)))
+        try:
+            results = pool.map(send_shapefile_info_to_worldmap, self.set_shapefile_infos)
+        finally:
+            pool.close()
+            pool.join()
+
+        for result in results:
+            if not result['success']:
+                self.add_err_msg('Failed to map "%s"' % result['name'])
+
+        return results
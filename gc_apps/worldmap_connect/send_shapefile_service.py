@@ -1,3 +1,4 @@
+import os
 import logging
 
 from datetime import timedelta
@@ -8,6 +9,7 @@ from django.conf import settings
 from shared_dataverse_information.map_layer_metadata.forms import WorldMapToGeoconnectMapLayerMetadataValidationForm
 
 from gc_apps.gis_shapefiles.models import ShapefileInfo, WorldMapShapefileLayerInfo
+from gc_apps.gis_shapefiles.shapefile_zip_check import ShapefileZipCheck
 
 from gc_apps.gis_basic_file.dataverse_info_service import get_dataverse_info_dict
 
@@ -30,12 +32,16 @@ class SendShapefileService:
 
         :param: shp_md5: str corresponding to a ShapefileInfo object
         :param shapefile_info: ShapefileInfo object
+        :param progress_callback: Optional. function(bytes_sent, total_bytes)
+            for the upload to WorldMap
         """
         self.shapefile_info = None
+        self.progress_callback = kwargs.get('progress_callback', None)
         self.has_err = False
         self.err_msgs = []
         self.worldmap_response = None       # dict returned from WorldMapImporter or None
         self.worldmap_layerinfo = None      # WorldMapShapefileLayerInfo or None
+        self.validation_report = None       # ShapefileValidationReport or None
 
         if kwargs.has_key('shapefile_info'):
             self.shapefile_info = kwargs['shapefile_info']
@@ -69,12 +75,18 @@ class SendShapefileService:
 
         return False
 
-    def send_shapefile_to_worldmap(self):
+    def send_shapefile_to_worldmap(self, check_existing_layers=True, update_dataverse=True):
         """
-        TO DO : Option to make this happen via async.
-
         Main function that attempts to send a shapefile to WorldMap
 
+        :param check_existing_layers: look for an existing layer in the
+            database and on the WorldMap before sending the file
+        :param update_dataverse: send the new layer info to the Dataverse
+
+        (Both lookups are keyed on the Dataverse file, see SendMultiShapefileService)
+
+        To run this outside of the web request, see map_job_runner.py
+
         returns boolean indicating whether process worked
         """
         # (1) Does the self.shapefile_info have what it needs?  Mainly a legit zippped shapefile
@@ -82,26 +94,33 @@ class SendShapefileService:
         if not self.verify_shapefile():
             return False
 
-        # (2) Check if a successful import already exists (WorldMapLayerInfo), if it does, set the "self.worldmap_layerinfo"
-        if self.does_successful_import_already_exist():
-            return True
+        if check_existing_layers:
+            # (2) Check if a successful import already exists (WorldMapLayerInfo), if it does, set the "self.worldmap_layerinfo"
+            if self.does_successful_import_already_exist():
+                return True
 
-        # (3) Check the WorldMap for an existing map layer
-        if self.check_worldmap_for_existing_layer():
-            return True
+            # (3) Check the WorldMap for an existing map layer
+            if self.check_worldmap_for_existing_layer():
+                return True
+
+        # (4) Optional: check every record before sending the file
+        if settings.SHAPEFILE_DEEP_VALIDATION:
+            if not self.run_deep_validation():
+                return False
 
-        # (4) Map the information!
+        # (5) Map the information!
         if not self.send_file_to_worldmap():
             return False
 
-        # (5) Process the WorldMap response
+        # (6) Process the WorldMap response
         #
         if not self.process_worldmap_response():
             return False
 
-        # (6) Update Dataverse with new WorldMap info
+        # (7) Update Dataverse with new WorldMap info
         #       If this fails, ie, Dataverse not available, keep going...
-        self.update_dataverse_with_worldmap_info()
+        if update_dataverse:
+            self.update_dataverse_with_worldmap_info()
 
         return True
 
@@ -210,6 +229,48 @@ class SendShapefileService:
 
 
 
+    def run_deep_validation(self):
+        """
+        Check every record of the shapefile via the ShapefileDeepValidator.
+        A broken shapefile fails here rather than during the WorldMap import.
+
+        :returns: boolean.  The report is available as self.validation_report
+        """
+        if self.has_err:
+            return False
+
+        zip_checker = ShapefileZipCheck(self.shapefile_info.get_dv_file_fullpath())
+        zip_checker.validate()
+
+        set_names = zip_checker.get_shapefile_setnames() or []
+        name_to_check = None
+        for set_name in set_names:
+            if os.path.basename(set_name) == self.shapefile_info.name:
+                name_to_check = set_name
+                break
+
+        if zip_checker.has_err or name_to_check is None:
+            zip_checker.close_zip()
+            self.add_err_msg('run_deep_validation: The shapefile set was not found')
+            return False
+
+        self.validation_report = zip_checker.get_deep_validation_report(name_to_check)
+        zip_checker.close_zip()
+
+        if self.validation_report is None:
+            self.add_err_msg('run_deep_validation: %s' % zip_checker.error_msg)
+            return False
+
+        if not self.validation_report.is_valid():
+            err_msg = ('This shapefile has problems and was not sent'
+                       ' to the WorldMap:\n%s') %\
+                       self.validation_report.get_summary_message()
+            self.add_err_msg(err_msg)
+            return False
+
+        return True
+
+
     def send_file_to_worldmap(self):
         """
         Let's send this file over!
@@ -224,7 +285,7 @@ class SendShapefileService:
 
         # Instantiate the WorldMapImporter object and attempt the import
         #
-        wmi = WorldMapImporter()
+        wmi = WorldMapImporter(progress_callback=self.progress_callback)
         worldmap_response = wmi.send_shapefile_to_worldmap(layer_params, self.shapefile_info.get_dv_file_fullpath())
 
         if not worldmap_response:
@@ -2,13 +2,10 @@ import sys
 import json
 import pprint
 import logging
-import requests
 
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.db.models import FileField
 from requests.exceptions import ConnectionError as RequestsConnectionError
-from csv import QUOTE_NONNUMERIC
 from gc_apps.geo_utils.msg_util import msg, msgt
 from gc_apps.geo_utils.tabular_util import get_formatted_column_name
 
@@ -16,10 +13,9 @@ from shared_dataverse_information.worldmap_api_helper.url_helper import\
     UPLOAD_JOIN_DATATABLE_API_PATH
 
 from gc_apps.worldmap_connect.utils import get_latest_jointarget_information
-
-# If a column needs formatting
-import pandas as pd
-import numpy as np
+from gc_apps.worldmap_connect.join_column_formatter import JoinColumnFormatter
+from gc_apps.worldmap_connect.join_preflight import JoinPreflightCheck
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 
 LOGGER = logging.getLogger('gc_apps.worldmap_connect.join_layer_service')
 
@@ -37,16 +33,24 @@ class TableJoinMapMaker(object):
         err_msg = tj_map_maker.get_error_msg()
     """
     def __init__(self, datatable_obj, dataverse_metadata_dict,\
-        table_attribute_for_join, target_layer_id):
+        table_attribute_for_join, target_layer_id, progress_callback=None):
+        """
+        :param progress_callback: Optional. function(bytes_sent, total_bytes)
+            for the upload to WorldMap
+        """
         self.datatable_obj = datatable_obj
         self.dataverse_metadata_dict = dataverse_metadata_dict
         self.table_attribute_for_join = table_attribute_for_join
         self.target_layer_id = target_layer_id
+        self.progress_callback = progress_callback
 
         # If a new join column is needed
         self.formatted_file_created = False
         self.zero_pad_length = None
 
+        # Results of a local join check, if a key set is available
+        self.preflight_results = None
+
         # For error messages
         self.err_found = False
         self.err_messages = []
@@ -109,66 +113,6 @@ class TableJoinMapMaker(object):
             self.add_error('The Tabular File object does not have a "delimiter"')
 
 
-    def is_formatted_column_needed(self, data_frame, single_join_target_info):
-        """
-        This is called by "format_data_table_for_join" -- it is only called
-        when the target column is a string and/or specifies zero-padding
-
-        Selected join column needs formatting if:
-            (a) It is type numeric
-            (b) The values do not meet the minimal length (zero padding)
-        """
-        assert isinstance(data_frame, pd.DataFrame),\
-            "data_frame must be a pandas DataFrame object"
-
-        df = data_frame
-
-        # --------------------------------------------
-        # (1) Is this a numeric column?
-        # If so, we need a formatted column b/c we're matching against a string.
-        # --------------------------------------------
-        col_dtype = df[self.table_attribute_for_join].dtype
-        if np.isreal(col_dtype) and col_dtype != 'object':
-            return True
-
-        #   Our chosen column is character but the target doesn't have
-        #   a zero padding requirement
-        #
-        if not single_join_target_info.requires_zero_padding():
-            return False
-
-        # --------------------------------------------
-        # (2) Are the values in our column the correct length for a join?
-        # --------------------------------------------
-        total_rows = len(df)
-
-        # Count how many columns meet the padding length
-        #   - convert our temp column to a string
-        # --------------------------------------------
-        temp_col = self.table_attribute_for_join + '_temp'
-        df[temp_col] = df[self.table_attribute_for_join].astype('str')
-
-        #   - Make a filter to count how many values have
-        #       the correct length
-        # --------------------------------------------
-        filter_criteria = (df[temp_col].str.len() == single_join_target_info.zero_pad_length)
-        num_short_rows = len(df.loc[filter_criteria])
-
-        # Drop the temp column
-        df = df.drop(temp_col, axis=1)
-
-
-        #   - Are all the rows the right length?
-        # --------------------------------------------
-        if num_short_rows == total_rows:    # Yes
-            # Looks ok, no formatting needed
-            return False
-
-        # We need a formatted column
-        return True
-
-
-
     def format_data_table_for_join(self, single_join_target_info):
         """
         Create a new file and add a formatted column that's zero-padded
@@ -185,10 +129,6 @@ class TableJoinMapMaker(object):
             self.add_error('single_join_target_info cannot be None')
             return False
 
-        # Set instance wide value for zero_pad_length
-        #
-        zero_pad_length = single_join_target_info.zero_pad_length
-
         # ----------------------------------------
         # Do we need to do any formatting at all?  (Looking at the target only)
         # ----------------------------------------
@@ -210,93 +150,68 @@ class TableJoinMapMaker(object):
 
         # ============================================
         # (1) Do we need a formatted column?
-        #   - Check the type of the selected column
+        #   - Check the type and length of the selected column.
+        #     Only the join column is read, in chunks
         # ============================================
+        formatter = JoinColumnFormatter(self.datatable_obj,\
+                                        self.table_attribute_for_join,\
+                                        single_join_target_info)
 
-        # --------------------------------------------
-        # (1a) Open the dataverse tabular file with pandas
-        # --------------------------------------------
-        try:
-            df = pd.read_csv(self.datatable_obj.dv_file.path,\
-                        sep=self.datatable_obj.delimiter,\
-                        )
-        except pd.parser.CParserError as e:
-            err_msg = ('Could not process the file. '
-                        'At least one row had too many values. '
-                        '(error: %s)' % e.message)
-            self.add_error(err_msg)
-            return False
-
-        # --------------------------------------------
-        # (1b) Is the join column in the data frame?
-        # --------------------------------------------
-        if not self.table_attribute_for_join in df.columns:
-            self.add_error('Failed to find column "%s" for formatting.'\
-                % self.table_attribute_for_join)
+        is_formatting_needed = formatter.is_formatted_column_needed()
+        if formatter.has_error:
+            self.add_error(formatter.error_message)
             return False
 
-        # --------------------------------------------
-        # (1c) Do we need a formatted column?
-        #   The data may already be formatted
-        # --------------------------------------------
-        if not self.is_formatted_column_needed(df, single_join_target_info):
+        if not is_formatting_needed:
             # The existing column may be used for the join
             return True
 
         # Looks like we need a formatted column
 
         # ----------------------------------
-        # (2) Add formatted column
+        # (2) Write a new file with the formatted column
+        #   new column name = existing name + "_formatted"
         # ----------------------------------
-        # new column name = existing name + "_formatted"
         new_column_name = get_formatted_column_name(self.table_attribute_for_join)
 
-        # What type of column formatting?
-        #
-        if single_join_target_info.requires_zero_padding():
-            #
-            # zero pad formatting
-            #
-            zero_pad_fmt = '{0:0>%s}' % zero_pad_length
-            func_col_fmt = lambda x: zero_pad_fmt.format(x)
-        elif single_join_target_info.is_target_column_string():
-            #
-            # simple convert to string
-            #
-            func_col_fmt = lambda x: '%s' % x
-
-        # make the column
-        # ----------------------------------
-        df[new_column_name] = df[self.table_attribute_for_join].apply(\
-                                lambda x: func_col_fmt(x))
+        if not formatter.write_join_file(new_column_name):
+            self.add_error(formatter.error_message)
+            return False
 
         # (2b) set new join column name
         # ----------------------------------
         self.table_attribute_for_join = new_column_name
 
+        # Indicate that a formatted file has been created
         # ----------------------------------
-        # (3) Save  new file
-        # ----------------------------------
-        #msg('columns 4: %s' % df.columns)
+        self.formatted_file_created = True
 
-        # Write the DataFrame to a ContentFile
-        #
-        csv_parms = dict(sep=str(self.datatable_obj.delimiter),\
-                        quoting=QUOTE_NONNUMERIC,\
-                        index=False,\
-                        columns=df.columns,\
-                        )
-        content_file = ContentFile(df.to_csv(**csv_parms))
+        return True
 
-        # Save the ContentFile in the datatable_obj
-        # ----------------------------------
-        self.datatable_obj.dv_join_file.save(\
-                self.datatable_obj.datafile_label,\
-                content_file)
+    def run_join_preflight(self, single_join_target_info):
+        """
+        If settings.WORLDMAP_JOIN_PREFLIGHT is on and a JoinTargetKeySet
+        is available, predict the matched rows.  Stop if too few rows
+        would match--the file isn't uploaded.
 
-        # Indicate that a formatted file has been created
-        # ----------------------------------
-        self.formatted_file_created = True
+        :returns: boolean.  False if the join shouldn't be attempted
+        """
+        if not settings.WORLDMAP_JOIN_PREFLIGHT:
+            return True
+
+        preflight = JoinPreflightCheck(self.datatable_obj,\
+                                       self.table_attribute_for_join,\
+                                       single_join_target_info)
+        if not preflight.run_check():
+            # No key set or the check failed: try the join anyway
+            return True
+
+        self.preflight_results = preflight.get_results()
+
+        if preflight.num_matched == 0 or\
+            preflight.get_match_percentage() < settings.WORLDMAP_JOIN_PREFLIGHT_MIN_MATCH_PERCENTAGE:
+            self.add_error('The join was not attempted. %s' % preflight.get_user_message())
+            return False
 
         return True
 
@@ -358,6 +273,12 @@ class TableJoinMapMaker(object):
         #
         self.zero_pad_length = single_join_target_info.zero_pad_length
 
+        # --------------------------------------------------
+        # Check the join locally before uploading the file
+        # --------------------------------------------------
+        if not self.run_join_preflight(single_join_target_info):
+            return False
+
         # --------------------------------------------------
         # Do we need to format the data in the join column?
         # --------------------------------------------------
@@ -395,11 +316,11 @@ class TableJoinMapMaker(object):
         print '-' * 40
 
         try:
-            r = requests.post(UPLOAD_JOIN_DATATABLE_API_PATH,
-                            data=map_params,
-                            files=file_params,
-                            auth=settings.WORLDMAP_ACCOUNT_AUTH,
-                            timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
+            r = WorldMapClient.post_files(UPLOAD_JOIN_DATATABLE_API_PATH,
+                            map_params,
+                            file_params,
+                            progress_callback=self.progress_callback,
+                            read_timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
                             )
         except RequestsConnectionError as e:
             print 'err', e
@@ -1,7 +1,29 @@
 from __future__ import absolute_import
 
+import logging
+
 from celery import shared_task
 
+LOGGER = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, ignore_result=True)
+def run_map_job(self, map_job_id):
+    """
+    Create a WorldMap layer for a MapJob.  See map_job_runner.py
+    """
+    # Lazy imports: the Django apps load before the tasks
+    from gc_apps.worldmap_connect.models import MapJob
+    from gc_apps.worldmap_connect.map_job_runner import MapJobRunner
+
+    try:
+        map_job = MapJob.objects.get(pk=map_job_id)
+    except MapJob.DoesNotExist:
+        LOGGER.error('MapJob not found: %s', map_job_id)
+        return False
+
+    return MapJobRunner(map_job).run_job(celery_task_id=self.request.id)
+
 
 @shared_task
 def add(x, y):
@@ -16,4 +38,3 @@ def mul(x, y):
 @shared_task
 def xsum(numbers):
     return sum(numbers)
-
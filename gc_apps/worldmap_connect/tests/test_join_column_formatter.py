@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import tempfile
+
+from django.core import management
+from django.core.files import File
+from django.test import TestCase
+
+from gc_apps.gis_tabular.models import TabularFileInfo
+from gc_apps.gis_tabular.tabular_sniffer import ENCODING_LATIN1, ENCODING_UTF8_BOM
+from gc_apps.worldmap_connect.join_column_formatter import JoinColumnFormatter
+from gc_apps.worldmap_connect.single_join_target_info import SingleJoinTargetInfo
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_join_column_formatter
+#
+
+PLACE_TARGET_INFO = dict(id=101,
+                         name='Places',
+                         layer='geonode:places',
+                         attribute=dict(attribute='PLACE_ID', type='xsd:string'),
+                         expected_format=dict(is_zero_padded=True,
+                                              expected_zero_padded_length=6))
+
+
+class JoinColumnFormatterTestCase(TestCase):
+
+    def setUp(self):
+        management.call_command('loaddata', 'test_join_layer-2016-1205.json')
+
+        self.tabular_info = TabularFileInfo.objects.get(pk=14)
+        self.tabular_info.delimiter = ','
+        self.tabular_info.has_header_row = True
+        self.tabular_info.column_schema = [\
+                dict(name='place_id', dtype='str', numeric_text=False),
+                dict(name='place_name', dtype='str', numeric_text=False)]
+
+        self.single_join_target_info = SingleJoinTargetInfo(PLACE_TARGET_INFO)
+
+    def write_join_file(self, file_content, file_encoding):
+        """Attach file_content as the dv_file and write the join file"""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as tmp_file:
+            tmp_file.write(file_content)
+            tmp_file.flush()
+            self.tabular_info.dv_file.save('places.csv',\
+                                           File(open(tmp_file.name, 'rb')),\
+                                           save=False)
+        self.tabular_info.file_encoding = file_encoding
+        self.tabular_info.save()
+
+        formatter = JoinColumnFormatter(self.tabular_info, 'place_id',\
+                                        self.single_join_target_info)
+        self.assertEqual(formatter.is_formatted_column_needed(), True)
+        self.assertEqual(formatter.write_join_file('place_id_formatted'), True)
+        self.assertEqual(formatter.num_rows, 2)
+
+        return open(self.tabular_info.dv_join_file.path, 'rb').read()
+
+    def test_01_non_ascii_rows(self):
+        """test_01_non_ascii_rows"""
+        msgt(self.test_01_non_ascii_rows.__doc__)
+
+        rows = u'place_id,place_name\ncaf\xe9,Montr\xe9al\n42,Boston\n'
+
+        msgd('Test 01: latin-1 file')
+        join_file_content = self.write_join_file(rows.encode('latin-1'), ENCODING_LATIN1)
+        self.assertEqual(join_file_content.splitlines()[1],\
+                         u'caf\xe9,Montr\xe9al,"00caf\xe9"'.encode('latin-1'))
+
+        msgd('Test 02: utf-8 file with a BOM')
+        join_file_content = self.write_join_file('\xef\xbb\xbf' + rows.encode('utf-8'),\
+                                                 ENCODING_UTF8_BOM)
+        self.assertEqual(join_file_content.startswith('\xef\xbb\xbfplace_id'), True)
+        self.assertEqual(join_file_content.splitlines()[1],\
+                         u'caf\xe9,Montr\xe9al,"00caf\xe9"'.encode('utf-8'))
+        self.assertEqual(join_file_content.splitlines()[2], '42,Boston,"000042"')
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from django.test import TestCase
+
+from gc_apps.geo_utils.join_key_formatter import format_join_keys
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_join_key_formatter
+#
+
+class JoinKeyFormatterTestCase(TestCase):
+    """
+    format_join_keys must match the row-by-row formatting it replaced
+    """
+
+    def get_test_columns(self):
+        return dict(ints=pd.Series([1, -5, 0, 123456, 123456789012345]),
+                    floats=pd.Series([1.0, -5.0, 0.5, np.nan, 1e15, 123456789012.0,\
+                                      250250001001.0, 99999999999.0, 1e11,\
+                                      999999999999.9, 12345678901.5,\
+                                      -0.0, 0.1 + 0.2, np.inf]),
+                    bools=pd.Series([True, False]),
+                    strings=pd.Series(['ab', '012', np.nan, 'abcdefgh', '123456789012345'],\
+                                      dtype=object))
+
+    def test_01_same_as_apply(self):
+        """test_01_same_as_apply"""
+        msgt(self.test_01_same_as_apply.__doc__)
+
+        for zero_pad_length in (None, 5, 12):
+            if zero_pad_length is None:
+                func_col_fmt = lambda x: '%s' % x
+            else:
+                zero_pad_fmt = '{0:0>%s}' % zero_pad_length
+                func_col_fmt = lambda x: zero_pad_fmt.format(x)
+
+            for col_name, values in self.get_test_columns().items():
+                msgd('%s, zero_pad_length: %s' % (col_name, zero_pad_length))
+                self.assertEqual(format_join_keys(values, zero_pad_length).tolist(),\
+                                 values.apply(func_col_fmt).tolist())
+
+    def test_02_examples(self):
+        """test_02_examples"""
+        msgt(self.test_02_examples.__doc__)
+
+        self.assertEqual(format_join_keys(pd.Series([1.0, np.nan]), 5).tolist(),\
+                         ['001.0', '00nan'])
+        self.assertEqual(format_join_keys(pd.Series([7, -5]), 5).tolist(),\
+                         ['00007', '000-5'])
+
+        # longer keys are not cut short
+        self.assertEqual(format_join_keys(pd.Series([123456, 7]), 5).tolist(),\
+                         ['123456', '00007'])
+        self.assertEqual(format_join_keys(pd.Series(['abcdefgh']), 5).tolist(),\
+                         ['abcdefgh'])
+
+        # index is kept
+        values = pd.Series([1, 2], index=[10, 20])
+        self.assertEqual(format_join_keys(values).index.tolist(), [10, 20])
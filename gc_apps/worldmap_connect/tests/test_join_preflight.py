@@ -0,0 +1,81 @@
+from os.path import join, dirname
+import json
+import tempfile
+
+import pandas as pd
+
+from django.core import management
+from django.core.files import File
+from django.test import TestCase
+
+from gc_apps.gis_tabular.models import TabularFileInfo
+from gc_apps.worldmap_connect.models import JoinTargetInformation
+from gc_apps.worldmap_connect.join_preflight import JoinPreflightCheck,\
+    JoinTargetKeySetLoader
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+JOIN_TARGETS_FILENAME = join(dirname(__file__), 'input', 'jointargets_2016-1202.json')
+
+CBG_FILENAME = join(dirname(dirname(dirname(__file__))),\
+                    'gis_tabular', 'tests', 'input',\
+                    'CBG_Annual_and_Longitudinal_Measures.tab')
+
+BLOCK_GROUP_TARGET_ID = 29  # BG_ID_10, zero-padded to 12
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_join_preflight
+#
+
+class JoinPreflightTestCase(TestCase):
+
+    def setUp(self):
+        management.call_command('loaddata', 'test_join_layer-2016-1205.json')
+
+        self.tabular_info = TabularFileInfo.objects.get(pk=14)
+        self.tabular_info.dv_file.save('CBG_Annual_and_Longitudinal_Measures',
+                                       File(open(CBG_FILENAME, 'r')),
+                                       save=False)
+        self.tabular_info.delimiter = '\t'
+        self.tabular_info.column_names = ['BG_ID_10']
+        self.tabular_info.save()
+
+        target_info = json.loads(open(JOIN_TARGETS_FILENAME, 'r').read())
+        jt_info = JoinTargetInformation(name='test', target_info=target_info)
+        self.single_join_target_info = jt_info.get_single_join_target_info(\
+                                                BLOCK_GROUP_TARGET_ID)
+
+    def test_01_preflight(self):
+        """test_01_preflight"""
+        msgt(self.test_01_preflight.__doc__)
+
+        preflight = JoinPreflightCheck(self.tabular_info, 'BG_ID_10',\
+                                       self.single_join_target_info)
+
+        msgd('Test 01: No key set')
+        self.assertEqual(preflight.is_key_set_available(), False)
+        self.assertEqual(preflight.run_check(), False)
+        self.assertEqual(preflight.has_error, False)
+
+        msgd('Test 02: Key set missing the first 4 block groups')
+        df = pd.read_csv(CBG_FILENAME, sep='\t', usecols=['BG_ID_10'])
+        keys = df['BG_ID_10'].apply(lambda x: '%012d' % x)[4:]
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as keys_file:
+            pd.DataFrame(dict(BG_ID_10=keys)).to_csv(keys_file.name, index=False)
+            key_set = JoinTargetKeySetLoader.load_keys_from_csv(\
+                                BLOCK_GROUP_TARGET_ID, keys_file.name, 'BG_ID_10')
+        self.assertEqual(key_set.num_keys, len(keys.unique()))
+
+        preflight = JoinPreflightCheck(self.tabular_info, 'BG_ID_10',\
+                                       self.single_join_target_info)
+        self.assertEqual(preflight.run_check(), True)
+
+        results = preflight.get_results()
+        self.assertEqual(results['num_rows'], 554)
+        self.assertEqual(results['num_unmatched'], 4)
+        self.assertEqual(results['unmatched_samples'][0], '250250001001')
+
+        msgd('Test 03: Unknown column')
+        preflight = JoinPreflightCheck(self.tabular_info, 'not-a-column',\
+                                       self.single_join_target_info)
+        self.assertEqual(preflight.run_check(), False)
+        self.assertEqual(preflight.has_error, True)
@@ -0,0 +1,101 @@
+from os.path import join, dirname
+from datetime import timedelta
+import json
+import time
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from gc_apps.worldmap_connect.models import JoinTargetInformation
+from gc_apps.worldmap_connect.jointarget_cache import JoinTargetCache
+from gc_apps.worldmap_connect.utils import get_latest_jointarget_information
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_jointarget_cache
+#
+
+JOIN_TARGETS_FILENAME = join(dirname(__file__), 'input', 'jointargets_2016-1202.json')
+
+
+@override_settings(WORLDMAP_JOIN_TARGET_TTL=60)
+class JoinTargetCacheTestCase(TestCase):
+
+    def setUp(self):
+        JoinTargetCache.reset()
+
+        json_data = open(JOIN_TARGETS_FILENAME, 'r').read()
+        self.join_targets_json = json.loads(json_data)
+
+        self.jt_info = JoinTargetInformation(name='test',\
+                                target_info=self.join_targets_json)
+        self.jt_info.save()
+
+        # Record background refreshes instead of starting a thread
+        self.refresh_calls = []
+        self.start_background_refresh = JoinTargetCache.__dict__['start_background_refresh']
+        JoinTargetCache.start_background_refresh =\
+            staticmethod(lambda: self.refresh_calls.append(1))
+
+    def tearDown(self):
+        JoinTargetCache.start_background_refresh = self.start_background_refresh
+        JoinTargetCache.reset()
+
+    def test_01_fresh_info(self):
+        """test_01_fresh_info"""
+        msgt(self.test_01_fresh_info.__doc__)
+
+        msgd('Test 01: Loaded once, then served from memory')
+        self.assertEqual(get_latest_jointarget_information().id, self.jt_info.id)
+        with self.assertNumQueries(0):
+            jt_info = get_latest_jointarget_information()
+        self.assertEqual(jt_info.get_formatter() is jt_info.get_formatter(), True)
+        self.assertEqual(self.refresh_calls, [])
+
+        msgd('Test 02: Lookups by target id')
+        info = self.join_targets_json['data'][0]
+        self.assertEqual(jt_info.get_single_join_target_info(info['id']).target_layer_name,\
+                         info['layer'])
+        self.assertEqual(jt_info.get_format_info_for_target_layer(info['id']),\
+                         info.get('expected_format'))
+        self.assertEqual(jt_info.get_single_join_target_info(-1), None)
+        self.assertEqual(jt_info.get_format_info_for_target_layer(None), None)
+
+    def test_02_stale_info(self):
+        """test_02_stale_info"""
+        msgt(self.test_02_stale_info.__doc__)
+
+        JoinTargetInformation.objects.filter(pk=self.jt_info.id).update(\
+                created=timezone.now() - timedelta(seconds=120))
+
+        msgd('Test 01: Stale info served, refresh started')
+        self.assertEqual(get_latest_jointarget_information().id, self.jt_info.id)
+        self.assertEqual(len(self.refresh_calls), 1)
+
+        msgd('Test 02: Refresh uses info saved by another process')
+        new_jt_info = JoinTargetInformation(name='test 2',\
+                                target_info=self.join_targets_json)
+        new_jt_info.save()
+
+        self.assertEqual(JoinTargetCache.refresh().id, new_jt_info.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_latest_jointarget_information().id, new_jt_info.id)
+        self.assertEqual(len(self.refresh_calls), 1)
+
+    def test_03_refresh_throttle(self):
+        """test_03_refresh_throttle"""
+        msgt(self.test_03_refresh_throttle.__doc__)
+
+        JoinTargetCache.start_background_refresh = self.start_background_refresh
+
+        msgd('Test 01: No second refresh within the TTL')
+        JoinTargetCache._last_refresh_attempt = time.time()
+        self.assertEqual(JoinTargetCache.start_background_refresh(), False)
+
+        msgd('Test 02: No refresh while one is running')
+        JoinTargetCache._last_refresh_attempt = None
+        JoinTargetCache._refreshing = True
+        try:
+            self.assertEqual(JoinTargetCache.start_background_refresh(), False)
+        finally:
+            JoinTargetCache._refreshing = False
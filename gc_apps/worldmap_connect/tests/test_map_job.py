@@ -0,0 +1,110 @@
+import json
+from datetime import timedelta
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from gc_apps.layer_types.static_vals import TYPE_JOIN_LAYER
+from gc_apps.worldmap_connect.models import MapJob,\
+    MAP_JOB_STATE_PENDING, MAP_JOB_STATE_RUNNING, MAP_JOB_STATE_FAILURE
+from gc_apps.worldmap_connect.map_job_runner import MapJobRunner,\
+    PARAM_CHOSEN_COLUMN, PARAM_CHOSEN_LAYER
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_map_job
+#
+
+@override_settings(WORLDMAP_ASYNC_MAP_JOBS=False, WORLDMAP_MAP_JOB_TIMEOUT=60)
+class MapJobTestCase(TestCase):
+
+    def setUp(self):
+        self.map_job = MapJobRunner.create_job(TYPE_JOIN_LAYER,\
+                            'c' * 32,\
+                            {PARAM_CHOSEN_COLUMN: 'tract', PARAM_CHOSEN_LAYER: 7})
+
+    def get_status_json(self):
+        response = self.client.get(reverse('view_map_job_status',\
+                                   kwargs=dict(job_md5=self.map_job.md5)))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_01_pending_and_running(self):
+        """test_01_pending_and_running"""
+        msgt(self.test_01_pending_and_running.__doc__)
+
+        self.assertEqual(len(self.map_job.md5), 32)
+        self.assertEqual(self.map_job.state, MAP_JOB_STATE_PENDING)
+
+        msgd('Test 01: Pending job, poll again')
+        json_resp = self.get_status_json()
+        self.assertEqual(json_resp['success'], True)
+        self.assertEqual(json_resp['data']['job_state'], MAP_JOB_STATE_PENDING)
+        self.assertEqual('status_url' in json_resp['data'], True)
+
+        msgd('Test 02: Running job')
+        self.map_job.mark_running('task-01')
+        self.assertEqual(MapJob.objects.get(pk=self.map_job.id).celery_task_id, 'task-01')
+        json_resp = self.get_status_json()
+        self.assertEqual(json_resp['data']['job_state'], MAP_JOB_STATE_RUNNING)
+
+    def test_02_failure(self):
+        """test_02_failure"""
+        msgt(self.test_02_failure.__doc__)
+
+        msgd('Test 01: Run inline, Tabular File not found')
+        map_job = MapJobRunner.start_job(self.map_job)
+        self.assertEqual(map_job.state, MAP_JOB_STATE_FAILURE)
+        self.assertEqual(map_job.finished is not None, True)
+        self.assertEqual(map_job.error_message.find('not found') > -1, True)
+
+        msgd('Test 02: Finished job, no polling')
+        json_resp = self.get_status_json()
+        self.assertEqual(json_resp['success'], False)
+        self.assertEqual('status_url' in json_resp['data'], False)
+
+        msgd('Test 03: Already finished, not run again')
+        self.assertEqual(MapJobRunner(map_job).run_job(), False)
+
+    def test_03_upload_progress(self):
+        """test_03_upload_progress"""
+        msgt(self.test_03_upload_progress.__doc__)
+
+        msgd('Test 01: Saved every 2% of the upload')
+        self.map_job.update_upload_progress(8192, 1000000)
+        self.map_job.update_upload_progress(16384, 1000000)
+        saved_job = MapJob.objects.get(pk=self.map_job.id)
+        self.assertEqual(saved_job.upload_bytes_sent, 8192)
+        self.assertEqual(saved_job.upload_bytes_total, 1000000)
+
+        self.map_job.update_upload_progress(40000, 1000000)
+        self.assertEqual(MapJob.objects.get(pk=self.map_job.id).upload_bytes_sent, 40000)
+
+        msgd('Test 02: Always saved at the end')
+        self.map_job.update_upload_progress(1000000, 1000000)
+        self.assertEqual(MapJob.objects.get(pk=self.map_job.id).upload_bytes_sent, 1000000)
+
+    def test_04_timed_out(self):
+        """test_04_timed_out"""
+        msgt(self.test_04_timed_out.__doc__)
+
+        msgd('Test 01: Recent running job, keep polling')
+        self.map_job.mark_running('task-01')
+        json_resp = self.get_status_json()
+        self.assertEqual(json_resp['data']['job_state'], MAP_JOB_STATE_RUNNING)
+
+        msgd('Test 02: Running longer than the timeout, failed')
+        MapJob.objects.filter(pk=self.map_job.id).update(\
+                started=timezone.now() - timedelta(seconds=120))
+        json_resp = self.get_status_json()
+        self.assertEqual(json_resp['success'], False)
+        self.assertEqual(json_resp['data']['job_state'], MAP_JOB_STATE_FAILURE)
+        self.assertEqual(MapJob.objects.get(pk=self.map_job.id).finished is not None, True)
+
+        msgd('Test 03: A late worker does not flip FAILURE to SUCCESS')
+        self.map_job.refresh_from_db()
+        self.assertEqual(self.map_job.mark_success(job_results=[]), False)
+        self.assertEqual(MapJob.objects.get(pk=self.map_job.id).state, MAP_JOB_STATE_FAILURE)
+        self.assertEqual(self.map_job.mark_running('task-02'), False)
+        self.assertEqual(self.map_job.celery_task_id, 'task-01')
@@ -0,0 +1,71 @@
+from os.path import abspath, dirname, join
+import json
+
+from django.core import management
+from django.test import TestCase
+
+from gc_apps.gis_basic_file.models import DataverseFileBlob
+from gc_apps.gis_shapefiles.models import ShapefileInfo
+from gc_apps.worldmap_connect.send_multi_shapefile_service import SendMultiShapefileService
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_send_multi_shapefile
+#
+
+SHP_PARAMS_FILENAME = join(dirname(dirname(dirname(abspath(__file__)))),\
+                           'gis_shapefiles', 'fixtures',\
+                           'dataverse_info_test_fixtures_01.json')
+
+
+class SendMultiShapefileServiceTestCase(TestCase):
+
+    def setUp(self):
+        management.call_command('loaddata', 'registered_dv_localhost.json')
+
+        self.blob = DataverseFileBlob(checksum='d' * 32,\
+                                      blob_name='blobs/not-on-disk.zip',\
+                                      reference_count=1)
+        self.blob.save()
+
+        shp_params = json.loads(open(SHP_PARAMS_FILENAME, 'r').read())
+        self.shapefile_info = ShapefileInfo(**shp_params)
+        self.shapefile_info.dv_file_blob = self.blob
+        self.shapefile_info.save()
+
+    def test_01_set_blob_reference(self):
+        """test_01_set_blob_reference"""
+        msgt(self.test_01_set_blob_reference.__doc__)
+
+        msgd('Test 01: The blob is not copied to the set')
+        field_values = SendMultiShapefileService(self.shapefile_info).get_copied_field_values()
+        self.assertEqual('dv_file_blob_id' in field_values, False)
+
+        set_shapefile_info = ShapefileInfo(**field_values)
+        set_shapefile_info.source_shapefile_info = self.shapefile_info
+        set_shapefile_info.save()
+        self.assertEqual(set_shapefile_info.dv_file_blob, None)
+
+        msgd('Test 02: Deleting the set leaves the source blob alone')
+        set_shapefile_info.delete()
+        self.assertEqual(DataverseFileBlob.objects.get(pk=self.blob.id).reference_count, 1)
+
+        msgd('Test 03: Releasing an already deleted blob')
+        stale_blob = DataverseFileBlob.objects.get(pk=self.blob.id)
+        DataverseFileBlob.objects.filter(pk=self.blob.id).delete()
+        stale_blob.release_reference()
+        self.assertEqual(DataverseFileBlob.objects.filter(pk=self.blob.id).count(), 0)
+
+    def test_02_delete_source(self):
+        """test_02_delete_source"""
+        msgt(self.test_02_delete_source.__doc__)
+
+        field_values = SendMultiShapefileService(self.shapefile_info).get_copied_field_values()
+        for _ in range(2):
+            set_shapefile_info = ShapefileInfo(**field_values)
+            set_shapefile_info.source_shapefile_info = self.shapefile_info
+            set_shapefile_info.save()
+
+        msgd('Test 01: The sets are deleted with the source')
+        self.assertEqual(self.shapefile_info.set_shapefile_infos.count(), 2)
+        self.shapefile_info.delete()
+        self.assertEqual(ShapefileInfo.objects.count(), 0)
@@ -0,0 +1,142 @@
+import cgi
+import io
+import os
+import tempfile
+
+import requests
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient,\
+    REQUESTS_HAS_TIMEOUT_TUPLE
+from gc_apps.geo_utils.msg_util import msgt, msgd
+
+# python manage.py test gc_apps.worldmap_connect.tests.test_worldmap_client
+#
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession(object):
+    """Return (or raise) the queued results, in order"""
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        if hasattr(kwargs.get('data'), 'read'):
+            # read the streamed body before it's closed
+            kwargs['body'] = ''.join(kwargs['data'])
+        self.calls.append((method, url, kwargs))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        pass
+
+
+@override_settings(WORLDMAP_CONNECT_TIMEOUT=3,
+                   WORLDMAP_SHORT_TIMEOUT=20,
+                   WORLDMAP_RETRY_COUNT=2,
+                   WORLDMAP_RETRY_BACKOFF=0,
+                   WORLDMAP_ACCOUNT_AUTH=('user', 'pw'))
+class WorldMapClientTestCase(TestCase):
+
+    def tearDown(self):
+        WorldMapClient.reset_session()
+
+    @staticmethod
+    def set_fake_session(results):
+        fake_session = FakeSession(results)
+        WorldMapClient._session = fake_session
+        WorldMapClient._session_pid = os.getpid()
+        return fake_session
+
+    def test_01_session(self):
+        """test_01_session"""
+        msgt(self.test_01_session.__doc__)
+
+        session = WorldMapClient.get_session()
+        self.assertEqual(WorldMapClient.get_session() is session, True)
+
+        WorldMapClient.reset_session()
+        self.assertEqual(WorldMapClient.get_session() is session, False)
+
+        if REQUESTS_HAS_TIMEOUT_TUPLE:
+            self.assertEqual(WorldMapClient.get_timeout(), (3, 20))
+            self.assertEqual(WorldMapClient.get_timeout(480), (3, 480))
+        else:
+            self.assertEqual(WorldMapClient.get_timeout(), 20)
+            self.assertEqual(WorldMapClient.get_timeout(480), 480)
+
+    def test_02_retry(self):
+        """test_02_retry"""
+        msgt(self.test_02_retry.__doc__)
+
+        msgd('Test 01: GET retried after an error and a 503')
+        fake_session = self.set_fake_session([requests.exceptions.ConnectionError('down'),
+                                              FakeResponse(503),
+                                              FakeResponse(200)])
+        resp = WorldMapClient.get('http://worldmap/api/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(fake_session.calls), 3)
+        self.assertEqual(fake_session.calls[0][2]['auth'], ('user', 'pw'))
+        self.assertEqual(fake_session.calls[0][2]['timeout'], WorldMapClient.get_timeout())
+
+        msgd('Test 02: GET gives up after WORLDMAP_RETRY_COUNT retries')
+        self.set_fake_session([FakeResponse(502)] * 3)
+        self.assertEqual(WorldMapClient.get('http://worldmap/api/').status_code, 502)
+
+        msgd('Test 03: POST not retried')
+        fake_session = self.set_fake_session([requests.exceptions.Timeout('slow')])
+        self.assertRaises(requests.exceptions.Timeout,\
+                          WorldMapClient.post, 'http://worldmap/api/')
+        self.assertEqual(len(fake_session.calls), 1)
+
+        msgd('Test 04: POST lookup retried when asked')
+        fake_session = self.set_fake_session([requests.exceptions.Timeout('slow'),
+                                              FakeResponse(200)])
+        resp = WorldMapClient.post('http://worldmap/api/', retry=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(fake_session.calls), 2)
+
+    def test_03_post_files(self):
+        """test_03_post_files"""
+        msgt(self.test_03_post_files.__doc__)
+
+        file_content = 'PK' + 'x' * 200000
+        progress = []
+
+        with tempfile.NamedTemporaryFile(suffix='.zip') as tmp_file:
+            tmp_file.write(file_content)
+            tmp_file.flush()
+
+            fake_session = self.set_fake_session([FakeResponse(200)])
+            resp = WorldMapClient.post_files('http://worldmap/api/upload/',\
+                        dict(title=u'caf\xe9', skip=None),\
+                        dict(content=open(tmp_file.name, 'rb')),\
+                        progress_callback=lambda sent, total: progress.append((sent, total)))
+            filename = os.path.basename(tmp_file.name)
+
+        self.assertEqual(resp.status_code, 200)
+
+        msgd('Test 01: Streamed body, not retried')
+        method, url, kwargs = fake_session.calls[0]
+        self.assertEqual(len(fake_session.calls), 1)
+        self.assertEqual(len(kwargs['body']), len(kwargs['data']))
+        self.assertEqual(progress[-1], (len(kwargs['body']), len(kwargs['body'])))
+
+        msgd('Test 02: Parse the multipart body')
+        form = cgi.FieldStorage(fp=io.BytesIO(kwargs['body']),\
+                    environ={'REQUEST_METHOD': 'POST',\
+                             'CONTENT_TYPE': kwargs['headers']['Content-Type'],\
+                             'CONTENT_LENGTH': str(len(kwargs['body']))})
+        self.assertEqual(form['title'].value, 'caf\xc3\xa9')
+        self.assertEqual('skip' in form, False)
+        self.assertEqual(form['content'].filename, filename)
+        self.assertEqual(form['content'].value, file_content)
@@ -5,4 +5,6 @@ urlpatterns = [
 
     url(r'^clear-jointarget-info/$', views.clear_jointarget_info, name="clear_jointarget_info"),
 
+    url(r'^map-job-status/(?P<job_md5>\w{32})/$', views.view_map_job_status, name="view_map_job_status"),
+
 ]
@@ -3,9 +3,17 @@ from django.http import Http404
 from django.core.urlresolvers import reverse
 from django.contrib.auth.decorators import login_required
 
-from gc_apps.worldmap_connect.models import JoinTargetInformation
+from gc_apps.worldmap_connect.models import JoinTargetInformation, MapJob,\
+    MAP_JOB_TYPE_ALL_SHAPEFILES
+from gc_apps.worldmap_connect.jointarget_cache import JoinTargetCache
+from gc_apps.worldmap_connect.map_job_runner import MapJobRunner
 from gc_apps.worldmap_connect.send_shapefile_service import SendShapefileService
 
+from gc_apps.classification.utils import get_worldmap_info_object
+from gc_apps.geo_utils.message_helper_json import MessageHelperJSON
+from gc_apps.geo_utils.geoconnect_step_names import PANEL_TITLE_STYLE_MAP
+from gc_apps.gis_tabular.views import build_map_html
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -50,5 +58,80 @@ def clear_jointarget_info(request):
         return HttpResponse('no JoinTargetInformation objects found')
 
     l.delete()
+    JoinTargetCache.reset()
 
     return HttpResponse('%s JoinTargetInformation object(s) deleted' % cnt)
+
+
+def get_map_job_response(request, map_job):
+    """
+    JSON response for a MapJob:
+        - still running: "job_state" and a "status_url" to poll
+        - success: the map HTML, same as the synchronous views--or,
+            when mapping every shapefile set, a result for each set
+        - failure: the error message
+    """
+    if not map_job.is_finished():
+        data_dict = dict(job_md5=map_job.md5,
+                         job_state=map_job.state,
+                         upload_bytes_sent=map_job.upload_bytes_sent,
+                         upload_bytes_total=map_job.upload_bytes_total,
+                         status_url=reverse('view_map_job_status',\
+                                            kwargs=dict(job_md5=map_job.md5)))
+        json_msg = MessageHelperJSON.get_json_success_msg(\
+                        'The map is being created.', data_dict=data_dict)
+        return HttpResponse(json_msg, content_type="application/json", status=200)
+
+    if not map_job.is_success():
+        json_msg = MessageHelperJSON.get_json_fail_msg(map_job.error_message,\
+                        data_dict=dict(job_md5=map_job.md5,\
+                                       job_state=map_job.state))
+        return HttpResponse(json_msg, content_type="application/json", status=200)
+
+    if map_job.layer_type == MAP_JOB_TYPE_ALL_SHAPEFILES:
+        results = map_job.job_results or []
+        num_mapped = len([x for x in results if x['success']])
+        user_msg = '%s of %s shapefiles were mapped.' % (num_mapped, len(results))
+
+        json_msg = MessageHelperJSON.get_json_msg(success=num_mapped == len(results),
+                                                  msg=user_msg,
+                                                  data_dict=dict(results=results,
+                                                                 job_md5=map_job.md5,
+                                                                 job_state=map_job.state))
+        return HttpResponse(json_msg, content_type="application/json", status=200)
+
+    worldmap_info = get_worldmap_info_object(map_job.layer_type,\
+                                             map_job.worldmap_info_md5)
+
+    map_html, user_message_html = build_map_html(request, worldmap_info)
+    if map_html is None:    # Failed!  Send an error
+        logger.error("Failed to create map HTML for MapJob: %s (%d)",\
+            map_job, map_job.id)
+        user_msg = 'Sorry! Failed to create map. Please try again. (code: s6)'
+        json_msg = MessageHelperJSON.get_json_fail_msg(user_msg)
+        return HttpResponse(json_msg, content_type="application/json", status=200)
+
+    data_dict = dict(map_html=map_html,
+                user_message_html=user_message_html,
+                id_main_panel_title=PANEL_TITLE_STYLE_MAP,
+                job_md5=map_job.md5,
+                job_state=map_job.state)
+
+    json_msg = MessageHelperJSON.get_json_success_msg("great job", data_dict=data_dict)
+
+    return HttpResponse(json_msg, content_type="application/json", status=200)
+
+
+def view_map_job_status(request, job_md5):
+    """
+    AJAX call: Poll the state of a MapJob
+    """
+    try:
+        map_job = MapJob.objects.get(md5=job_md5)
+    except MapJob.DoesNotExist:
+        json_msg = MessageHelperJSON.get_json_fail_msg('Sorry! The map job was not found.')
+        return HttpResponse(json_msg, content_type="application/json", status=200)
+
+    map_job = MapJobRunner.fail_if_timed_out(map_job)
+
+    return get_map_job_response(request, map_job)
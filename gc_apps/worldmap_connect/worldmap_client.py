@@ -0,0 +1,199 @@
+"""
+Shared HTTP client for the WorldMap API
+
+All WorldMap calls go through one pooled, keep-alive requests.Session
+per process--saving a TCP/TLS handshake per call.
+
+    from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
+
+    r = WorldMapClient.get(GET_JOIN_TARGETS,
+                           read_timeout=settings.WORLDMAP_SHORT_TIMEOUT)
+
+Settings:
+    - WORLDMAP_POOL_SIZE: max connections kept open to the WorldMap
+    - WORLDMAP_CONNECT_TIMEOUT: seconds to wait for a connection.
+        Needs requests 2.4+--with the requests pinned by
+        shared-dataverse-information, the read timeout is used for both
+    - read timeouts are set per endpoint by the caller, usually
+        WORLDMAP_SHORT_TIMEOUT or WORLDMAP_DEFAULT_TIMEOUT (layer creation)
+    - WORLDMAP_RETRY_COUNT, WORLDMAP_RETRY_BACKOFF: idempotent calls are
+        retried after a connection error, timeout or 502/503/504,
+        waiting RETRY_BACKOFF, 2 x RETRY_BACKOFF, 4 x RETRY_BACKOFF...
+
+File uploads are streamed, see post_files()
+
+Exceptions are the same as with requests.get/requests.post, e.g.
+requests.exceptions.ConnectionError
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+from gc_apps.geo_utils.multipart_stream_util import StreamingMultipartEncoder
+
+LOGGER = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# (connect, read) timeout tuples were added in requests 2.4.0
+REQUESTS_HAS_TIMEOUT_TUPLE =\
+        tuple(int(x) for x in requests.__version__.split('.')[:2]) >= (2, 4)
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class WorldMapClient(object):
+    """
+    Static methods wrapping a process-wide requests.Session
+    """
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+    @staticmethod
+    def get_session():
+        """
+        :returns: requests.Session with a connection pool sized
+            by settings.WORLDMAP_POOL_SIZE
+
+        A new session is made after a fork (e.g. Celery, gunicorn workers)
+        so processes don't share sockets
+        """
+        if WorldMapClient._session is not None and\
+            WorldMapClient._session_pid == os.getpid():
+            return WorldMapClient._session
+
+        with WorldMapClient._session_lock:
+            if WorldMapClient._session is None or\
+                WorldMapClient._session_pid != os.getpid():
+
+                pool_size = getattr(settings, 'WORLDMAP_POOL_SIZE', 10)
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size,\
+                                      pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                WorldMapClient._session = session
+                WorldMapClient._session_pid = os.getpid()
+
+        return WorldMapClient._session
+
+    @staticmethod
+    def reset_session():
+        """Close the pooled connections"""
+        with WorldMapClient._session_lock:
+            if WorldMapClient._session is not None:
+                WorldMapClient._session.close()
+            WorldMapClient._session = None
+            WorldMapClient._session_pid = None
+
+    @staticmethod
+    def get_timeout(read_timeout=None):
+        """
+        :returns: (connect timeout, read timeout) in seconds--or,
+            before requests 2.4, the read timeout
+        """
+        if read_timeout is None:
+            read_timeout = settings.WORLDMAP_SHORT_TIMEOUT
+
+        if not REQUESTS_HAS_TIMEOUT_TUPLE:
+            return read_timeout
+
+        return (getattr(settings, 'WORLDMAP_CONNECT_TIMEOUT', 10), read_timeout)
+
+    @staticmethod
+    def get_retry_delay(attempt_num):
+        """Seconds to wait before the retry following attempt_num (0-based)"""
+        return getattr(settings, 'WORLDMAP_RETRY_BACKOFF', 0.5) * (2 ** attempt_num)
+
+    @staticmethod
+    def request(method, url, read_timeout=None, retry=None, **kwargs):
+        """
+        Make a WorldMap API call
+
+        :param method: 'GET', 'POST', etc
+        :param read_timeout: seconds to wait for the response.
+            Default is settings.WORLDMAP_SHORT_TIMEOUT
+        :param retry: retry after connection errors, timeouts and
+            502/503/504 responses.  Default is True for idempotent
+            methods.  Never retry file uploads.
+        :param kwargs: passed to requests.Session.request.  auth
+            defaults to settings.WORLDMAP_ACCOUNT_AUTH
+
+        :returns: requests.Response
+        """
+        method = method.upper()
+
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+
+        num_retries = 0
+        if retry:
+            num_retries = getattr(settings, 'WORLDMAP_RETRY_COUNT', 2)
+
+        kwargs.setdefault('auth', settings.WORLDMAP_ACCOUNT_AUTH)
+        kwargs['timeout'] = WorldMapClient.get_timeout(read_timeout)
+
+        session = WorldMapClient.get_session()
+
+        attempt_num = 0
+        while True:
+            start_time = time.time()
+            try:
+                resp = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError,\
+                    requests.exceptions.Timeout) as ex_obj:
+                LOGGER.warning('WorldMap %s %s failed after %.3f seconds: %s',\
+                               method, url, time.time() - start_time, ex_obj)
+                if attempt_num >= num_retries:
+                    raise
+            else:
+                LOGGER.info('WorldMap %s %s: %s (%.3f seconds)',\
+                            method, url, resp.status_code, time.time() - start_time)
+                if attempt_num >= num_retries or\
+                    resp.status_code not in RETRY_STATUS_CODES:
+                    return resp
+
+            time.sleep(WorldMapClient.get_retry_delay(attempt_num))
+            attempt_num += 1
+
+    @staticmethod
+    def get(url, **kwargs):
+        return WorldMapClient.request('GET', url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return WorldMapClient.request('POST', url, **kwargs)
+
+    @staticmethod
+    def post_files(url, data, files, progress_callback=None, **kwargs):
+        """
+        POST a multipart/form-data request, streaming the files
+        in blocks instead of building the body in memory.
+        Never retried.  The file handles are closed afterwards.
+
+        :param data: dict of form fields
+        :param files: dict of {field name: open file handle}
+        :param progress_callback: optional function(bytes_sent, total_bytes)
+        """
+        encoder = StreamingMultipartEncoder(data, files,\
+                                    progress_callback=progress_callback)
+
+        headers = kwargs.pop('headers', {})
+        headers['Content-Type'] = encoder.content_type
+
+        try:
+            return WorldMapClient.request('POST', url,\
+                                          data=encoder,\
+                                          headers=headers,\
+                                          retry=False,\
+                                          **kwargs)
+        finally:
+            encoder.close()
@@ -13,6 +13,7 @@ from gc_apps.geo_utils.message_helper_json import MessageHelperJSON
 from django.conf import settings
 
 from shared_dataverse_information.worldmap_api_helper.url_helper import ADD_SHAPEFILE_API_PATH
+from gc_apps.worldmap_connect.worldmap_client import WorldMapClient
 
 from shared_dataverse_information.shapefile_import.forms import ShapefileImportDataForm
 from shared_dataverse_information.shared_form_util.format_form_errors import format_errors_as_text
@@ -31,7 +32,7 @@ class WorldMapImporter:
 
     This is meant to be run asynchronously, thus the 4 minute timeout
     """
-    def __init__(self, timeout_seconds=420, return_type_json=False):
+    def __init__(self, timeout_seconds=420, return_type_json=False, progress_callback=None):
         """
         :param worldmap_server_url: base server url, including http or
             https. e.g. http://worldmap.harvard.edu
@@ -39,8 +40,11 @@ class WorldMapImporter:
         :param timeout_seconds: Optional. Number of seconds request is
             given until an exception is raised
         :type timeout_seconds: int or float
+        :param progress_callback: Optional. function(bytes_sent, total_bytes)
+            called as the shapefile is uploaded
         """
         self.api_import_url = ADD_SHAPEFILE_API_PATH
+        self.progress_callback = progress_callback
         self.timeout_seconds = timeout_seconds
         self.return_type_json = return_type_json
         print ('WorldMapImporter. init.  api_import_url', self.api_import_url)
@@ -103,11 +107,11 @@ class WorldMapImporter:
 
         r = None
         try:
-            r = requests.post(self.api_import_url,
-                               data=layer_params,
-                               files=shp_file_param,
-                               auth=settings.WORLDMAP_ACCOUNT_AUTH,
-                               timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
+            r = WorldMapClient.post_files(self.api_import_url,
+                               layer_params,
+                               shp_file_param,
+                               progress_callback=self.progress_callback,
+                               read_timeout=settings.WORLDMAP_DEFAULT_TIMEOUT
                             )
         except requests.exceptions.ConnectionError as exception_obj:
             err_msg = """<br /><p><b>Details for administrator:</b> Could not contact the
@@ -205,7 +205,9 @@ class WorldMapLayerInfo(TimeStampedModel):
                                 .exclude(id=worldmap_info.id)
 
         # Delete the older objects
-        older_info_objects.delete()
+        #   (one at a time, so each object's delete() runs)
+        for older_info in older_info_objects:
+            older_info.delete()
 
 
     def get_layer_url_base(self):
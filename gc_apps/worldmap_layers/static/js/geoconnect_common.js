@@ -26,6 +26,38 @@ function getWorkingBtnMessage(){
     return 'Working... (This may take up to 45 seconds)';
 }
 
+/* ----------------------------------------
+   Milliseconds between map job status checks
+---------------------------------------- */
+var MAP_JOB_POLL_INTERVAL = 3000;
+
+/* ----------------------------------------
+   A mapping request may return a map job
+   that is still running: json_resp.data.status_url
+   Poll the status url until the job finishes,
+   then call on_complete with the final JSON response
+---------------------------------------- */
+function wait_for_map_job(json_resp, on_complete){
+    if (json_resp.success && json_resp.data && json_resp.data.hasOwnProperty('status_url')){
+        logit('map job: ' + json_resp.data.job_state);
+        if (json_resp.data.upload_bytes_total > 0){
+            logit('uploaded: ' + Math.round(100 * json_resp.data.upload_bytes_sent / json_resp.data.upload_bytes_total) + '%');
+        }
+        setTimeout(function(){
+            $.get(json_resp.data.status_url)
+             .done(function(status_resp){
+                 wait_for_map_job(status_resp, on_complete);
+             })
+             .fail(function(){
+                 on_complete({success: false,
+                              message: 'Sorry! Failed to check on the map. Please try again.'});
+             });
+        }, MAP_JOB_POLL_INTERVAL);
+        return;
+    }
+    on_complete(json_resp);
+}
+
 /* ----------------------------------------
    After a file is successfully mapped,
    process the JSON response and update:
@@ -14,15 +14,73 @@ function attempt_visualization(){
             console.log(json_resp);
          })
          .done(function(json_resp) {
+           wait_for_map_job(json_resp, function(json_resp){
              if (json_resp.success){
                  show_map_update_titles(json_resp);
              }else{
                  logit(json_resp.message);
                  $('#id_main_panel_content').show().empty().append(get_alert('danger', json_resp.message));
              }
+           });
           })
   }
 
+/*
+  This is called from the "multiple shapefiles" error page when a
+  user clicks "Map all shapefiles": one WorldMap layer per shapefile set
+  Note: results generated at get_map_job_response()
+*/
+function attempt_visualization_all(){
+
+  $("#id_link_visualize_all_shapefiles").addClass("disabled");
+  $("#id_div_visualize_all_results").show().html($("#id_div_attempt_visualization_all_msg").html());
+
+      var attempt_to_visualize_all_url = '{% url 'view_ajax_attempt_visualization_all' shapefile_info.md5 %}';
+      $.get(attempt_to_visualize_all_url)
+         .done(function(json_resp) {
+           wait_for_map_job(json_resp, show_visualization_all_results);
+          })
+         .fail(function() {
+           show_visualization_all_results({success: false,
+                                          message: 'Sorry! Failed to create the maps. Please try again.'});
+          });
+  }
+
+/*
+  List a result for each shapefile set: a link to the layer
+  or the error messages
+*/
+function show_visualization_all_results(json_resp){
+
+  var results_div = $("#id_div_visualize_all_results").empty();
+
+  if (!(json_resp.data && json_resp.data.hasOwnProperty('results'))){
+      // The whole job failed, allow another try
+      logit(json_resp.message);
+      results_div.append(get_alert('danger', json_resp.message));
+      $("#id_link_visualize_all_shapefiles").removeClass("disabled");
+      return;
+  }
+
+  $("#id_link_visualize_all_shapefiles").hide();
+  results_div.append(get_alert(json_resp.success ? 'success' : 'warning', json_resp.message));
+
+  var result_list = $('<ol></ol>');
+  $.each(json_resp.data.results, function(idx, result){
+      var list_item = $('<li></li>').text(result.name + ': ');
+      if (result.success && result.layer_link){
+          list_item.append($('<a target="_blank"></a>').attr('href', result.layer_link).text(result.layer_name));
+      }else if (result.success){
+          list_item.append(document.createTextNode(result.layer_name));
+      }else{
+          list_item.append($('<span class="text-danger"></span>').html(result.err_msgs.join('<br />')));
+      }
+      result_list.append(list_item);
+  });
+  results_div.append(result_list);
+}
+
 $(document).ready(function() {
       $("#id_link_visualize_worldmap").on( "click", attempt_visualization );
+      $("#id_link_visualize_all_shapefiles").on( "click", attempt_visualization_all );
  });
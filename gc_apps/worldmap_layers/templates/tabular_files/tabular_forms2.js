@@ -42,6 +42,7 @@
             logit(json_resp);
         })
         .done(function(json_resp) {
+          wait_for_map_job(json_resp, function(json_resp){
             if (json_resp.success){
                 // Show map, update titles
                 show_map_update_titles(json_resp);
@@ -55,18 +56,22 @@
                 $('#id_alert_container').show().empty().append(get_alert('danger', json_resp.message));
 
             }
+            enable_lat_lng_submit_button();
+          });
           })
         .fail(function(json_resp) {
              //$('#simple_msg_div').empty().append(get_alert('danger', 'The classification failed.  Please try again.'));
-        })
-        .always(function() {
-             // Enable submit button
-             if ($('#id_frm_lat_lng_submit').length){
-                 $('#id_frm_lat_lng_submit').removeClass('disabled').html('Submit Latitude & Longitude columns');
-             }
+             enable_lat_lng_submit_button();
         });
     }
 
+    function enable_lat_lng_submit_button(){
+        // Enable submit button
+        if ($('#id_frm_lat_lng_submit').length){
+            $('#id_frm_lat_lng_submit').removeClass('disabled').html('Submit Latitude & Longitude columns');
+        }
+    }
+
 
 
     /**
@@ -173,6 +178,7 @@
             logit(json_resp);
         })
         .done(function(json_resp) {
+          wait_for_map_job(json_resp, function(json_resp){
             if (json_resp.success){
                 $('#id_preview_table_panel').hide();    // hide the preview table
                 show_map_update_titles(json_resp);
@@ -184,18 +190,22 @@
                 $('#id_alert_container').show().empty().append(get_alert('danger', json_resp.message));
 
             }
+            enable_single_column_submit_button();
+          });
           })
         .fail(function(json_resp) {
              //$('#simple_msg_div').empty().append(get_alert('danger', 'The classification failed.  Please try again.'));
-        })
-        .always(function() {
-             // Enable submit button
-             if ($('#id_frm_single_column_submit').length){
-                 $('#id_frm_single_column_submit').removeClass('disabled').html(SUBMIT_BUTTON_TEXT);
-             }
+             enable_single_column_submit_button();
         });
     }
 
+    function enable_single_column_submit_button(){
+        // Enable submit button
+        if ($('#id_frm_single_column_submit').length){
+            $('#id_frm_single_column_submit').removeClass('disabled').html(SUBMIT_BUTTON_TEXT);
+        }
+    }
+
     function bind_form_submit_buttons(){
         //logit('bind_submit_lat_lng_form');
         $("#id_frm_lat_lng_submit").on( "click", submit_lat_lng_form );
@@ -220,6 +230,7 @@
      */
     function hide_form_worldmap_layer_row(){
         $('.form_worldmap_layer').hide();
+        clear_join_preflight();
     }
 
     /**
@@ -338,7 +349,48 @@
             clear_layer_description();
         }
 
+        check_join_preflight();
+    }
+
+    /**
+     *  With a join column and a WorldMap layer chosen, show how many
+     *  rows are expected to map--without calling the WorldMap
+     */
+    function check_join_preflight(){
+        clear_join_preflight();
+
+        var chosen_layer_id = $( "#id_chosen_layer" ).val();
+        if (!chosen_layer_id || !$( "#id_chosen_column" ).val()){
+            return;
+        }
+
+        // url for ajax  call
+        join_preflight_url = '{% url 'view_join_preflight_form' %}';
+
+        $.post(join_preflight_url, $('#form_map_tabular_file').serialize())
+        .done(function(json_resp) {
+            logit(json_resp);
+
+            // The user may have picked another layer in the meantime
+            if (chosen_layer_id != $( "#id_chosen_layer" ).val()){
+                return;
+            }
+            if (json_resp.success){
+                if (!json_resp.data.preflight_available){
+                    return;     // no key set for this layer, nothing to show
+                }
+                // The message may include values from the file: escape them
+                var alert_type = json_resp.data.num_unmatched > 0 ? 'warning' : 'success';
+                $('#id_join_preflight_msg').show().empty()
+                    .append(get_alert(alert_type, $('<div/>').text(json_resp.message).html()));
+            }else{
+                $('#id_join_preflight_msg').show().empty().append(get_alert('danger', json_resp.message));
+            }
+        });
+    }
 
+    function clear_join_preflight(){
+        $('#id_join_preflight_msg').empty().hide();
     }
 
 
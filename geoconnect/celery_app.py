@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 
 import os
-print '-'*30
 from celery import Celery
 
 from django.conf import settings
@@ -15,13 +14,8 @@ app = Celery('geoconnect')
 app.config_from_object('django.conf:settings')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
-#print dir(settings)
-app.conf.update(
-    CELERY_RESULT_BACKEND='djcelery.backends.database:DatabaseBackend',
-)
-app.conf.update(
-    CELERY_RESULT_BACKEND='djcelery.backends.cache:CacheBackend',
-)
+# MapJob state is kept in the database (worldmap_connect.models.MapJob),
+#   so no result backend is configured.  See map_job_runner.py
 
 #@app.task(bind=True)
 @app.task(name='celery_app.add')
@@ -30,4 +24,4 @@ def add(x, y):
     
 @app.task(bind=True)
 def debug_task(self):
-    print('Request: {0!r}'.format(self.request))
\ No newline at end of file
+    print('Request: {0!r}'.format(self.request))
@@ -275,6 +275,32 @@ SESSION_COOKIE_NAME = 'geoconnect'
 GISFILE_SCRATCH_WORK_DIRECTORY = None
 ########## END GISFILE_SCRATCH_WORK_DIRECTORY
 
+########## SHAPEFILE_DEEP_VALIDATION
+# Check every record of a shapefile before sending it to the WorldMap.
+#   Broken files fail fast instead of failing during the WorldMap import
+SHAPEFILE_DEEP_VALIDATION = False
+########## END SHAPEFILE_DEEP_VALIDATION
+
+########## SHAPEFILE_INSPECTION_CACHE
+# Inspection results for zipped shapefiles, keyed by md5 of the .zip
+#   Pruned via task_scripts/prune_inspection_cache.py
+SHAPEFILE_INSPECTION_CACHE_MAX_AGE = 30 * 24 * 60 * 60 # 30 days, in seconds
+SHAPEFILE_INSPECTION_CACHE_MAX_ENTRIES = 10000
+########## END SHAPEFILE_INSPECTION_CACHE
+
+########## TABULAR_PARSED_TABLE_CACHE
+# Save parsed tabular files (Feather if pyarrow is installed, else pickle)
+#   so stats, join formatting and unmatched row reports don't re-parse
+#   the file.  See gc_apps/gis_tabular/parsed_table_cache.py
+TABULAR_PARSED_TABLE_CACHE = True
+########## END TABULAR_PARSED_TABLE_CACHE
+
+########## TABULAR_SNIFF_MAX_ROWS
+# Data rows examined when detecting a tabular file's column types.
+#   None examines the whole file.  See gc_apps/gis_tabular/tabular_sniffer.py
+TABULAR_SNIFF_MAX_ROWS = 200000
+########## END TABULAR_SNIFF_MAX_ROWS
+
 
 ########## LOGIN_URL
 # To use with decorator @login_required
@@ -289,6 +315,12 @@ DATAVERSE_TOKEN_KEYNAME = 'GEOCONNECT_TOKEN'
 DATAVERSE_SERVER_URL = 'http://127.0.0.1:8080'
 DATAVERSE_METADATA_UPDATE_API_PATH =  '/api/worldmap/update-layer-metadata/' #DATAVERSE_SERVER_URL +
 
+# Max concurrent requests to a single Dataverse installation (callbacks,
+#   downloads, metadata updates).  See registered_dataverse/dataverse_client.py
+DATAVERSE_MAX_CONNECTIONS_PER_HOST = 4
+# Seconds a request waits for one of the above, then times out
+DATAVERSE_CONNECTION_WAIT_TIMEOUT = 30
+
 ########### DIRECTORY TO STORE DATA FILES COPIES FROM DV
 # Do NOT make this directory accessible to a browser
 #
@@ -296,7 +328,14 @@ DV_DATAFILE_DIRECTORY = None
 
 ########## END DATAVERSE_SERVER_URL
 
+########## CELERY CONFIGURATION
+# Used for MapJobs when WORLDMAP_ASYNC_MAP_JOBS is True
+#   The 'django://' broker needs 'kombu.transport.django' in INSTALLED_APPS
+#   Start a worker with:  celery -A geoconnect worker -l info
 BROKER_URL = 'django://'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+########## END CELERY CONFIGURATION
 
 ########## WORLDMAP CONNECTION INFO
 WORLDMAP_SERVER_URL = None  # e.g. 'http://107.22.231.227'
@@ -306,9 +345,41 @@ WORLDMAP_ACCOUNT_PASSWORD = None
 WORLDMAP_DEFAULT_TIMEOUT = 8*60 # seconds
 WORLDMAP_SHORT_TIMEOUT = 2*60 # seconds, for non-layer making requests
 
+# Shared WorldMap HTTP client.  See gc_apps/worldmap_connect/worldmap_client.py
+#   The timeouts above are read timeouts, set per endpoint
+WORLDMAP_CONNECT_TIMEOUT = 10 # seconds, requests 2.4+ only
+WORLDMAP_POOL_SIZE = 10 # keep-alive connections per process
+WORLDMAP_RETRY_COUNT = 2 # idempotent calls only
+WORLDMAP_RETRY_BACKOFF = 0.5 # seconds, doubled after each retry
+
+# Age at which the cached JoinTarget info is refreshed, in the
+#   background.  See gc_apps/worldmap_connect/jointarget_cache.py
+WORLDMAP_JOIN_TARGET_TTL = 60 # seconds
+
 # Go and get info from WorldMap instead of using saved info
 WORLDMAP_LAYER_EXPIRATION = 15 * 60 # 15 minutes
 
+# Before uploading a table for a join, check the join column against
+#   a locally loaded JoinTargetKeySet (if one exists for the target).
+#   Joins matching fewer rows than the minimum aren't attempted
+WORLDMAP_JOIN_PREFLIGHT = True
+WORLDMAP_JOIN_PREFLIGHT_MIN_MATCH_PERCENTAGE = 0
+
+# Max number of concurrent WorldMap uploads when mapping
+#   every shapefile set in a .zip
+WORLDMAP_MAX_CONCURRENT_UPLOADS = 4
+
+# Create WorldMap layers in a Celery worker instead of within the
+#   web request.  The browser polls the MapJob status.
+#   See gc_apps/worldmap_connect/map_job_runner.py
+WORLDMAP_ASYNC_MAP_JOBS = False
+
+# Deadline for a whole MapJob, waiting for a worker included.  An unfinished
+#   job older than this is marked FAILURE when its status is polled.
+#   Longer than WORLDMAP_DEFAULT_TIMEOUT: mapping every shapefile set
+#   in a .zip makes one WorldMap request per set
+WORLDMAP_MAP_JOB_TIMEOUT = 60*60 # seconds
+
 # Old WorldMap connection info - leaving as placeholder 2/3 until
 # updated geoconnect fully ready
 WORLDMAP_TOKEN_NAME_FOR_DV = 'geoconnect_token'
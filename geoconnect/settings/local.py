@@ -73,7 +73,7 @@ INSTALLED_APPS += (
     #'gc_apps.gis_tabular',
     #'debug_toolbar',
     #'djcelery',
-    #'kombu.transport.django',
+    #'kombu.transport.django',   # uncomment with WORLDMAP_ASYNC_MAP_JOBS = True
 )
 
 MIDDLEWARE_CLASSES += (
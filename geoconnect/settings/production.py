@@ -113,9 +113,13 @@ CACHES = {
 INSTALLED_APPS += (
     #'debug_toolbar',
     #'djcelery',
-    #'kombu.transport.django',
+    'kombu.transport.django',   # Celery broker for WORLDMAP_ASYNC_MAP_JOBS
 )
 
+# Create WorldMap layers in a Celery worker.
+#   Run a worker with:  celery -A geoconnect worker -l info
+WORLDMAP_ASYNC_MAP_JOBS = True
+
 # Set Template debug to False
 try:
     TEMPLATES[0]['OPTIONS']['debug'] = False
@@ -0,0 +1,87 @@
+from __future__ import print_function
+import os, sys
+from os.path import dirname, join, abspath, isdir
+import time
+
+if __name__=='__main__':
+    PROJECT_ROOT = dirname(dirname(abspath(__file__)))
+    paths = [ PROJECT_ROOT,\
+            join(PROJECT_ROOT, 'geoconnect'),\
+            join(PROJECT_ROOT, 'geoconnect', 'geoconnect'),\
+            '/home/ubuntu/.virtualenvs/geoconnect/lib/python2.7/site-packages'\
+            ]
+    paths = [p for p in paths if isdir(p)]
+    for p in paths:
+        sys.path.append(p)
+
+import numpy as np
+import pandas as pd
+
+from gc_apps.geo_utils.join_key_formatter import format_join_keys
+
+"""
+Compare row-by-row join key formatting (Series.apply) with
+format_join_keys on a synthetic table.  Outputs must match.
+
+python task_scripts/benchmark_join_key_formatting.py            # 10,000,000 rows
+python task_scripts/benchmark_join_key_formatting.py 100000     # 100,000 rows
+"""
+
+DEFAULT_NUM_ROWS = 10 * 1000 * 1000
+ZERO_PAD_LENGTH = 12
+
+
+def build_synthetic_table(num_rows):
+    """Join columns as read by pd.read_csv: int, float with NaN, string"""
+    rand = np.random.RandomState(42)
+
+    int_ids = rand.randint(0, 10 ** 9, size=num_rows)
+
+    float_ids = int_ids.astype('float64')
+    float_ids[rand.random_sample(num_rows) < 0.01] = np.nan
+
+    str_ids = int_ids.astype(str).astype(object)
+    str_ids[rand.random_sample(num_rows) < 0.01] = np.nan
+
+    return pd.DataFrame(dict(int_id=int_ids,\
+                             float_id=float_ids,\
+                             str_id=str_ids))
+
+
+def time_call(func):
+    start_time = time.time()
+    result = func()
+    return result, time.time() - start_time
+
+
+def run_benchmark(num_rows):
+    print('Building %s rows...' % '{:,}'.format(num_rows))
+    df = build_synthetic_table(num_rows)
+
+    for zero_pad_length in (None, ZERO_PAD_LENGTH):
+        if zero_pad_length is None:
+            func_col_fmt = lambda x: '%s' % x
+        else:
+            zero_pad_fmt = '{0:0>%s}' % zero_pad_length
+            func_col_fmt = lambda x: zero_pad_fmt.format(x)
+
+        for col_name in ('int_id', 'float_id', 'str_id'):
+            expected, apply_seconds = time_call(\
+                            lambda: df[col_name].apply(func_col_fmt))
+            keys, vectorized_seconds = time_call(\
+                            lambda: format_join_keys(df[col_name], zero_pad_length))
+
+            is_match = (keys == expected).all()
+
+            print('%-9s zero_pad: %-5s apply: %6.2fs  vectorized: %6.2fs  (%.1fx)  match: %s' %\
+                  (col_name, zero_pad_length,\
+                   apply_seconds, vectorized_seconds,\
+                   apply_seconds / max(vectorized_seconds, 0.001),\
+                   is_match))
+
+
+if __name__=='__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark(DEFAULT_NUM_ROWS)
@@ -0,0 +1,67 @@
+from __future__ import print_function
+import os, sys
+from os.path import dirname, join, abspath, isdir, isfile
+
+if __name__=='__main__':
+    PROJECT_ROOT = dirname(dirname(abspath(__file__)))
+    paths = [ PROJECT_ROOT,\
+            join(PROJECT_ROOT, 'geoconnect'),\
+            join(PROJECT_ROOT, 'geoconnect', 'geoconnect'),\
+            '/home/ubuntu/.virtualenvs/geoconnect/lib/python2.7/site-packages'\
+            ]
+    paths = [p for p in paths if isdir(p)]
+    for p in paths:
+        sys.path.append(p)
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "geoconnect.settings.production"
+
+    import django
+    django.setup()
+
+from gc_apps.geo_utils.msg_util import msg, msgt, msgx
+from gc_apps.worldmap_connect.utils import get_latest_jointarget_information
+from gc_apps.worldmap_connect.join_preflight import JoinTargetKeySetLoader
+
+"""
+Load the values of a join target's column from a .csv export of the
+target layer (e.g. a WFS "outputFormat=csv" download).  Used to check
+joins locally before uploading a table.  See join_preflight.py
+
+python task_scripts/load_join_target_keys.py (join target id) (csv file)
+
+The column name comes from the WorldMap join target information.
+"""
+
+
+def load_join_target_keys(target_layer_id, csv_path):
+    msgt('Load keys for join target: %s' % target_layer_id)
+
+    if not isfile(csv_path):
+        msgx('File not found: %s' % csv_path)
+        return
+
+    join_target_info = get_latest_jointarget_information()
+    if join_target_info is None:
+        msgx('Join target information is not available')
+        return
+
+    single_join_target_info = join_target_info.get_single_join_target_info(target_layer_id)
+    if single_join_target_info is None:
+        msgx('Join target not found: %s' % target_layer_id)
+        return
+
+    key_set = JoinTargetKeySetLoader.load_keys_from_csv(\
+                        target_layer_id,\
+                        csv_path,\
+                        single_join_target_info.target_column_name,\
+                        target_layer_name=single_join_target_info.target_layer_name)
+
+    msg('Keys loaded: %s' % key_set.num_keys)
+    msg('Key file: %s' % key_set.key_file.name)
+
+
+if __name__=='__main__':
+    if len(sys.argv) != 3:
+        msg('usage: python load_join_target_keys.py (join target id) (csv file)')
+    else:
+        load_join_target_keys(int(sys.argv[1]), sys.argv[2])
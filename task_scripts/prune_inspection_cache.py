@@ -0,0 +1,38 @@
+from __future__ import print_function
+import os, sys
+from os.path import dirname, join, abspath, isdir
+
+if __name__=='__main__':
+    PROJECT_ROOT = dirname(dirname(abspath(__file__)))
+    paths = [ PROJECT_ROOT,\
+            join(PROJECT_ROOT, 'geoconnect'),\
+            join(PROJECT_ROOT, 'geoconnect', 'geoconnect'),\
+            '/home/ubuntu/.virtualenvs/geoconnect/lib/python2.7/site-packages'\
+            ]
+    paths = [p for p in paths if isdir(p)]
+    for p in paths:
+        sys.path.append(p)
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "geoconnect.settings.production"
+
+    import django
+    django.setup()
+
+from gc_apps.geo_utils.msg_util import msg, msgt
+from gc_apps.gis_shapefiles.inspection_cache import InspectionCacheEvictor
+
+"""
+Remove old and least recently used shapefile inspection results.
+Runs separately from remove_stale_data.py
+
+# sudo crontab -e
+17 3 * * * /webapps/virtualenvs/geoconnect/bin/python /webapps/code/geoconnect/task_scripts/prune_inspection_cache.py
+"""
+
+
+if __name__=='__main__':
+    msgt('Prune shapefile inspection cache')
+    evictor = InspectionCacheEvictor()
+    evictor.run_eviction()
+    msg('# expired entries removed: %s' % evictor.num_expired_removed)
+    msg('# entries over the size limit removed: %s' % evictor.num_over_limit_removed)